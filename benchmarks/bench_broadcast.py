@@ -0,0 +1,211 @@
+# Realtime broadcast latency benchmark
+#
+# Starts N realtime servers built with the generated lib/realtime.js against
+# one local Redis (the streams adapter), spreads websocket clients over them
+# in one room, and has a few of them broadcast timestamped edits the way
+# collaborators do (socket.to(room).emit). Every receiving client records
+# the end-to-end delay, so the numbers include the hop through Redis for
+# clients on other instances. The first row is one server with the
+# in-memory adapter, the baseline Redis is compared against.
+#
+# Needs node, redis-server (or --redis-url) and a directory whose
+# node_modules has socket.io, socket.io-client, redis and
+# @socket.io/redis-streams-adapter (npm install in the generated tree):
+#
+#   python benchmarks/bench_broadcast.py --prefix ./out [--instances 1 2 4]
+#       [--clients 200] [--senders 4] [--rate 200] [--seconds 10]
+#
+# All processes share this machine's CPUs, so compare rows with each other
+# rather than with a deployment.
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simgen.pipeline import artifact_graph, render_sequential, select  # noqa: E402
+from simgen.settings import DEFAULT_SETTINGS  # noqa: E402
+
+SERVER = """
+import http from 'http'
+const { createRealtimeServer } = await import(process.argv[2])
+const server = http.createServer()
+const io = await createRealtimeServer(server)
+io.on('connection', (socket) => {
+  socket.join('workflow')
+  socket.on('edit', (edit) => socket.to('workflow').emit('edit', edit))
+})
+server.listen(Number(process.argv[3]), '127.0.0.1', () => process.stdout.write('ready\\n'))
+"""
+
+CLIENT = """
+import { io } from 'socket.io-client'
+import { performance } from 'perf_hooks'
+const [ports, clients, senders, rate, seconds] = [
+  process.argv[2].split(',').map(Number), ...process.argv.slice(3).map(Number)]
+
+const sockets = await Promise.all(Array.from({ length: clients }, (_, i) => new Promise((resolve, reject) => {
+  const socket = io(`http://127.0.0.1:${ports[i % ports.length]}`, { transports: ['websocket'] })
+  socket.once('connect', () => resolve(socket))
+  socket.once('connect_error', reject)
+})))
+// Let every server finish joining the room
+await new Promise((resolve) => setTimeout(resolve, 500))
+
+const latency = []
+let received = 0
+for (const socket of sockets) {
+  socket.on('edit', (edit) => {
+    received++
+    latency.push(performance.now() - edit.t)
+  })
+}
+
+const total = Math.round(rate * seconds)
+const interval = 1000 / rate
+const start = performance.now()
+for (let sent = 0; sent < total; sent++) {
+  const due = start + sent * interval
+  const wait = due - performance.now()
+  if (wait > 1) await new Promise((resolve) => setTimeout(resolve, wait))
+  sockets[sent % senders].emit('edit', { t: performance.now(), id: sent, op: 'move', x: sent % 800, y: sent % 600 })
+}
+// Wait for stragglers
+const expected = total * (clients - 1)
+const deadline = performance.now() + 5000
+while (received < expected && performance.now() < deadline) {
+  await new Promise((resolve) => setTimeout(resolve, 50))
+}
+
+latency.sort((a, b) => a - b)
+const at = (q) => latency.length ? latency[Math.min(latency.length - 1, Math.floor(latency.length * q))] : NaN
+process.stderr.write(JSON.stringify({
+  sent: total, expected, received, p50_ms: at(0.5), p99_ms: at(0.99), max_ms: at(1),
+}))
+for (const socket of sockets) socket.close()
+process.exit(0)
+"""
+
+
+def render_realtime():
+    nodes = select(artifact_graph(), ['lib/realtime.js'])
+    return render_sequential(nodes, DEFAULT_SETTINGS)['lib/realtime.js']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(proc, what):
+    line = proc.stdout.readline()
+    if line.strip() != b'ready':
+        proc.kill()
+        raise SystemExit(f"{what} failed to start:\n{proc.stderr.read().decode(errors='replace')}")
+
+
+def start_redis(redis_server):
+    port = free_port()
+    proc = subprocess.Popen([redis_server, '--port', str(port), '--save', '',
+                             '--appendonly', 'no'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc, f'redis://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise SystemExit("redis-server did not start")
+
+
+def run(node, workdir, instances, redis_url, stream, args):
+    env = dict(os.environ, NODE_ENV='production', REDIS_URL=redis_url or '',
+               REALTIME_STREAM_NAME=stream)
+    ports = [free_port() for _ in range(instances)]
+    servers = []
+    try:
+        for port in ports:
+            proc = subprocess.Popen([node, os.path.join(workdir, 'server.mjs'),
+                                     os.path.join(workdir, 'realtime.mjs'), str(port)],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            servers.append(proc)
+            wait_ready(proc, 'realtime server')
+        client = subprocess.run([node, os.path.join(workdir, 'client.mjs'),
+                                 ','.join(map(str, ports)), str(args.clients), str(args.senders),
+                                 str(args.rate), str(args.seconds)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+        if client.returncode != 0:
+            raise SystemExit(f"client failed:\n{client.stderr.decode(errors='replace')}")
+        return json.loads(client.stderr)
+    finally:
+        for proc in servers:
+            proc.terminate()
+        for proc in servers:
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--prefix', default=ROOT,
+                        help='directory whose node_modules has the realtime packages')
+    parser.add_argument('--redis-url', help='use this Redis instead of starting redis-server')
+    parser.add_argument('--instances', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--senders', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=200, help='broadcasts per second')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    if not node:
+        raise SystemExit("node is required to run the broadcast benchmark")
+    if not os.path.isdir(os.path.join(args.prefix, 'node_modules', 'socket.io')):
+        raise SystemExit(f"{args.prefix}/node_modules has no socket.io; run npm install there "
+                         "or pass --prefix")
+    redis_server = None if args.redis_url else shutil.which('redis-server')
+    if not args.redis_url and not redis_server:
+        raise SystemExit("redis-server is required (or pass --redis-url)")
+
+    redis = None
+    # Inside the prefix, so the scripts resolve its node_modules
+    workdir = tempfile.mkdtemp(prefix='.bench-broadcast-', dir=args.prefix)
+    try:
+        for name, text in (('realtime.mjs', render_realtime()), ('server.mjs', SERVER),
+                           ('client.mjs', CLIENT)):
+            with open(os.path.join(workdir, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        redis_url = args.redis_url
+        if redis_server:
+            redis, redis_url = start_redis(redis_server)
+
+        print(f"{args.clients} clients, {args.senders} senders, {args.rate:g} broadcasts/s "
+              f"for {args.seconds:g}s\n")
+        print(f"{'adapter':>8} {'instances':>10} {'delivered':>10} {'p50':>9} {'p99':>9} "
+              f"{'max':>9}")
+        rows = [('memory', 1, None)] + [('redis', n, redis_url) for n in args.instances]
+        for i, (adapter, instances, url) in enumerate(rows):
+            result = run(node, workdir, instances, url, f'bench-broadcast-{os.getpid()}-{i}',
+                         args)
+            delivered = result['received'] / result['expected'] if result['expected'] else 0
+            print(f"{adapter:>8} {instances:>10} {delivered:>9.1%} {result['p50_ms']:>7.2f}ms "
+                  f"{result['p99_ms']:>7.2f}ms {result['max_ms']:>7.1f}ms")
+    finally:
+        if redis:
+            redis.terminate()
+            redis.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Capacity planner benchmark
+#
+# Times Erlang C over every server count at once (the log-space NumPy pass)
+# against the textbook per-c recurrence, then the full plan (M/M/c for every
+# plan, plus the heavy-tail simulation) for a range of request rates.
+#
+#   python benchmarks/bench_capacity.py [--servers 10000] [--rates 5 50 500]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.capacity import LoadProfile, erlang_c, plan
+
+
+def erlang_c_scalar(offered_load, servers):
+    # Erlang B recurrence, restarted for every c as a naive sizing loop does
+    results = []
+    for c in range(servers + 1):
+        b = 1.0
+        for k in range(1, c + 1):
+            b = offered_load * b / (k + offered_load * b)
+        rho = offered_load / c if c else float('inf')
+        results.append(b / (1 - rho * (1 - b)) if rho < 1 else 1.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--servers', type=int, default=10_000,
+                        help='server counts evaluated by the vectorized pass')
+    parser.add_argument('--scalar-servers', type=int, default=2_000,
+                        help='server counts evaluated by the scalar loop')
+    parser.add_argument('--rates', type=float, nargs='+', default=[5, 50, 500])
+    args = parser.parse_args()
+
+    load = args.scalar_servers * 0.8
+    erlang_c(load, 1)  # import numpy outside the timing
+    start = time.perf_counter()
+    vector = erlang_c(load, args.servers)
+    vectorized = time.perf_counter() - start
+    start = time.perf_counter()
+    scalar = erlang_c_scalar(load, args.scalar_servers)
+    looped = time.perf_counter() - start
+    drift = max(abs(a - b) for a, b in zip(vector, scalar))
+    print(f"erlang C: {args.servers:,} counts vectorized {vectorized * 1000:.1f}ms, "
+          f"{args.scalar_servers:,} counts looped {looped * 1000:.0f}ms (max diff {drift:.1e})")
+
+    print(f"\n{'req/s':>7} {'plan':>10} {'instances':>10} {'db':>12} {'M/M/c':>9} "
+          f"{'simulated':>10} {'time':>8}")
+    for rate in args.rates:
+        profile = LoadProfile(rate, 1800, 9000, socket_clients=int(rate * 100))
+        start = time.perf_counter()
+        result = plan(profile)
+        elapsed = time.perf_counter() - start
+        print(f"{rate:>7g} {result.web_plan:>10} "
+              f"{f'{result.min_instances}-{result.max_instances}':>10} {result.db_plan:>12} "
+              f"{result.wait_p99_ms:>7.0f}ms {result.simulated_wait_p99_ms:>8.0f}ms "
+              f"{elapsed * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Build-context analyzer benchmark
+#
+# Creates a synthetic monorepo (apps and packages with sources, nested
+# node_modules and .next output) with the generated .dockerignore and
+# Dockerfile, then times the single walk, the blob hashing with one thread
+# against a pool, and the full cache-key computation for `COPY . .`.
+#
+#   python benchmarks/bench_context.py [--files 20000] [--size 8192] [--jobs 1 4 8]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simgen import context, templates  # noqa: E402
+
+
+def synthetic_monorepo(root, files, size):
+    payload = os.urandom(size)
+    with open(os.path.join(root, '.dockerignore'), 'w', encoding='utf-8') as f:
+        f.write(templates.DOCKERIGNORE)
+    with open(os.path.join(root, 'Dockerfile'), 'w', encoding='utf-8') as f:
+        f.write(templates.DOCKERFILE)
+    with open(os.path.join(root, 'package.json'), 'w', encoding='utf-8') as f:
+        f.write(templates.PACKAGE_JSON)
+    for i in range(files):
+        workspace = f"{'apps' if i % 3 else 'packages'}/ws-{i % 12}"
+        kind = i % 10
+        if kind < 6:
+            directory = f'{workspace}/src/module-{i % 97}'
+        elif kind < 9:
+            directory = f'{workspace}/node_modules/dep-{i % 211}/lib'
+        else:
+            directory = f'{workspace}/.next/cache/chunk-{i % 53}'
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+        with open(os.path.join(root, directory, f'file-{i}.js'), 'wb') as f:
+            f.write(payload[:size - (i % 64)] + i.to_bytes(4, 'little'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=20_000)
+    parser.add_argument('--size', type=int, default=8192, help='bytes per file')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        synthetic_monorepo(root, args.files, args.size)
+
+        start = time.perf_counter()
+        ctx = context.scan(root)
+        walked = time.perf_counter() - start
+        print(f"walk: {len(ctx):,} of {args.files:,} files kept ({ctx.size / 1e6:.1f}MB, "
+              f"{len(ctx.pruned)} directories skipped) in {walked * 1000:.0f}ms")
+
+        for jobs in args.jobs:
+            ctx.blobs.clear()
+            start = time.perf_counter()
+            ctx.hash(list(ctx.files), jobs=jobs)
+            elapsed = time.perf_counter() - start
+            print(f"hash: {jobs:>2} threads {elapsed * 1000:>7.0f}ms "
+                  f"({ctx.size / 1e6 / elapsed:.0f}MB/s)")
+
+        ctx = context.scan(root)
+        start = time.perf_counter()
+        steps = context.cache_keys(ctx, templates.DOCKERFILE, jobs=max(args.jobs))
+        elapsed = time.perf_counter() - start
+        print(f"cache keys: {len(steps)} instructions from a fresh walk in {elapsed * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Architecture diagram scaling benchmark
+#
+# Builds the figure for synthetic topologies of increasing size (with fixed
+# random positions, so layout time is excluded; see bench_layout.py) and
+# times figure construction and plotly JSON serialization (what kaleido
+# receives).
+#
+#   python benchmarks/bench_diagram.py [--sizes 11 100 500 1000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.diagram import KIND_STYLES, build_figure
+
+
+def synthetic_topology(services, seed=0):
+    rng = random.Random(seed)
+    styles = list(KIND_STYLES.values())
+    names = [f'svc-{i}' for i in range(services)]
+    positions = {name: (rng.uniform(0, 5), rng.uniform(1, 10)) for name in names}
+    components = {name: dict(styles[i % len(styles)]) for i, name in enumerate(names)}
+    # Roughly two outgoing edges per service
+    connections = [(names[i], names[rng.randrange(services)])
+                   for i in range(services) for _ in range(2)]
+    return positions, components, connections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[11, 100, 500, 1000])
+    args = parser.parse_args()
+
+    # Warm up plotly's lazy validators so the first row is not skewed
+    positions, components, connections = synthetic_topology(2)
+    build_figure(components, connections, positions).to_json()
+
+    print(f"{'services':>8} {'edges':>6} {'traces':>6} {'build':>9} {'to_json':>9}")
+    for size in args.sizes:
+        positions, components, connections = synthetic_topology(size)
+        start = time.perf_counter()
+        fig = build_figure(components, connections, positions)
+        built = time.perf_counter()
+        fig.to_json()
+        serialized = time.perf_counter()
+        print(f"{size:>8} {len(connections):>6} {len(fig.data):>6} "
+              f"{(built - start) * 1000:>7.1f}ms {(serialized - built) * 1000:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# docker build benchmark
+#
+# Builds a Sim Studio checkout with the previous Dockerfile
+# (benchmarks/Dockerfile.legacy) and the generated one, and times the
+# rebuilds a developer actually waits for: nothing changed, a source file
+# changed, and a dependency manifest changed. With --cold the BuildKit cache
+# is pruned first, so the first build of each Dockerfile is also a full
+# cold build (this discards every other cache on the machine too).
+#
+#   python benchmarks/bench_docker_build.py --context ~/src/simstudio [--cold]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simgen import templates  # noqa: E402
+
+IGNORED = shutil.ignore_patterns('node_modules', '.next', '.git')
+SCENARIOS = ('first', 'no change', 'source change', 'manifest change')
+
+
+def docker_build(docker, context, dockerfile, tag):
+    start = time.perf_counter()
+    subprocess.run([docker, 'build', '--progress=plain', '-f', dockerfile, '-t', tag, context],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   env=dict(os.environ, DOCKER_BUILDKIT='1'))
+    return time.perf_counter() - start
+
+
+def touch_source(context, n):
+    with open(os.path.join(context, 'bench-touch.js'), 'w', encoding='utf-8') as f:
+        f.write(f'export const touched = {n}\n')
+
+
+def touch_manifest(context, n):
+    # A field npm ignores: the manifest layer is invalidated, the lockfile is not
+    path = os.path.join(context, 'package.json')
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['benchTouch'] = n
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(docker, source, name, dockerfile_text, cold):
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        context = os.path.join(tmp, 'context')
+        shutil.copytree(source, context, ignore=IGNORED)
+        dockerfile = os.path.join(tmp, 'Dockerfile')
+        with open(dockerfile, 'w', encoding='utf-8') as f:
+            f.write(dockerfile_text)
+        if cold:
+            subprocess.run([docker, 'builder', 'prune', '-af'], check=True, stdout=subprocess.DEVNULL)
+        tag = f'simgen-bench-{name}'
+        timings['first'] = docker_build(docker, context, dockerfile, tag)
+        timings['no change'] = docker_build(docker, context, dockerfile, tag)
+        touch_source(context, 1)
+        timings['source change'] = docker_build(docker, context, dockerfile, tag)
+        touch_manifest(context, 1)
+        timings['manifest change'] = docker_build(docker, context, dockerfile, tag)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--context', required=True, help='Sim Studio checkout to build')
+    parser.add_argument('--cold', action='store_true', help='prune the BuildKit cache before each Dockerfile')
+    args = parser.parse_args()
+
+    docker = shutil.which('docker')
+    if not docker:
+        raise SystemExit("docker is required to run the build benchmark")
+    if not os.path.isfile(os.path.join(args.context, 'package.json')):
+        raise SystemExit(f"{args.context} has no package.json")
+
+    with open(os.path.join(ROOT, 'benchmarks', 'Dockerfile.legacy'), encoding='utf-8') as f:
+        legacy = f.read()
+    results = {
+        'legacy': run(docker, args.context, 'legacy', legacy, args.cold),
+        'cached': run(docker, args.context, 'cached', templates.DOCKERFILE, args.cold),
+    }
+
+    print(f"{'dockerfile':>10} " + ' '.join(f'{scenario:>16}' for scenario in SCENARIOS))
+    for name, timings in results.items():
+        print(f"{name:>10} " + ' '.join(f'{timings[scenario]:>15.1f}s' for scenario in SCENARIOS))
+
+
+if __name__ == '__main__':
+    main()
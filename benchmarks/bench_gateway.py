@@ -0,0 +1,102 @@
+# LLM gateway benchmark
+#
+# Sends --requests chat completions, drawn from --prompts distinct prompts
+# with --deterministic of them at temperature 0, to stub providers first
+# directly and then through the caching gateway, and prints the latency
+# percentiles and how many calls reached the provider each way. Repeated
+# prompts in flight at the same time are coalesced, later ones are cache
+# hits; the rest pay the provider latency plus the gateway's overhead.
+#
+#   python benchmarks/bench_gateway.py [--requests 500] [--prompts 50] [--concurrency 32]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from simgen.aistub import StubProvider
+from simgen.gateway import UPSTREAMS, Gateway
+from simgen.probe import percentile
+
+
+def workload(requests, prompts, deterministic, seed):
+    rng = random.Random(seed)
+    # Zipf-like reuse: a few prompts (templates, retries) dominate
+    weights = [1 / (rank + 1) for rank in range(prompts)]
+    picks = rng.choices(range(prompts), weights, k=requests)
+    return [{'model': 'stub-model', 'messages': [{'role': 'user', 'content': f'prompt {p}'}],
+             'temperature': 0 if rng.random() < deterministic else 0.7} for p in picks]
+
+
+async def measure(base_url, path, bodies, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    cache = Counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def one(body):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json=body,
+                                             headers={'authorization': 'Bearer bench'})
+                latencies.append(time.perf_counter() - start)
+                cache[response.headers.get('x-cache', '-')] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(body) for body in bodies))
+    return sorted(latencies), cache, time.perf_counter() - start
+
+
+async def run(args):
+    bodies = workload(args.requests, args.prompts, args.deterministic, args.seed)
+    results = {}
+    async with StubProvider(latency_p50_ms=args.p50, latency_p95_ms=args.p95,
+                            seed=args.seed) as stub:
+        before = sum(stub.requests.values())
+        results['direct'] = await measure(stub.url, '/v1/chat/completions', bodies,
+                                          args.concurrency)
+        upstream = {'direct': sum(stub.requests.values()) - before}
+        async with Gateway('127.0.0.1', 0, dict.fromkeys(UPSTREAMS, stub.url)) as gateway:
+            before = sum(stub.requests.values())
+            results['gateway'] = await measure(gateway.url, '/openai/v1/chat/completions',
+                                               bodies, args.concurrency)
+            upstream['gateway'] = sum(stub.requests.values()) - before
+            stats = gateway.snapshot()
+    return results, upstream, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--prompts', type=int, default=50, help='distinct prompts')
+    parser.add_argument('--deterministic', type=float, default=0.8,
+                        help='share of requests at temperature 0')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--p50', type=float, default=400, help='stub latency median in ms')
+    parser.add_argument('--p95', type=float, default=1500, help='stub latency p95 in ms')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    results, upstream, stats = asyncio.run(run(args))
+    print(f"{args.requests} requests, {args.prompts} prompts, "
+          f"{args.deterministic:.0%} at temperature 0, concurrency {args.concurrency}")
+    print(f"{'route':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'time':>7} {'upstream':>9}")
+    for name, (latencies, cache, elapsed) in results.items():
+        row = [percentile(latencies, q) * 1000 for q in (50, 95, 99)]
+        print(f"{name:>8} " + ' '.join(f"{v:>7.1f}ms" for v in row)
+              + f" {elapsed:>6.2f}s {upstream[name]:>9,}")
+    cache = results['gateway'][1]
+    print("gateway: " + ', '.join(f"{status} {count:,}" for status, count in cache.most_common())
+          + f"; HTTP/2 upstream {stats['http2']}, {stats['saved_s']:.1f}s of provider time saved")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Hedged requests and latency-aware routing benchmark
+#
+# Two stub providers serve the same routed model (GATEWAY_ROUTES style
+# "openai:m" and "deepseek:m"): similar medians, but --tail-fraction of the
+# first one's requests straggle by --tail-ms. The same open-loop stream of
+# chat completions runs through the gateway with hedging off and on, and
+# the latency percentiles, extra upstream load and hedge outcomes are
+# printed. A second phase slows the first provider down (--slow-p50) and
+# shows traffic shifting to the other.
+#
+#   python benchmarks/bench_hedging.py [--requests 400] [--rate 40]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from simgen.aistub import StubProvider
+from simgen.gateway import Gateway
+from simgen.probe import percentile
+
+ROUTES = {'m': [('openai', 'm'), ('deepseek', 'm')]}
+
+
+async def stream(client, requests, rate, seed):
+    """Poisson arrivals at ``rate``/s; latencies and upstreams that answered."""
+    rng = random.Random(seed)
+    latencies, upstreams = [], Counter()
+
+    async def one(i):
+        start = time.perf_counter()
+        response = await client.post('/openai/v1/chat/completions', json={
+            'model': 'm', 'temperature': 0.7, 'messages': [{'role': 'user', 'content': str(i)}]})
+        latencies.append(time.perf_counter() - start)
+        upstreams[response.headers.get('x-upstream', 'openai:m')] += 1
+
+    tasks = []
+    for i in range(requests):
+        tasks.append(asyncio.ensure_future(one(i)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return sorted(latencies), upstreams
+
+
+async def run(args, hedge):
+    async with StubProvider(latency_p50_ms=args.p50, latency_p95_ms=args.p95, seed=args.seed,
+                            tail_fraction=args.tail_fraction, tail_ms=args.tail_ms) as first, \
+            StubProvider(latency_p50_ms=args.p50 * 1.2, latency_p95_ms=args.p95 * 1.2,
+                         seed=args.seed + 1) as second:
+        upstreams = {'openai': first.url, 'deepseek': second.url}
+        async with Gateway('127.0.0.1', 0, upstreams, routes=ROUTES, api_keys={'deepseek': 'k'},
+                           hedge=hedge, half_life=args.half_life, seed=args.seed) as gateway:
+            limits = httpx.Limits(max_connections=500)
+            async with httpx.AsyncClient(base_url=gateway.url, limits=limits,
+                                         timeout=60) as client:
+                steady = await stream(client, args.requests, args.rate, args.seed)
+                sent = sum(first.requests.values()) + sum(second.requests.values())
+                routing = dict(gateway.router.counts)
+                slow = None
+                if hedge and args.slow_p50:
+                    first.set_latency(args.slow_p50, args.slow_p50 * args.p95 / args.p50)
+                    slow = await stream(client, args.requests, args.rate, args.seed + 2)
+    return steady, sent, routing, slow
+
+
+def row(name, latencies, extra):
+    values = [percentile(latencies, q) * 1000 for q in (50, 95, 99)] + [latencies[-1] * 1000]
+    print(f"{name:>10} " + ' '.join(f"{v:>8.1f}ms" for v in values) + f"  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--rate', type=float, default=40, help='arrivals per second')
+    parser.add_argument('--p50', type=float, default=150, help='stub latency median in ms')
+    parser.add_argument('--p95', type=float, default=300, help='stub latency p95 in ms')
+    parser.add_argument('--tail-fraction', type=float, default=0.05,
+                        help='share of straggling requests at the first provider')
+    parser.add_argument('--tail-ms', type=float, default=2000, help='straggler delay in ms')
+    parser.add_argument('--slow-p50', type=float, default=1000,
+                        help='median of the first provider in the slowdown phase (0: skip)')
+    parser.add_argument('--half-life', type=float, default=5.0,
+                        help='latency half-life in seconds (short, for a short run)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests at {args.rate:g}/s; {args.tail_fraction:.0%} of the first "
+          f"provider's take +{args.tail_ms:g}ms")
+    print(f"{'hedging':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    for hedge in (False, True):
+        (latencies, _), sent, routing, slow = asyncio.run(run(args, hedge))
+        row('on' if hedge else 'off', latencies,
+            f"{sent / args.requests - 1:+.1%} upstream load, {routing.get('hedged', 0)} hedges "
+            f"({routing.get('hedge_wins', 0)} won, {routing.get('hedges_denied', 0)} over budget)")
+    if slow:
+        latencies, upstreams = slow
+        share = ', '.join(f"{target} {count / args.requests:.0%}"
+                          for target, count in upstreams.most_common())
+        row('slowdown', latencies, f"first provider at p50 {args.slow_p50:g}ms: {share}")
+
+
+if __name__ == '__main__':
+    main()
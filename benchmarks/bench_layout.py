@@ -0,0 +1,69 @@
+# Graph layout benchmark
+#
+# Lays out synthetic tiered DAGs (layered engine) and cyclic graphs (force
+# engine) and fails if any run over the budget.
+#
+#   python benchmarks/bench_layout.py [--nodes 2000] [--budget-s 1.0]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.layout import auto_layout
+
+
+def tiered_dag(count, rng, tiers=6):
+    # Each node calls ~2 nodes in lower tiers, like users -> web -> services -> providers
+    names = [f'svc-{i}' for i in range(count)]
+    tier = [min(tiers - 1, i * tiers // count) for i in range(count)]
+    by_tier = [[name for name, t in zip(names, tier) if t == level] for level in range(tiers)]
+    edges = []
+    for name, t in zip(names, tier):
+        if t < tiers - 1:
+            for _ in range(2):
+                edges.append((name, rng.choice(by_tier[rng.randrange(t + 1, tiers)])))
+    return names, edges
+
+
+def cyclic_graph(count, rng):
+    names = [f'svc-{i}' for i in range(count)]
+    edges = [(names[i], names[rng.randrange(count)]) for i in range(count) for _ in range(2)]
+    return names, edges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--budget-s', type=float, default=1.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cases = {
+        'layered (tiered DAG)': ('layered', tiered_dag(args.nodes, rng)),
+        'force (cyclic)': ('force', cyclic_graph(args.nodes, rng)),
+    }
+    # Warm up numpy
+    auto_layout(*tiered_dag(50, rng))
+
+    failed = False
+    print(f"{'case':<22} {'nodes':>6} {'edges':>6} {'best':>8} {'worst':>8}")
+    for name, (method, (nodes, edges)) in cases.items():
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            auto_layout(nodes, edges, method)
+            samples.append(time.perf_counter() - start)
+        over = max(samples) > args.budget_s
+        failed |= over
+        flag = '  ❌ over budget' if over else ''
+        print(f"{name:<22} {len(nodes):>6} {len(edges):>6} {min(samples):>7.3f}s {max(samples):>7.3f}s{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# lib/logger.js benchmark
+#
+# Runs the generated logger and the previous (synchronous console.log)
+# logger under node with stdout piped back to Python, like a container log
+# collector, and reports entries/sec and per-call latency percentiles.
+# Entries are issued in bursts of --burst per event-loop turn to mimic
+# request handlers; each entry is one enabled info call plus one disabled
+# debug call.
+#
+#   python benchmarks/bench_logger.py [--entries 200000] [--burst 50] [--repeat 3]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simgen.pipeline import artifact_graph, render_sequential, select  # noqa: E402
+from simgen.settings import DEFAULT_SETTINGS  # noqa: E402
+
+DRIVER = """
+const { logger } = await import(process.argv[2])
+const entries = Number(process.argv[3])
+const burst = Number(process.argv[4])
+const latency = new Float64Array(entries)
+const turn = () => new Promise((resolve) => setImmediate(resolve))
+
+for (let i = 0; i < 2000; i++) logger.info('warmup', { i })
+if (logger.flush) logger.flush()
+await turn()
+
+const start = process.hrtime.bigint()
+for (let i = 0; i < entries; i++) {
+  const t = process.hrtime.bigint()
+  logger.info('request completed', { route: '/api/workflows', status: 200, durationMs: i % 250, requestId: i })
+  logger.debug('request detail', { requestId: i })
+  latency[i] = Number(process.hrtime.bigint() - t)
+  if (i % burst === burst - 1) await turn()
+}
+if (logger.flush) logger.flush()
+const seconds = Number(process.hrtime.bigint() - start) / 1e9
+
+latency.sort()
+const at = (q) => latency[Math.min(entries - 1, Math.floor(entries * q))] / 1000
+process.stderr.write(JSON.stringify({
+  entries, seconds, rate: entries / seconds, p50_us: at(0.5), p99_us: at(0.99), max_us: at(1)
+}))
+"""
+
+
+def render_logger():
+    nodes = select(artifact_graph(), ['lib/logger.js'])
+    return render_sequential(nodes, DEFAULT_SETTINGS)['lib/logger.js']
+
+
+def run_once(node, driver, logger_path, entries, burst):
+    proc = subprocess.Popen([node, driver, logger_path, str(entries), str(burst)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=dict(os.environ, NODE_ENV='production', LOG_LEVEL='info'))
+    received = 0
+    while True:
+        chunk = proc.stdout.read(1 << 16)
+        if not chunk:
+            break
+        received += len(chunk)
+    stats = proc.stderr.read()
+    if proc.wait() != 0:
+        raise SystemExit(f"node failed:\n{stats.decode(errors='replace')}")
+    result = json.loads(stats)
+    result['bytes'] = received
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=200_000)
+    parser.add_argument('--burst', type=int, default=50, help='entries per event-loop turn')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per logger (best is kept)')
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    if not node:
+        raise SystemExit("node is required to run the logger benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loggers = {
+            'legacy': os.path.join(tmp, 'logger_legacy.mjs'),
+            'buffered': os.path.join(tmp, 'logger.mjs'),
+        }
+        shutil.copyfile(os.path.join(ROOT, 'benchmarks', 'logger_legacy.js'), loggers['legacy'])
+        with open(loggers['buffered'], 'w', encoding='utf-8') as f:
+            f.write(render_logger())
+        driver = os.path.join(tmp, 'driver.mjs')
+        with open(driver, 'w', encoding='utf-8') as f:
+            f.write(DRIVER)
+
+        print(f"{'logger':>9} {'entries/s':>11} {'p50':>9} {'p99':>9} {'max':>10} {'output':>9}")
+        for name, path in loggers.items():
+            runs = [run_once(node, driver, path, args.entries, args.burst) for _ in range(args.repeat)]
+            best = max(runs, key=lambda run: run['rate'])
+            print(f"{name:>9} {best['rate']:>11,.0f} {best['p50_us']:>7.2f}us {best['p99_us']:>7.2f}us "
+                  f"{best['max_us']:>8.0f}us {best['bytes'] / 1e6:>7.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Log analytics benchmark
+#
+# Writes a synthetic lib/logger.js log export (JSON lines with routes,
+# statuses and latencies, plus a burst of errors) and times `simgen logs`
+# parsing with one process and with several.
+#
+#   python benchmarks/bench_logstats.py [--mb 200] [--jobs 1 4]
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.logstats import analyze, route_table
+
+ROUTES = ['/api/workflows', '/api/workflows/{id}', '/api/workflows/{id}/execute',
+          '/api/chat', '/api/auth/session', '/health/ready', '/api/providers/openai']
+
+
+def write_log(path, megabytes, seed=0):
+    rng = random.Random(seed)
+    target = megabytes * 1_000_000
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        i = 0
+        while written < target:
+            minute = i // 20_000
+            route = rng.choice(ROUTES).replace('{id}', str(rng.randrange(10_000)))
+            status = 500 if (10 <= minute < 13 and rng.random() < 0.3) or rng.random() < 0.002 else 200
+            entry = {
+                'timestamp': f'2025-01-01T{(minute // 60) % 24:02d}:{minute % 60:02d}:00.000Z',
+                'level': 'error' if status >= 500 else 'info',
+                'message': 'request completed',
+                'route': route,
+                'status': status,
+                'durationMs': round(rng.lognormvariate(3, 1), 2),
+            }
+            line = json.dumps(entry) + '\n'
+            f.write(line)
+            written += len(line)
+            i += 1
+    return i
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mb', type=int, default=200, help='size of the synthetic log')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'simstudio.log')
+        lines = write_log(path, args.mb)
+        print(f"{lines:,} lines, {os.path.getsize(path) / 1e6:.0f}MB")
+        print(f"{'jobs':>4} {'seconds':>8} {'MB/s':>7} {'lines/s':>11}")
+        for jobs in args.jobs:
+            start = time.perf_counter()
+            rollup, parsed = analyze(path, jobs=jobs, chunk_size=16 << 20)
+            elapsed = time.perf_counter() - start
+            assert rollup.lines == lines
+            print(f"{jobs:>4} {elapsed:>8.2f} {parsed / 1e6 / elapsed:>7.1f} {lines / elapsed:>11,.0f}")
+        top = route_table(rollup, top=1)[0]
+        print(f"slowest route by p95: {top['route']} ({top['p95_ms']:.1f}ms), "
+              f"bursts: {rollup.error_bursts()[:1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Postgres connection setup benchmark
+#
+# Opens --sessions full Postgres sessions (SSLRequest, startup, auth,
+# SELECT 1) and prints percentiles of each phase. Without --url the probe
+# runs against a local StubServer, optionally with simulated backend start
+# and query delays; with --url it measures a real database, e.g. the Render
+# instance behind DATABASE_URL.
+#
+#   python benchmarks/bench_pgprobe.py [--sessions 50] [--concurrency 1]
+#   python benchmarks/bench_pgprobe.py --url "$DATABASE_URL"
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.pgwire import PHASES, StubServer, probe_connection
+from simgen.probe import percentile
+
+
+async def measure(url, sessions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await probe_connection(url)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(sessions)))
+    return results, time.perf_counter() - start
+
+
+async def run(args):
+    if args.url:
+        return await measure(args.url, args.sessions, args.concurrency)
+    async with StubServer(password='bench', auth=args.auth, auth_delay=args.auth_delay,
+                          query_delay=args.query_delay) as stub:
+        return await measure(stub.url, args.sessions, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='database URL to measure (default: a local stub)')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--auth', default='scram', choices=('trust', 'password', 'md5', 'scram'),
+                        help='stub authentication method')
+    parser.add_argument('--auth-delay', type=float, default=0.0,
+                        help='stub backend start delay in seconds')
+    parser.add_argument('--query-delay', type=float, default=0.0, help='stub query delay in seconds')
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run(args))
+    print(f"{args.sessions} sessions in {elapsed:.2f}s (concurrency {args.concurrency})")
+    print(f"{'phase':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for phase in PHASES + ('total',):
+        if phase == 'total':
+            values = sorted(sum(r[p] for p in PHASES if p in r) for r in results)
+        else:
+            values = sorted(r[phase] for r in results if phase in r)
+        if not values:
+            continue
+        row = [percentile(values, q) * 1000 for q in (50, 95, 99)] + [values[-1] * 1000]
+        print(f"{phase:>6} " + ' '.join(f"{v:>7.2f}ms" for v in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Startup-time benchmark for the simgen CLI
+#
+# Measures wall-clock time of fresh interpreter runs of `python -m simgen
+# --help` and of a full config generation (no diagram) into a temp dir,
+# and fails if the median exceeds the budget. With --record, the samples
+# are appended to the results store (`simgen results compare` then tells
+# whether a change made startup slower).
+#
+#   python benchmarks/bench_startup.py [--runs 20] [--budget-ms 100] [--record]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(argv, runs):
+    samples = []
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, check=True, env=env, cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=100.0)
+    parser.add_argument('--record', action='store_true',
+                        help='append the samples to the results store')
+    parser.add_argument('--store', help='results file (default: $SIMGEN_RESULTS or '
+                                        'benchmark-results.jsonl)')
+    args = parser.parse_args()
+    recorded = {}
+
+    with tempfile.TemporaryDirectory() as out:
+        cases = {
+            'interpreter baseline': [sys.executable, '-c', 'pass'],
+            'simgen --help': [sys.executable, '-m', 'simgen', '--help'],
+            'simgen generate': [sys.executable, '-m', 'simgen', 'generate', '--out', out, '-q'],
+        }
+        failed = False
+        print(f"{'case':<22} {'median':>9} {'p90':>9} {'max':>9}")
+        for name, argv in cases.items():
+            samples = sorted(time_command(argv, args.runs))
+            recorded[name] = samples
+            median = statistics.median(samples)
+            p90 = samples[int(0.9 * (len(samples) - 1))]
+            over = name != 'interpreter baseline' and median > args.budget_ms
+            failed |= over
+            flag = '  ❌ over budget' if over else ''
+            print(f"{name:<22} {median:8.1f}ms {p90:8.1f}ms {samples[-1]:8.1f}ms{flag}")
+
+    if args.record:
+        sys.path.insert(0, ROOT)
+        from simgen.results import Result, ResultStore, git_sha
+        sha = git_sha(ROOT)
+        store = ResultStore(args.store)
+        store.append([Result('startup', name, sha, samples=samples)
+                      for name, samples in recorded.items()])
+        print(f"📥 Recorded {len(recorded)} series for {sha} in {store.path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
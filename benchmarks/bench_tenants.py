@@ -0,0 +1,53 @@
+# Bulk multi-tenant generation benchmark
+#
+# Renders the full deployment tree for N synthetic tenants into an in-memory
+# archive for every archive format and reports throughput.
+#
+#   python benchmarks/bench_tenants.py [--tenants 1000] [--budget-s 5]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen.settings import PLANS, REGIONS, Settings
+from simgen.tenants import ARCHIVE_FORMATS, build_archive
+
+
+def synthetic_tenants(count):
+    return [
+        Settings(domain=f'tenant-{i:05d}.onrender.com',
+                 region=REGIONS[i % len(REGIONS)],
+                 plan=PLANS[1 + i % 3],
+                 num_instances=1 + i % 4,
+                 # Render only attaches a disk to a single instance
+                 disk_size_gb=0 if i % 4 else 5 + 5 * (i % 10))
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--budget-s', type=float, default=5.0)
+    args = parser.parse_args()
+
+    tenants = synthetic_tenants(args.tenants)
+    failed = False
+    print(f"{'format':<8} {'tenants':>8} {'seconds':>8} {'tenants/s':>10} {'archive':>10}")
+    for fmt in ARCHIVE_FORMATS:
+        start = time.perf_counter()
+        data = build_archive(tenants, fmt, mtime=0)
+        elapsed = time.perf_counter() - start
+        over = elapsed > args.budget_s
+        failed |= over
+        flag = '  ❌ over budget' if over else ''
+        print(f"{fmt:<8} {len(tenants):>8} {elapsed:>8.2f} {len(tenants) / elapsed:>10.0f} "
+              f"{len(data) / 1e6:>8.1f}MB{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
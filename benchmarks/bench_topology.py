@@ -0,0 +1,66 @@
+# Topology parse benchmark
+#
+# Builds a synthetic Blueprint with many services (each linked to a shared
+# database, some with disks) and times the first parse against the cached
+# lookups that every later consumer (diagram, validator, planner) gets.
+#
+#   python benchmarks/bench_topology.py [--services 100 500 1000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simgen import topology
+from simgen.diagram import topology_graph
+
+
+def synthetic_blueprint(services):
+    lines = ['services:']
+    for i in range(services):
+        lines += [
+            f'  - type: {"web" if i % 4 == 0 else "pserv"}',
+            f'    name: svc-{i}',
+            '    runtime: docker',
+            '    plan: standard',
+            '    healthCheckPath: /health',
+            '    envVars:',
+            '      - key: DATABASE_URL',
+            '        fromDatabase:',
+            '          name: shared-db',
+            '          property: connectionString',
+            '      - key: OPENAI_API_KEY',
+            '        sync: false',
+        ]
+        if i % 10 == 0:
+            lines += ['    disk:', f'      name: disk-{i}', '      mountPath: /app/data',
+                      '      sizeGB: 5']
+    lines += ['databases:', '  - name: shared-db', '    plan: standard']
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--services', type=int, nargs='+', default=[100, 500, 1000])
+    args = parser.parse_args()
+
+    print(f"{'services':>8} {'links':>6} {'parse':>9} {'cached':>9} {'consumers':>10}")
+    for size in args.services:
+        blueprint = synthetic_blueprint(size)
+        start = time.perf_counter()
+        parsed = topology.load(blueprint)
+        parsed_at = time.perf_counter()
+        assert topology.load(blueprint) is parsed
+        cached_at = time.perf_counter()
+        # What the consumers do with the shared parse
+        topology_graph(topology.load(blueprint))
+        topology.validate(topology.load(blueprint))
+        done = time.perf_counter()
+        print(f"{size:>8} {len(parsed.links):>6} {(parsed_at - start) * 1000:>7.1f}ms "
+              f"{(cached_at - parsed_at) * 1e6:>7.1f}us {(done - cached_at) * 1000:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
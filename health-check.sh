@@ -8,7 +8,7 @@ echo "========================="
 
 # Check if main application is responding
 echo "🔍 Checking main application..."
-if curl -f -s "http://localhost:3000/health" > /dev/null; then
+if curl -f -s --max-time 5 "http://localhost:3000/health" > /dev/null; then
     echo "✅ Main application is healthy"
 else
     echo "❌ Main application is not responding"
@@ -17,7 +17,7 @@ fi
 
 # Check if realtime server is responding  
 echo "🔍 Checking realtime server..."
-if curl -f -s "http://localhost:3001/health" > /dev/null; then
+if curl -f -s --max-time 5 "http://localhost:3001/health" > /dev/null; then
     echo "✅ Realtime server is healthy"
 else
     echo "❌ Realtime server is not responding"
@@ -38,5 +38,20 @@ else
     echo "⚠️ DATABASE_URL not set, skipping database check"
 fi
 
+# Check Redis (Socket.IO adapter), when configured
+if [ -n "$REDIS_URL" ]; then
+    echo "🔍 Checking Redis..."
+    REDIS_HOSTPORT="${REDIS_URL#*://}"
+    REDIS_HOSTPORT="${REDIS_HOSTPORT##*@}"
+    REDIS_HOSTPORT="${REDIS_HOSTPORT%%/*}"
+    case "$REDIS_HOSTPORT" in *:*) ;; *) REDIS_HOSTPORT="$REDIS_HOSTPORT:6379" ;; esac
+    if timeout 5 bash -c "</dev/tcp/${REDIS_HOSTPORT%:*}/${REDIS_HOSTPORT##*:}" 2>/dev/null; then
+        echo "✅ Redis connection is healthy"
+    else
+        echo "❌ Cannot connect to Redis"
+        exit 1
+    fi
+fi
+
 echo ""
 echo "🎉 All health checks passed!"
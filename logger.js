@@ -1,56 +1,156 @@
 // lib/logger.js
 // Centralized logging configuration for Sim Studio
+//
+// Disabled levels are bound to a no-op when the logger is created, so they
+// cost one function call. Enabled entries are stored as-is in a fixed-size
+// ring buffer and serialized in batches, off the request path, by a flush
+// scheduled with setImmediate (setTimeout where there is none), or every
+// LOG_FLUSH_INTERVAL_MS. Each flush is a single stdout write, and the buffer
+// is flushed synchronously on process exit, fatal signals and uncaught
+// exceptions.
+//
+// Because serialization is deferred, `meta` objects are captured by
+// reference: do not mutate them after logging.
 
 const isDevelopment = process.env.NODE_ENV === 'development'
 const logLevel = process.env.LOG_LEVEL || (isDevelopment ? 'debug' : 'info')
+const bufferSize = parseInt(process.env.LOG_BUFFER_SIZE || '1024', 10)
+const flushInterval = parseInt(process.env.LOG_FLUSH_INTERVAL_MS || '0', 10)
+
+const LEVELS = ['error', 'warn', 'info', 'debug']
+const LABELS = LEVELS.map((level) => level.toUpperCase())
+const noop = () => {}
+
+// Edge/browser bundles have no process.stdout; fall back to console there
+const stdout = typeof process !== 'undefined' && process.stdout && process.stdout.write
+  ? process.stdout
+  : { write: (chunk) => { console.log(chunk.replace(/\n$/, '')); return true } }
+
+// Run `fn` after `ms`, or on the next turn of the event loop. Edge/browser
+// runtimes have neither setImmediate nor unref() on their timer ids
+function schedule(fn, ms) {
+  if (ms <= 0 && typeof setImmediate === 'function') {
+    setImmediate(fn)
+    return
+  }
+  const timer = setTimeout(fn, ms)
+  if (timer && typeof timer.unref === 'function') {
+    timer.unref()
+  }
+}
 
 class Logger {
   constructor() {
-    this.levels = {
-      error: 0,
-      warn: 1, 
-      info: 2,
-      debug: 3
-    }
-    this.currentLevel = this.levels[logLevel] || this.levels.info
-  }
+    this.levels = { error: 0, warn: 1, info: 2, debug: 3 }
+    this.currentLevel = logLevel in this.levels ? this.levels[logLevel] : this.levels.info
+
+    // Ring buffer of pending entries
+    this.capacity = Math.max(1, bufferSize)
+    this.times = new Float64Array(this.capacity)
+    this.levelIndex = new Uint8Array(this.capacity)
+    this.messages = new Array(this.capacity)
+    this.metas = new Array(this.capacity)
+    this.head = 0
+    this.count = 0
+    this.scheduled = false
+    this.flushNow = () => this.flush()
 
-  formatMessage(level, message, meta = {}) {
-    const timestamp = new Date().toISOString()
-    const logEntry = {
-      timestamp,
-      level,
-      message,
-      ...meta
+    // Pre-bind every level: disabled ones never reach the buffer
+    for (let i = 0; i < LEVELS.length; i++) {
+      this[LEVELS[i]] = i <= this.currentLevel
+        ? (message, meta) => this.push(i, message, meta)
+        : noop
     }
 
-    if (isDevelopment) {
-      return `[${timestamp}] ${level.toUpperCase()}: ${message}`
+    if (typeof process !== 'undefined' && process.on) {
+      this.installExitHandlers()
+    }
+    // Like console.log, ignore a closed stdout (EPIPE) instead of crashing
+    if (stdout.on) {
+      stdout.on('error', noop)
     }
+  }
 
-    return JSON.stringify(logEntry)
+  isLevelEnabled(level) {
+    return this.levels[level] <= this.currentLevel
   }
 
-  log(level, message, meta = {}) {
-    if (this.levels[level] <= this.currentLevel) {
-      console.log(this.formatMessage(level, message, meta))
+  // Unknown levels are dropped like disabled ones; `this[level]` alone would
+  // throw, or reach methods such as flush() and push()
+  log(level, message, meta) {
+    if (Object.hasOwn(this.levels, level)) {
+      this[level](message, meta)
+    }
+  }
+
+  push(level, message, meta) {
+    if (this.count === this.capacity) {
+      this.flush()
+    }
+    const slot = (this.head + this.count) % this.capacity
+    this.times[slot] = Date.now()
+    this.levelIndex[slot] = level
+    this.messages[slot] = message
+    this.metas[slot] = meta
+    this.count++
+    if (!this.scheduled) {
+      this.scheduled = true
+      schedule(this.flushNow, flushInterval)
     }
   }
 
-  error(message, meta = {}) {
-    this.log('error', message, meta)
+  format(slot) {
+    const timestamp = new Date(this.times[slot]).toISOString()
+    const level = this.levelIndex[slot]
+    const message = this.messages[slot]
+    if (isDevelopment) {
+      return `[${timestamp}] ${LABELS[level]}: ${message}`
+    }
+    const meta = this.metas[slot]
+    return JSON.stringify(meta ? { timestamp, level: LEVELS[level], message, ...meta }
+      : { timestamp, level: LEVELS[level], message })
   }
 
-  warn(message, meta = {}) {
-    this.log('warn', message, meta)
+  drain() {
+    let chunk = ''
+    while (this.count > 0) {
+      const slot = this.head
+      try {
+        chunk += this.format(slot) + '\n'
+      } catch (error) {
+        chunk += JSON.stringify({ level: 'error', message: `unserializable log entry: ${error.message}` }) + '\n'
+      }
+      this.messages[slot] = undefined
+      this.metas[slot] = undefined
+      this.head = (this.head + 1) % this.capacity
+      this.count--
+    }
+    return chunk
   }
 
-  info(message, meta = {}) {
-    this.log('info', message, meta)
+  flush() {
+    this.scheduled = false
+    const chunk = this.drain()
+    if (chunk) {
+      stdout.write(chunk)
+    }
   }
 
-  debug(message, meta = {}) {
-    this.log('debug', message, meta)
+  installExitHandlers() {
+    const flush = () => this.flush()
+    process.on('exit', flush)
+    process.on('uncaughtExceptionMonitor', flush)
+    for (const signal of ['SIGTERM', 'SIGINT']) {
+      const onSignal = () => {
+        flush()
+        // Keep the default behaviour (exit) unless someone else handles it
+        if (process.listenerCount(signal) === 1) {
+          process.removeListener(signal, onSignal)
+          process.kill(process.pid, signal)
+        }
+      }
+      process.on(signal, onSignal)
+    }
   }
 }
 
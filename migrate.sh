@@ -8,6 +8,10 @@ set -e
 echo "🗄️ Sim Studio Database Migration"
 echo "================================="
 
+# Migrations need session-level features (advisory locks, prepared
+# statements), so they bypass the connection pooler
+export DATABASE_URL="${DIRECT_DATABASE_URL:-$DATABASE_URL}"
+
 # Check if DATABASE_URL is set
 if [ -z "$DATABASE_URL" ]; then
     echo "❌ DATABASE_URL environment variable is not set"
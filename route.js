@@ -1,39 +1,7 @@
 // app/health/route.js
-// Health check endpoint for the main application
+// Health check endpoint for the main application (same as /health/ready)
 
-export async function GET() {
-  try {
-    // Basic health checks
-    const checks = {
-      timestamp: new Date().toISOString(),
-      status: 'healthy',
-      version: process.env.npm_package_version || '1.0.0',
-      environment: process.env.NODE_ENV || 'development'
-    }
+export { GET } from './ready/route'
 
-    // Check database connection if available
-    if (process.env.DATABASE_URL) {
-      // Add database health check here
-      checks.database = 'connected'
-    }
-
-    return new Response(JSON.stringify(checks), {
-      status: 200,
-      headers: {
-        'Content-Type': 'application/json',
-        'Cache-Control': 'no-cache, no-store, must-revalidate'
-      }
-    })
-  } catch (error) {
-    return new Response(JSON.stringify({
-      status: 'error',
-      error: error.message,
-      timestamp: new Date().toISOString()
-    }), {
-      status: 500,
-      headers: {
-        'Content-Type': 'application/json'
-      }
-    })
-  }
-}
+export const dynamic = 'force-dynamic'
+export const runtime = 'nodejs'
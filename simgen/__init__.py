@@ -0,0 +1 @@
+# Generation helpers for the Sim Studio deployment on Render
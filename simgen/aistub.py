@@ -0,0 +1,233 @@
+# Stub AI providers for load tests
+#
+# An asyncio HTTP server answering the OpenAI (and OpenAI-compatible, e.g.
+# DeepSeek) chat completions, Anthropic messages and Google generateContent
+# APIs with canned text after a lognormal delay fitted to a p50/p95, the
+# shape real LLM latencies have, plus an optional share of stragglers (a
+# provider's queueing and retries) for tail-latency experiments. Streaming
+# requests get server-sent events spread over the same delay. Pointing the app's provider base URLs here
+# (docker-compose.loadtest.yml) makes workflow executions cost what they
+# cost the app, not what they cost the provider, and nothing is billed.
+
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter
+
+_Z95 = 1.6448536269514722
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class StubProvider:
+    """Stub of the AI provider APIs on ``host:port``.
+
+    ``latency_p50_ms``/``latency_p95_ms`` shape the response time, and a
+    ``tail_fraction`` of requests wait ``tail_ms`` longer. ``tokens`` is the
+    length of every completion and ``first_token`` the share of the delay
+    before a stream's first chunk::
+
+        async with StubProvider(port=8090) as stub:
+            ...  # OPENAI_BASE_URL=http://<host>:8090/v1
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_p50_ms=800, latency_p95_ms=3000,
+                 tokens=64, first_token=0.3, seed=None, tail_fraction=0.0, tail_ms=0.0):
+        if not 0 <= tail_fraction <= 1:
+            raise ValueError("tail_fraction must be between 0 and 1")
+        self.host = host
+        self.port = port
+        self.set_latency(latency_p50_ms, latency_p95_ms)
+        self.tail_fraction = tail_fraction
+        self.tail_ms = tail_ms
+        self.tokens = tokens
+        self.first_token = first_token
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.server = None
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._session, self.host, self.port,
+                                                 backlog=4096)
+        self.host, self.port = self.server.sockets[0].getsockname()[:2]
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.sleep(0)  # let the sessions see their connections close
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def set_latency(self, latency_p50_ms, latency_p95_ms):
+        """Change the latency distribution, e.g. to slow a provider mid-run."""
+        if not 0 < latency_p50_ms <= latency_p95_ms:
+            raise ValueError("latency must satisfy 0 < p50 <= p95")
+        self.mu = math.log(latency_p50_ms / 1000)
+        self.sigma = math.log(latency_p95_ms / latency_p50_ms) / _Z95
+
+    def delay(self):
+        delay = self.random.lognormvariate(self.mu, self.sigma)
+        if self.tail_fraction and self.random.random() < self.tail_fraction:
+            delay += self.tail_ms / 1000
+        return delay
+
+    async def _session(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length') or 0))
+                await self._handle(writer, method, target.split('?', 1)[0], body)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # shut down mid-request (nothing awaits connection handlers)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write((f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\n'
+                      'Content-Type: application/json\r\n'
+                      f'Content-Length: {len(body)}\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _stream(self, writer, events, delay):
+        # Server-sent events, chunked: the first after `first_token` of the
+        # delay, the rest evenly over the remainder
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n')
+        await asyncio.sleep(delay * self.first_token)
+        gap = delay * (1 - self.first_token) / max(1, len(events) - 1)
+        for i, event in enumerate(events):
+            if i:
+                await asyncio.sleep(gap)
+            data = event.encode('utf-8')
+            writer.write(f'{len(data):x}\r\n'.encode('latin-1') + data + b'\r\n')
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    def _text(self):
+        return ' '.join(['stub'] * self.tokens)
+
+    async def _handle(self, writer, method, path, body):
+        if method == 'GET' and path.rstrip('/').endswith('/models'):
+            return await self._respond(writer, 200, {'object': 'list', 'data': [
+                {'id': 'stub-model', 'object': 'model', 'owned_by': 'simgen'}]})
+        if method != 'POST':
+            return await self._respond(writer, 405, {'error': {'message': 'POST only'}})
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return await self._respond(writer, 400, {'error': {'message': 'invalid JSON'}})
+        model = request.get('model', 'stub-model')
+        stream = bool(request.get('stream'))
+        delay = self.delay()
+
+        if path.endswith('/chat/completions'):
+            self.requests['openai'] += 1
+            return await self._openai(writer, model, stream, delay)
+        if path.endswith('/messages'):
+            self.requests['anthropic'] += 1
+            return await self._anthropic(writer, model, stream, delay)
+        if ':generateContent' in path or ':streamGenerateContent' in path:
+            self.requests['google'] += 1
+            return await self._google(writer, ':stream' in path, delay)
+        self.requests['unknown'] += 1
+        return await self._respond(writer, 404, {'error': {'message': f'no stub for {path}'}})
+
+    async def _openai(self, writer, model, stream, delay):
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+        created = int(time.time())
+        usage = {'prompt_tokens': 32, 'completion_tokens': self.tokens,
+                 'total_tokens': 32 + self.tokens}
+        if not stream:
+            await asyncio.sleep(delay)
+            return await self._respond(writer, 200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': created,
+                'model': model, 'usage': usage,
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                    'role': 'assistant', 'content': self._text()}}]})
+
+        def chunk(delta, finish=None):
+            return 'data: ' + json.dumps({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                'model': model, 'choices': [{'index': 0, 'delta': delta,
+                                             'finish_reason': finish}]}) + '\n\n'
+        events = [chunk({'role': 'assistant', 'content': ''})]
+        events += [chunk({'content': 'stub '}) for _ in range(self.tokens)]
+        events += [chunk({}, 'stop'), 'data: [DONE]\n\n']
+        await self._stream(writer, events, delay)
+
+    async def _anthropic(self, writer, model, stream, delay):
+        message_id = f'msg_{uuid.uuid4().hex[:24]}'
+        if not stream:
+            await asyncio.sleep(delay)
+            return await self._respond(writer, 200, {
+                'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model,
+                'content': [{'type': 'text', 'text': self._text()}],
+                'stop_reason': 'end_turn', 'stop_sequence': None,
+                'usage': {'input_tokens': 32, 'output_tokens': self.tokens}})
+
+        def event(kind, data):
+            return f'event: {kind}\ndata: {json.dumps({"type": kind, **data})}\n\n'
+        events = [
+            event('message_start', {'message': {
+                'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model,
+                'content': [], 'stop_reason': None, 'stop_sequence': None,
+                'usage': {'input_tokens': 32, 'output_tokens': 0}}}),
+            event('content_block_start', {'index': 0, 'content_block': {'type': 'text',
+                                                                        'text': ''}}),
+        ]
+        events += [event('content_block_delta', {'index': 0, 'delta': {
+            'type': 'text_delta', 'text': 'stub '}}) for _ in range(self.tokens)]
+        events += [
+            event('content_block_stop', {'index': 0}),
+            event('message_delta', {'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                    'usage': {'output_tokens': self.tokens}}),
+            event('message_stop', {}),
+        ]
+        await self._stream(writer, events, delay)
+
+    async def _google(self, writer, stream, delay):
+        def response(text, finish=None):
+            candidate = {'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}
+            if finish:
+                candidate['finishReason'] = finish
+            return {'candidates': [candidate], 'usageMetadata': {
+                'promptTokenCount': 32, 'candidatesTokenCount': self.tokens,
+                'totalTokenCount': 32 + self.tokens}}
+        if not stream:
+            await asyncio.sleep(delay)
+            return await self._respond(writer, 200, response(self._text(), 'STOP'))
+        events = ['data: ' + json.dumps(response('stub ')) + '\n\n'
+                  for _ in range(self.tokens - 1)]
+        events.append('data: ' + json.dumps(response('stub', 'STOP')) + '\n\n')
+        await self._stream(writer, events, delay)
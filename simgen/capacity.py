@@ -0,0 +1,368 @@
+# Queueing-model capacity planner
+#
+# Sizes the deployment from a load profile instead of guesswork. Every
+# in-flight workflow execution holds a request "slot" (heap memory) on a web
+# instance for as long as its LLM provider calls take, so the web tier is an
+# M/M/c queue with c = instances x slots per instance. Erlang C is evaluated
+# for every candidate c of every plan at once with NumPy, then the chosen
+# size is checked by simulating the queue with the lognormal (heavy-tailed)
+# latencies actually measured, since M/M/c underestimates waits under such
+# tails. The realtime server is scaled out through the Redis adapter once
+# one event loop cannot keep up. The result (plans, autoscaling bounds and
+# targets, realtime instances, database plan) is returned as Settings, so it
+# feeds straight into blueprint generation. numpy is imported lazily.
+
+import json
+import math
+
+from simgen.settings import (DB_CONNECTION_LIMITS, DB_PLANS, REALTIME_POOL_SIZE,
+                             RESERVED_DB_CONNECTIONS, Settings)
+
+# Render instance types: (CPUs, memory MB, USD/month). `free` spins down
+# when idle and is not considered.
+SERVICE_PLANS = {
+    'starter': (0.5, 512, 7),
+    'standard': (1, 2048, 25),
+    'pro': (2, 4096, 85),
+    'pro plus': (4, 8192, 175),
+    'pro max': (4, 16384, 225),
+    'pro ultra': (8, 32768, 450),
+}
+
+MAX_INSTANCES = 100        # Render's limit for one service
+MEMORY_HEADROOM = 0.8      # share of plan memory the Node process may use
+WEB_BASE_MB = 200          # RSS of an idle Next.js standalone server
+REALTIME_BASE_MB = 80      # RSS of an idle Socket.IO server
+ADAPTER_US_PER_MESSAGE = 30  # Redis stream read + decode of one broadcast, per instance
+KEYVALUE_USD = 10          # Render Key Value starter
+
+_Z95 = 1.6448536269514722
+
+
+class LoadProfile:
+    """Expected load. Rates are per second, peak unless stated otherwise;
+    latencies are of a whole workflow execution (LLM calls included)."""
+
+    FIELDS = ('request_rate', 'base_rate', 'latency_p50_ms', 'latency_p95_ms',
+              'cpu_ms_per_request', 'memory_mb_per_request', 'db_ms_per_request',
+              'socket_clients', 'socket_messages_per_s', 'cpu_us_per_message',
+              'memory_kb_per_socket', 'max_wait_ms', 'target_cpu_percent', 'min_db_plan')
+
+    __slots__ = FIELDS
+
+    def __init__(self, request_rate, latency_p50_ms, latency_p95_ms, base_rate=None,
+                 cpu_ms_per_request=25, memory_mb_per_request=8, db_ms_per_request=20,
+                 socket_clients=0, socket_messages_per_s=0.5, cpu_us_per_message=150,
+                 memory_kb_per_socket=64, max_wait_ms=250, target_cpu_percent=70,
+                 min_db_plan='basic-1gb'):
+        self.request_rate = float(request_rate)
+        self.base_rate = self.request_rate / 4 if base_rate is None else float(base_rate)
+        self.latency_p50_ms = float(latency_p50_ms)
+        self.latency_p95_ms = float(latency_p95_ms)
+        self.cpu_ms_per_request = float(cpu_ms_per_request)
+        self.memory_mb_per_request = float(memory_mb_per_request)
+        self.db_ms_per_request = float(db_ms_per_request)
+        self.socket_clients = int(socket_clients)
+        self.socket_messages_per_s = float(socket_messages_per_s)
+        self.cpu_us_per_message = float(cpu_us_per_message)
+        self.memory_kb_per_socket = float(memory_kb_per_socket)
+        self.max_wait_ms = float(max_wait_ms)
+        self.target_cpu_percent = int(target_cpu_percent)
+        self.min_db_plan = min_db_plan
+
+        if self.request_rate <= 0:
+            raise ValueError(f"request_rate must be > 0 (got {request_rate})")
+        if not 0 < self.base_rate <= self.request_rate:
+            raise ValueError(f"base_rate must be in (0, request_rate] (got {base_rate})")
+        if not 0 < self.latency_p50_ms <= self.latency_p95_ms:
+            raise ValueError("latency must satisfy 0 < p50_ms <= p95_ms "
+                             f"(got {latency_p50_ms} and {latency_p95_ms})")
+        if self.memory_mb_per_request <= 0 or self.cpu_ms_per_request <= 0:
+            raise ValueError("memory_mb_per_request and cpu_ms_per_request must be > 0")
+        if not 1 <= self.target_cpu_percent <= 100:
+            raise ValueError(f"target_cpu_percent must be between 1 and 100 "
+                             f"(got {target_cpu_percent})")
+        if min_db_plan not in DB_PLANS:
+            raise ValueError(f"Invalid min_db_plan {min_db_plan!r} "
+                             f"(expected one of: {', '.join(DB_PLANS)})")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a profile from a mapping; ``latency`` may be given as a
+        nested ``{p50_ms, p95_ms}`` mapping."""
+        data = dict(data)
+        latency = data.pop('latency', None)
+        if isinstance(latency, dict):
+            data.setdefault('latency_p50_ms', latency.get('p50_ms'))
+            data.setdefault('latency_p95_ms', latency.get('p95_ms'))
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown load profile key(s): {', '.join(sorted(unknown))}")
+        missing = {'request_rate', 'latency_p50_ms', 'latency_p95_ms'} - {
+            key for key, value in data.items() if value is not None}
+        if missing:
+            raise ValueError(f"Load profile is missing: {', '.join(sorted(missing))}")
+        return cls(**{key: value for key, value in data.items() if value is not None})
+
+    @property
+    def latency_sigma(self):
+        """Shape of the lognormal fitted to the p50/p95 latencies."""
+        return math.log(self.latency_p95_ms / self.latency_p50_ms) / _Z95
+
+    @property
+    def mean_latency_s(self):
+        return self.latency_p50_ms / 1000 * math.exp(self.latency_sigma ** 2 / 2)
+
+
+def load_profile(path):
+    """Read a :class:`LoadProfile` from a YAML or JSON file."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith('.json'):
+        data = json.loads(text)
+    else:
+        from simgen.topology import load_yaml
+        data = load_yaml(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping of load profile keys")
+    return LoadProfile.from_dict(data)
+
+
+def erlang_c(offered_load, max_servers):
+    """Probability of queueing in an M/M/c queue for every c in
+    ``0..max_servers`` (1 where the queue is unstable), in one pass.
+
+    Works in log space: Erlang B is the last Poisson term over the running
+    log-sum-exp of all terms, which stays finite for thousands of servers.
+    """
+    import numpy as np
+
+    c = np.arange(max_servers + 1, dtype=float)
+    log_terms = c * math.log(offered_load) - np.concatenate(([0.0], np.cumsum(np.log(c[1:]))))
+    erlang_b = np.exp(log_terms - np.logaddexp.accumulate(log_terms))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = offered_load / c
+        wait = erlang_b / (1 - rho * (1 - erlang_b))
+    return np.where(rho < 1, wait, 1.0)
+
+
+def mmc_wait_quantile(arrival_rate, mean_service_s, servers, q=0.99):
+    """q-quantile of the queueing delay (s) of M/M/c for every server count
+    in ``0..servers`` (inf where unstable)."""
+    import numpy as np
+
+    queueing = erlang_c(arrival_rate * mean_service_s, servers)
+    c = np.arange(servers + 1)
+    drain = c / mean_service_s - arrival_rate  # rate at which the queue empties
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tail = np.log(queueing / (1 - q)) / drain
+    return np.where(drain > 0, np.maximum(tail, 0.0), np.inf)
+
+
+def simulate_wait(profile, servers, arrivals=20000, replications=8, seed=1, q=99):
+    """q-th percentile queueing delay (s) of an M/G/c queue with the
+    profile's lognormal latencies, simulated for all replications at once."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(1 / profile.request_rate, (replications, arrivals))
+    times = np.cumsum(gaps, axis=1)
+    service = rng.lognormal(math.log(profile.latency_p50_ms / 1000), profile.latency_sigma,
+                            (replications, arrivals))
+    free = np.zeros((replications, servers))
+    waits = np.empty((replications, arrivals))
+    rows = np.arange(replications)
+    for i in range(arrivals):
+        slot = free.argmin(axis=1)
+        start = np.maximum(times[:, i], free[rows, slot])
+        waits[:, i] = start - times[:, i]
+        free[rows, slot] = start + service[:, i]
+    # The first tenth is warm-up from an empty system
+    return float(np.percentile(waits[:, arrivals // 10:], q))
+
+
+class Plan:
+    """Sizing of every service, convertible to :class:`Settings`."""
+
+    __slots__ = ('web_plan', 'min_instances', 'max_instances', 'slots', 'target_cpu_percent',
+                 'target_memory_percent', 'wait_p99_ms', 'simulated_wait_p99_ms',
+                 'realtime_plan', 'realtime_instances', 'db_plan', 'db_connections', 'pool_per_instance',
+                 'realtime_pool', 'pgbouncer', 'monthly_usd', 'warnings')
+
+    def __init__(self, **values):
+        for key in self.__slots__:
+            setattr(self, key, values.get(key))
+        if self.warnings is None:
+            self.warnings = []
+
+    def settings(self, base=None):
+        """``base`` settings (domain, region, ...) with this plan applied.
+
+        The persistent disk is dropped when the web service may run more
+        than one instance, which Render does not allow with a disk.
+        """
+        base = base or Settings()
+        values = {field: getattr(base, field) for field in Settings.FIELDS}
+        values.update(plan=self.web_plan, num_instances=self.min_instances,
+                      max_instances=self.max_instances,
+                      target_cpu_percent=self.target_cpu_percent,
+                      target_memory_percent=self.target_memory_percent,
+                      realtime_plan=self.realtime_plan, db_plan=self.db_plan,
+                      pgbouncer=bool(self.pgbouncer),
+                      realtime_instances=self.realtime_instances,
+                      redis=self.realtime_instances > 1,
+                      db_pool_size=self.pool_per_instance)
+        if self.max_instances > 1:
+            values['disk_size_gb'] = 0
+        return Settings(**values)
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+def _instances_needed(profile, rate, slots, cpus, servers_needed):
+    """Instances per plan to provide ``servers_needed`` slots and keep CPU
+    under target. Node runs one event loop, so a process uses at most one
+    CPU whatever the plan offers."""
+    import numpy as np
+
+    usable_cpu = np.minimum(cpus, 1.0) * profile.target_cpu_percent / 100
+    by_cpu = np.ceil(rate * profile.cpu_ms_per_request / 1000 / usable_cpu)
+    with np.errstate(divide='ignore'):
+        by_slots = np.where(slots > 0, np.ceil(servers_needed / np.maximum(slots, 1)), np.inf)
+    return np.maximum(np.maximum(by_cpu, by_slots), 1)
+
+
+def _servers_for(profile, rate, max_servers):
+    """Fewest slots keeping the M/M/c p99 wait within the SLO."""
+    import numpy as np
+
+    waits = mmc_wait_quantile(rate, profile.mean_latency_s, max_servers)
+    ok = np.nonzero(waits <= profile.max_wait_ms / 1000)[0]
+    if not len(ok):
+        raise ValueError(f"{rate:g} req/s cannot be served within {profile.max_wait_ms:g}ms "
+                         f"by {max_servers} request slots")
+    return int(ok[0])
+
+
+def plan(profile, simulate=True):
+    """Size the web service, realtime server and database for ``profile``."""
+    import numpy as np
+
+    names = list(SERVICE_PLANS)
+    cpus = np.array([SERVICE_PLANS[name][0] for name in names], dtype=float)
+    memory = np.array([SERVICE_PLANS[name][1] for name in names], dtype=float)
+    price = np.array([SERVICE_PLANS[name][2] for name in names], dtype=float)
+    slots = np.floor((memory * MEMORY_HEADROOM - WEB_BASE_MB) / profile.memory_mb_per_request)
+
+    max_servers = int(slots.max()) * MAX_INSTANCES
+    peak_servers = _servers_for(profile, profile.request_rate, max_servers)
+    base_servers = _servers_for(profile, profile.base_rate, max_servers)
+    peak = _instances_needed(profile, profile.request_rate, slots, cpus, peak_servers)
+    base = _instances_needed(profile, profile.base_rate, slots, cpus, base_servers)
+
+    # Cheapest plan at peak; fewer instances break ties
+    cost = np.where(peak <= MAX_INSTANCES, peak * price, np.inf)
+    if not np.isfinite(cost).any():
+        raise ValueError(f"{profile.request_rate:g} req/s needs more than {MAX_INSTANCES} "
+                         "instances on every plan")
+    choice = int(np.lexsort((peak, cost))[0])
+    web_plan = names[choice]
+    per_instance = int(slots[choice])
+    max_instances = int(peak[choice])
+    min_instances = int(min(base[choice], max_instances))
+    warnings = []
+
+    waits = mmc_wait_quantile(profile.request_rate, profile.mean_latency_s,
+                              max_instances * per_instance)
+    wait_p99_ms = float(waits[-1]) * 1000
+    simulated = None
+    if simulate:
+        # Heavy latency tails queue more than M/M/c predicts: add instances
+        # until the simulated p99 wait meets the SLO
+        while True:
+            simulated = simulate_wait(profile, max_instances * per_instance) * 1000
+            if simulated <= profile.max_wait_ms or max_instances >= MAX_INSTANCES:
+                break
+            max_instances += 1
+        if simulated > profile.max_wait_ms:
+            warnings.append(f"simulated p99 wait {simulated:.0f}ms exceeds the "
+                            f"{profile.max_wait_ms:g}ms SLO at {MAX_INSTANCES} instances")
+
+    # Scale out on memory before the request slots run out
+    in_flight = profile.request_rate * profile.mean_latency_s / max_instances
+    used_mb = WEB_BASE_MB + in_flight * profile.memory_mb_per_request
+    target_memory = int(min(90, max(40, round(100 * used_mb / memory[choice]))))
+    if max_instances > 1:
+        warnings.append("the persistent disk is dropped: Render cannot attach a disk to a "
+                        "service running more than one instance (store uploads in object "
+                        "storage instead)")
+
+    # Realtime server: one event loop per instance, so a saturated instance
+    # is fixed by scaling out through the Redis adapter, not by a bigger
+    # plan. Every instance then also reads every broadcast from Redis.
+    # Cheapest (plan, instance count) over the whole grid; fewer instances
+    # break ties
+    messages = profile.socket_clients * profile.socket_messages_per_s
+    counts = np.arange(1, MAX_INSTANCES + 1, dtype=float)
+    rt_memory = (REALTIME_BASE_MB
+                 + profile.socket_clients / counts * profile.memory_kb_per_socket / 1024)
+    rt_cpu = (messages * profile.cpu_us_per_message / counts
+              + np.where(counts > 1, messages * ADAPTER_US_PER_MESSAGE, 0.0)) / 1e6
+    fits = ((memory[:, None] * MEMORY_HEADROOM >= rt_memory)
+            & (np.minimum(cpus, 1.0)[:, None] * profile.target_cpu_percent / 100 >= rt_cpu))
+    rt_cost = np.where(fits, price[:, None] * counts + np.where(counts > 1, KEYVALUE_USD, 0),
+                       np.inf)
+    if np.isfinite(rt_cost).any():
+        index = int(np.lexsort((np.broadcast_to(counts, rt_cost.shape).ravel(),
+                                rt_cost.ravel()))[0])
+        realtime_plan = names[index // len(counts)]
+        realtime_instances = int(counts[index % len(counts)])
+        realtime_usd = float(rt_cost.flat[index])
+    else:
+        realtime_plan, realtime_instances = names[-1], MAX_INSTANCES
+        realtime_usd = price[-1] * MAX_INSTANCES + KEYVALUE_USD
+        warnings.append(f"{messages:,.0f} broadcasts/s exceed what {MAX_INSTANCES} realtime "
+                        "instances can carry on any plan (every instance reads every broadcast "
+                        "from Redis); shard rooms across separate realtime services")
+    if realtime_instances > 1:
+        warnings.append(f"the realtime server runs {realtime_instances} instances: Socket.IO "
+                        "broadcasts go through the Redis adapter (clients must connect with "
+                        "the websocket transport, as there are no sticky sessions)")
+
+    # Database connection budget: Little's law on the time each request
+    # holds a connection, doubled for bursts, sets each web instance's pool
+    # (DATABASE_POOL_SIZE). Without a pooler every process may fill its
+    # whole pool, plus lib/health.js's one; when that exceeds the smallest
+    # allowed plan, PgBouncer is cheaper than a bigger database bought only
+    # for connections. Transaction pooling then only needs server
+    # connections for the transactions in flight (and one realtime pool),
+    # on top of the connections pool_sizes() keeps out of PgBouncer
+    transactions = 2 * profile.request_rate * profile.db_ms_per_request / 1000
+    pool = max(2, math.ceil(transactions / max_instances))
+    realtime_pools = realtime_instances * REALTIME_POOL_SIZE
+    direct = max_instances * (pool + 1) + realtime_pools + RESERVED_DB_CONNECTIONS
+    pgbouncer = direct > DB_CONNECTION_LIMITS[profile.min_db_plan]
+    server = math.ceil(transactions) + REALTIME_POOL_SIZE + 2 * RESERVED_DB_CONNECTIONS
+    connections = server if pgbouncer else direct
+    candidates = DB_PLANS[DB_PLANS.index(profile.min_db_plan):]
+    db_plan = next((name for name in candidates if DB_CONNECTION_LIMITS[name] >= connections),
+                   None)
+    if db_plan is None:
+        db_plan = candidates[-1]
+        warnings.append(f"{connections} database connections exceed every plan's limit")
+    if pgbouncer:
+        warnings.append(f"up to {direct} client connections: both services go through "
+                        "PgBouncer (transaction pooling)")
+
+    return Plan(web_plan=web_plan, min_instances=min_instances, max_instances=max_instances,
+                slots=per_instance, target_cpu_percent=profile.target_cpu_percent,
+                target_memory_percent=target_memory, wait_p99_ms=round(wait_p99_ms, 1),
+                simulated_wait_p99_ms=None if simulated is None else round(simulated, 1),
+                realtime_plan=realtime_plan, realtime_instances=realtime_instances,
+                db_plan=db_plan, db_connections=connections,
+                pool_per_instance=pool, realtime_pool=REALTIME_POOL_SIZE, pgbouncer=pgbouncer,
+                monthly_usd=int(max_instances * price[choice]
+                                + realtime_usd
+                                + (SERVICE_PLANS['starter'][2] if pgbouncer else 0)),
+                warnings=warnings)
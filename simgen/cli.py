@@ -0,0 +1,1102 @@
+# Command line entry point: python -m simgen <command>
+#
+# Only argparse is imported up front. Each subcommand imports what it needs
+# when it runs, so `--help` and plain config generation never pay for
+# plotly/numpy.
+
+import argparse
+import sys
+
+
+def _print_results(results):
+    for path, action in results.items():
+        if action == 'unchanged':
+            print(f"⏭️  Unchanged {path}")
+        else:
+            print(f"✅ {action.capitalize()} {path}")
+    changed = sum(1 for action in results.values() if action != 'unchanged')
+    print(f"\n🎉 Generated {len(results)} files ({changed} changed)")
+
+
+def _settings(args):
+    from simgen.settings import Settings
+    return Settings(domain=args.domain, region=args.region, plan=args.plan,
+                    num_instances=args.instances, disk_size_gb=args.disk_size,
+                    max_instances=args.max_instances, realtime_plan=args.realtime_plan,
+                    db_plan=args.db_plan, pgbouncer=args.pgbouncer,
+                    realtime_instances=args.realtime_instances,
+                    redis=args.redis or args.realtime_instances > 1,
+                    llm_gateway=args.llm_gateway or args.gateway_disk_size > 0,
+                    gateway_disk_size_gb=args.gateway_disk_size,
+                    db_pool_size=args.db_pool_size)
+
+
+def _print_plan(plan):
+    scaling = (f"{plan.min_instances}-{plan.max_instances} instances "
+               f"(CPU {plan.target_cpu_percent}%, memory {plan.target_memory_percent}%)"
+               if plan.max_instances > plan.min_instances else
+               f"{plan.max_instances} instance{'s' if plan.max_instances > 1 else ''}")
+    print(f"🧮 simstudio: {plan.web_plan}, {scaling}, {plan.slots} request slots each")
+    simulated = ('' if plan.simulated_wait_p99_ms is None
+                 else f", simulated {plan.simulated_wait_p99_ms:.0f}ms")
+    print(f"   p99 queueing delay at peak: M/M/c {plan.wait_p99_ms:.0f}ms{simulated}")
+    print(f"🧮 realtime-server: {plan.realtime_plan}"
+          + (f", {plan.realtime_instances} instances through Redis"
+             if plan.realtime_instances > 1 else ''))
+    print(f"🧮 simstudio-db: {plan.db_plan}, {plan.db_connections} "
+          + ("server connections through PgBouncer " if plan.pgbouncer else "connections ")
+          + f"({plan.pool_per_instance} per web instance, {plan.realtime_pool} per realtime "
+          "instance)")
+    print(f"💵 ~${plan.monthly_usd}/month for the services at peak")
+    for warning in plan.warnings:
+        print(f"⚠️  {warning}")
+
+
+def cmd_generate(args):
+    from simgen.pipeline import generate
+    settings = _settings(args)
+    if args.profile:
+        from simgen.capacity import load_profile, plan
+        capacity = plan(load_profile(args.profile))
+        settings = capacity.settings(settings)
+        if not args.quiet:
+            _print_plan(capacity)
+            print()
+    results = generate(args.out, names=args.only or None, diagram=args.diagram, jobs=args.jobs,
+                       settings=settings)
+    if not args.quiet:
+        _print_results(results)
+        if any(path.startswith('Dockerfile') for path in results):
+            from simgen.images import budget_summary
+            print(f"📦 Image size budgets: {budget_summary()} (check with `simgen images`)")
+    return 0
+
+
+def cmd_diagram(args):
+    import os
+    from simgen.export import DEFAULT_CACHE_DIR, DiagramSpec, ExportSession
+
+    if args.output:
+        out_dir, filename = os.path.split(args.output)
+        name, ext = os.path.splitext(filename)
+        formats = [ext.lstrip('.').lower() or 'png']
+    else:
+        out_dir, name, formats = args.out_dir, args.name, args.formats
+    topology = None
+    if args.blueprint:
+        from simgen.topology import load_files
+        topology = load_files(args.blueprint, args.compose)
+    spec = DiagramSpec(name=name, topology=topology, layout=args.layout)
+
+    with ExportSession(cache_dir=args.cache_dir or DEFAULT_CACHE_DIR, jobs=args.jobs,
+                       width=args.width, height=args.height, scale=args.scale,
+                       use_cache=not args.no_cache) as session:
+        results = session.export([spec], formats, out_dir=out_dir or '.')
+    _print_results(results)
+    print(f"🖼️  {session.stats['rendered']} rendered, {session.stats['cached']} from cache")
+    return 0
+
+
+def cmd_batch(args):
+    import time
+    from simgen.tenants import archive_format_for, load_tenants, write_archive
+
+    tenants = load_tenants(args.tenants)
+    fmt = args.format or archive_format_for(args.output)
+    start = time.perf_counter()
+    if args.output == '-':
+        counts = write_archive(tenants, sys.stdout.buffer, fmt)
+    else:
+        with open(args.output, 'wb') as f:
+            counts = write_archive(tenants, f, fmt)
+    elapsed = time.perf_counter() - start
+    target = '' if args.output == '-' else f" → {args.output}"
+    print(f"🎉 Rendered {counts[1]} files for {counts[0]} tenants in {elapsed:.2f}s{target}",
+          file=sys.stderr)
+    return 0
+
+
+def cmd_validate(args):
+    from simgen.topology import default_topology, load_files, validate
+
+    if args.blueprint:
+        topology = load_files(args.blueprint, args.compose)
+    else:
+        topology = default_topology(_settings(args))
+    problems = validate(topology)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print(f"✅ {len(topology)} services, {len(topology.links)} links: no problems found")
+    return 0
+
+
+def cmd_probe(args):
+    import json
+    import time
+    from simgen import probe
+
+    targets = [probe.Target.from_url(url) for url in args.urls]
+    if args.targets:
+        targets += probe.load_targets(args.targets)
+    if args.tenants:
+        from simgen.tenants import load_tenants
+        targets += probe.tenant_targets(load_tenants(args.tenants))
+    if not targets:
+        from simgen.topology import default_topology
+        targets = probe.local_targets(default_topology())
+        if not any(t.scheme not in ('http', 'https') for t in targets) and not args.json:
+            print("⚠️ DATABASE_URL not set, skipping database check")
+
+    start = time.perf_counter()
+    results, opened = probe.run(targets, samples=args.samples, timeout=args.timeout,
+                                retries=args.retries, backoff=args.backoff,
+                                concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if not result.ok]
+
+    if args.json:
+        print(json.dumps({'ok': not failed, 'elapsed_s': round(elapsed, 3),
+                          'connections': opened,
+                          'targets': [result.as_dict() for result in results]}, indent=2))
+        return 1 if failed else 0
+
+    width = max(len(result.target.label) for result in results) if results else 0
+    for result in results:
+        info = result.as_dict()
+        if result.ok:
+            if result.status is not None:
+                status = f"HTTP {result.status}"
+            else:
+                status = 'SELECT 1' if result.target.scheme == 'postgres' else 'open'
+            print(f"✅ {result.target.label:<{width}}  {status:<8} p50 {info['p50_ms']:.1f}ms  "
+                  f"p95 {info['p95_ms']:.1f}ms  p99 {info['p99_ms']:.1f}ms  "
+                  f"(n={info['samples']})")
+            if info['phases']:
+                print(' ' * (width + 5) + '  '.join(
+                    f"{phase} {times['p50_ms']:.1f}ms" for phase, times in info['phases'].items()))
+        else:
+            print(f"❌ {result.target.label:<{width}}  {result.target.url}: {result.error} "
+                  f"({result.attempts} attempts)")
+    print(f"\n{len(results)} targets probed in {elapsed:.2f}s over {opened} connections")
+    if failed:
+        print(f"❌ {len(failed)} of {len(results)} health checks failed")
+        return 1
+    print("🎉 All health checks passed!")
+    return 0
+
+
+def cmd_logs(args):
+    import json
+    import time
+    from simgen.logstats import analyze, route_table
+
+    start = time.perf_counter()
+    rollup, parsed = analyze(args.logfile, jobs=args.jobs, state_path=args.state,
+                             normalize=not args.raw_routes)
+    elapsed = time.perf_counter() - start
+    rows = route_table(rollup, sort=args.sort, top=args.top)
+    bursts = rollup.error_bursts(args.burst_threshold)
+
+    if args.json:
+        print(json.dumps({'lines': rollup.lines, 'skipped': rollup.skipped,
+                          'levels': dict(rollup.levels), 'routes': rows,
+                          'bursts': [{'from': a, 'to': b, 'errors': n} for a, b, n in bursts]},
+                         indent=2))
+        return 0
+
+    def ms(value):
+        return '-' if value is None else f"{value:.1f}ms"
+
+    print(f"📊 {rollup.lines:,} entries ({rollup.skipped:,} skipped), "
+          f"{parsed / 1e6:.1f}MB parsed in {elapsed:.2f}s")
+    print("   " + ', '.join(f"{level}: {count:,}" for level, count in rollup.levels.most_common()))
+    if rows:
+        width = max(5, max(len(row['route']) for row in rows))
+        print(f"\n{'route':<{width}} {'count':>9} {'errors':>7} {'p50':>9} {'p95':>9} "
+              f"{'p99':>9} {'max':>9}")
+        for row in rows:
+            print(f"{row['route']:<{width}} {row['count']:>9,} {row['errors']:>7,} "
+                  f"{ms(row['p50_ms']):>9} {ms(row['p95_ms']):>9} {ms(row['p99_ms']):>9} "
+                  f"{ms(row['max_ms']):>9}")
+    if bursts:
+        print("\n🔥 Error bursts:")
+        for first, last, errors in bursts[:args.top]:
+            span = first if first == last else f"{first} → {last[11:]}"
+            print(f"   {span}  {errors:,} errors")
+    return 0
+
+
+def cmd_images(args):
+    import json
+    from simgen.images import MB, inspect
+
+    reports = [inspect(args.main, 'Dockerfile'),
+               inspect(args.realtime, 'Dockerfile.realtime')]
+    over = [report for report in reports if report.over_budget]
+    if args.json:
+        print(json.dumps([report.as_dict(args.top) for report in reports], indent=2))
+        return 1 if over else 0
+
+    for report in reports:
+        icon = '❌' if report.over_budget else '✅'
+        print(f"{icon} {report.image} ({report.dockerfile}): {report.size / MB:.1f}MB "
+              f"of {report.budget / MB:.0f}MB budget")
+        for layer in report.largest_layers(args.top):
+            print(f"   {layer.size / MB:>8.1f}MB  {layer.instruction[:90]}")
+    if over:
+        print(f"\n❌ {len(over)} of {len(reports)} images over budget")
+        return 1
+    print("\n🎉 All images within budget!")
+    return 0
+
+
+def cmd_context(args):
+    import json
+    import os
+    from simgen import context
+
+    def mb(size):
+        return f"{size / 1e6:.1f}MB"
+
+    if args.compare:
+        old_rev = args.compare[0]
+        new_rev = args.compare[1] if len(args.compare) > 1 else context.WORKTREE
+    else:
+        old_rev = new_rev = None
+    current = context.load(args.root, new_rev or context.WORKTREE)
+    dockerfiles = args.dockerfile or [name for name in context.DEFAULT_DOCKERFILES
+                                      if current.read(name) is not None]
+
+    if old_rev is None:
+        copies = {}
+        for name in dockerfiles:
+            text = current.read(name)
+            if text is None:
+                raise ValueError(f"No {name} in {args.root}")
+            copies[name] = [(instruction.text, context.copy_files(current, instruction.sources))
+                            for instruction in context.parse_dockerfile(text)
+                            if instruction.sources is not None]
+        unanchored = current.unanchored()
+        if args.json:
+            print(json.dumps({
+                'files': len(current), 'bytes': current.size, 'pruned': current.pruned,
+                'largest_files': current.largest_files(args.top),
+                'largest_directories': current.largest_directories(args.top),
+                'unanchored': [{'pattern': pattern, 'path': path, 'bytes': size}
+                               for pattern, path, size in unanchored],
+                'copies': {name: [{'instruction': text, 'files': len(paths),
+                                   'bytes': sum(current.files[path][0] for path in paths)}
+                                  for text, paths in steps]
+                           for name, steps in copies.items()},
+            }, indent=2))
+            return 0
+
+        print(f"📦 Build context {os.path.abspath(args.root)}: {len(current):,} files, "
+              f"{mb(current.size)} ({len(current.pruned)} directories skipped by .dockerignore)")
+        print("\nLargest directories:")
+        for path, size in current.largest_directories(args.top):
+            print(f"   {mb(size):>10}  {path}/")
+        print("\nLargest files:")
+        for path, size in current.largest_files(args.top):
+            print(f"   {mb(size):>10}  {path}")
+        for name, steps in copies.items():
+            print(f"\n📄 {name}")
+            for text, paths in steps:
+                size = sum(current.files[path][0] for path in paths)
+                print(f"   {len(paths):>7,} files {mb(size):>10}  {text[:70]}")
+        for pattern, path, size in unanchored[:args.top]:
+            print(f"⚠️  {path} ({mb(size)}) is sent: '{pattern}' only matches at the context "
+                  f"root, use '**/{pattern}'")
+        return 0
+
+    previous = context.load(args.root, old_rev)
+    results = {}
+    for name in dockerfiles:
+        old_text, new_text = previous.read(name), current.read(name)
+        if old_text is None or new_text is None:
+            missing = old_rev if old_text is None else new_rev
+            raise ValueError(f"No {name} in {missing}")
+        old_steps = context.cache_keys(previous, old_text, jobs=args.jobs)
+        new_steps = context.cache_keys(current, new_text, jobs=args.jobs)
+        results[name] = context.predict(old_steps, new_steps)
+
+    if args.json:
+        print(json.dumps({name: [{'line': step.instruction.lineno, 'stage': step.instruction.stage,
+                                  'instruction': step.instruction.text, 'cached': cached,
+                                  'changed': changed}
+                                 for step, cached, changed in report]
+                          for name, report in results.items()}, indent=2))
+        return 0
+
+    for name, report in results.items():
+        print(f"📄 {name} ({old_rev} → {new_rev})")
+        width = max(len(step.instruction.stage) for step, _, _ in report)
+        for step, cached, changed in report:
+            icon = '✅' if cached else '🔨'
+            print(f"   {icon} {step.instruction.stage:<{width}}  {step.instruction.text[:70]}")
+            if changed:
+                shown = ', '.join(changed[:5]) + (f" (+{len(changed) - 5} more)" if len(changed) > 5 else '')
+                print(f"      {' ' * width}  changed: {shown}")
+        hits = sum(1 for _, cached, _ in report if cached)
+        print(f"   {hits} of {len(report)} instructions cached\n")
+    return 0
+
+
+def cmd_plan(args):
+    import json
+    from simgen.capacity import load_profile, plan
+
+    capacity = plan(load_profile(args.profile), simulate=not args.no_simulation)
+    if args.json:
+        print(json.dumps(capacity.as_dict(), indent=2))
+    else:
+        _print_plan(capacity)
+    return 0
+
+
+def cmd_fanout(args):
+    import asyncio
+    import json
+    import os
+    from simgen import fanout
+
+    auth = json.loads(args.auth) if args.auth else None
+    config = fanout.FanoutConfig(
+        url=args.url, clients=args.clients, rooms=args.rooms, rate=args.rate,
+        duration=args.duration, connect_concurrency=args.connect_concurrency,
+        drain=args.drain, join_event=args.join_event, edit_event=args.edit_event,
+        receive_event=args.receive_event, room_key=args.room_key, auth=auth, seed=args.seed)
+    progress = None if args.json else (lambda message: print(f"📡 {message}"))
+
+    async def run():
+        memory = None
+        if args.memory == 'metrics':
+            memory = fanout.MemorySampler(
+                'metrics', lambda: fanout.metrics_memory(args.metrics_url, os.environ.get('METRICS_TOKEN')),
+                args.sample_interval)
+        elif args.memory == 'docker' and not args.stub:
+            container = args.container or fanout.compose_container()
+            if container:
+                memory = fanout.MemorySampler(
+                    'docker', lambda: fanout.docker_memory(container), args.sample_interval)
+            elif progress:
+                progress("realtime container not found, not sampling memory")
+        if not args.stub:
+            return await fanout.run_fanout(config, memory=memory, progress=progress)
+        from simgen.sockio import StubServer
+        async with StubServer(args.join_event, args.edit_event, args.room_key) as stub:
+            config.url = stub.url
+            return await fanout.run_fanout(config, memory=memory, progress=progress)
+
+    report = asyncio.run(run())
+    if args.output:
+        fanout.save_report(report, args.output)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if report['connections']['connected'] else 1
+
+    def ms(value):
+        return '-' if value is None else f"{value:.1f}ms"
+
+    conn, edits, latency = report['connections'], report['edits'], report['latency_ms']
+    print(f"\n🔌 {conn['connected']:,}/{conn['requested']:,} clients connected in "
+          f"{conn['connect_s']:.1f}s (p50 {ms(conn['connect_p50_ms'])}, "
+          f"p99 {ms(conn['connect_p99_ms'])}), {conn['disconnected']} dropped mid-run")
+    print(f"✏️  {edits['sent']:,} edits at {edits['achieved_rate']:g}/s "
+          f"(target {edits['target_rate']:g}/s, max send lag {ms(edits['max_send_lag_ms'])})")
+    drop_rate = edits['drop_rate'] or 0
+    print(f"📬 {edits['delivered']:,}/{edits['expected_deliveries']:,} deliveries, "
+          f"{edits['dropped']:,} dropped ({drop_rate:.2%}), {edits['duplicates']:,} duplicates")
+    print(f"⏱️  broadcast latency p50 {ms(latency['p50'])}  p90 {ms(latency['p90'])}  "
+          f"p99 {ms(latency['p99'])}  p99.9 {ms(latency['p99.9'])}  max {ms(latency['max'])}")
+    memory = report['memory']
+    if memory and memory['samples']:
+        print(f"🧠 server memory {memory['start_bytes'] / 1e6:.1f}MB → "
+              f"{memory['end_bytes'] / 1e6:.1f}MB (peak {memory['peak_bytes'] / 1e6:.1f}MB, "
+              f"{memory['growth_bytes'] / 1e6:+.1f}MB, {memory['source']})")
+    for error, count in report['errors'].items():
+        print(f"⚠️  {count:,} × {error}")
+    if args.output:
+        print(f"📝 Report written to {args.output}")
+    return 0 if conn['connected'] else 1
+
+
+def cmd_load(args):
+    import asyncio
+    import json
+    from simgen import loadtest
+
+    if args.rate is not None and args.users is not None:
+        raise ValueError("--rate (open loop) and --users (closed loop) exclude each other")
+    overrides = {}
+    if args.rate is not None or args.users is not None:
+        key, target = ('rate', args.rate) if args.rate is not None else ('users', args.users)
+        if args.mode and args.mode != ('open' if key == 'rate' else 'closed'):
+            raise ValueError(f"--{key} does not run in {args.mode} mode")
+        overrides['mode'] = 'open' if key == 'rate' else 'closed'
+        overrides['stages'] = [{'duration': args.ramp, key: target},
+                               {'duration': args.duration, key: target}]
+    elif args.mode:
+        raise ValueError("--mode needs --rate or --users")
+    if args.url:
+        overrides['base_url'] = args.url
+    if args.connections:
+        overrides['connections'] = args.connections
+    if args.think_ms is not None:
+        overrides['think_ms'] = args.think_ms
+    if args.scenario:
+        scenario = loadtest.load_scenario(args.scenario, overrides=overrides)
+    else:
+        scenario = loadtest.Scenario.from_dict({**loadtest.DEFAULT_SCENARIO, **overrides})
+    progress = None if args.json else (lambda message: print(f"🚦 {message}"))
+    if progress:
+        for name, missing in scenario.skipped.items():
+            progress(f"skipping {name} (set {', '.join(missing)})")
+
+    async def run():
+        if not args.stub_ai:
+            return await loadtest.run_load(scenario, seed=args.seed, progress=progress)
+        from simgen.aistub import StubProvider
+        async with StubProvider('0.0.0.0', args.stub_ai_port, args.stub_ai_p50,
+                                args.stub_ai_p95, seed=args.seed) as stub:
+            if progress:
+                progress(f"stub AI providers on port {stub.port} "
+                         f"(p50 {args.stub_ai_p50:g}ms, p95 {args.stub_ai_p95:g}ms)")
+            report = await loadtest.run_load(scenario, seed=args.seed, progress=progress)
+            report['ai_stub'] = dict(stub.requests)
+            return report
+
+    report = asyncio.run(run())
+    if args.output:
+        loadtest.save_report(report, args.output)
+    passed = report['slo']['passed']
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if passed else 1
+
+    def ms(value):
+        return '-' if value is None else f"{value:.1f}ms"
+
+    print(f"\n{'name':<14} {'count':>8} {'err%':>7} {'rps':>8} {'p50':>10} {'p95':>10} "
+          f"{'p99':>10} {'max':>10}")
+    rows = list(report['requests'].items()) + [('overall', report['overall'])]
+    for name, summary in rows:
+        latency = summary['latency_ms']
+        print(f"{name:<14} {summary['count']:>8,} {(summary['error_rate'] or 0):>7.2%} "
+              f"{summary['rps'] or 0:>8.1f} {ms(latency['p50']):>10} {ms(latency['p95']):>10} "
+              f"{ms(latency['p99']):>10} {ms(latency['max']):>10}")
+    for name, summary in report['requests'].items():
+        for failure, count in summary['failures'].items():
+            print(f"⚠️  {name}: {count:,} × {failure}")
+    generator = report['generator']
+    if generator['shed']:
+        print(f"⚠️  {generator['shed']:,} arrivals dropped by the generator (max in-flight "
+              f"reached): raise max_in_flight or use more load machines")
+    if report.get('ai_stub'):
+        print("🤖 stub AI requests: " + ', '.join(f"{provider} {count:,}" for provider, count
+                                                  in report['ai_stub'].items()))
+    print()
+    for check in report['slo']['checks']:
+        actual = '-' if check['actual'] is None else f"{check['actual']:g}"
+        print(f"{'✅' if check['ok'] else '❌'} {check['scope']} {check['metric']} "
+              f"{actual} (limit {check['limit']:g})")
+    print(f"{'✅ SLOs met' if passed else '❌ SLOs missed'}"
+          + (f"; report written to {args.output}" if args.output else ''))
+    return 0 if passed else 1
+
+
+def _print_trace(summary):
+    print(f"   {summary['requests']:,} requests over {summary['span_s']:,.0f}s from "
+          f"{summary['start'] or '-'}, {summary['sessions']:,} sessions")
+    if summary['mean_rps']:
+        print(f"   {summary['mean_rps']:g} req/s on average, {summary['peak_rps']:,} in the "
+              f"busiest second (burstiness {summary['burstiness']:g}), peak concurrency "
+              f"{summary['peak_concurrency']:,}, {summary['long_requests']:,} requests ≥ 10s")
+    for route, count in summary['routes'].items():
+        print(f"   {count:>9,}  {route}")
+
+
+def cmd_gateway(args):
+    import asyncio
+    import importlib.util
+    import os
+    from simgen.gateway import UPSTREAMS, Gateway, load_routes
+
+    if importlib.util.find_spec('httpx') is None:
+        raise ValueError("The gateway needs httpx: pip install 'httpx[http2]'")
+    defaults = Gateway.from_env()
+    upstreams = defaults.upstreams
+    for mapping in args.upstream:
+        provider, sep, url = mapping.partition('=')
+        if not sep or provider not in UPSTREAMS:
+            raise ValueError(f"Invalid --upstream {mapping!r} (expected PROVIDER=URL with "
+                             f"PROVIDER one of: {', '.join(UPSTREAMS)})")
+        upstreams[provider] = url
+    disk_cache = args.disk_cache or os.environ.get('GATEWAY_DISK_CACHE') or None
+    routes = load_routes(args.routes) if args.routes else defaults.router.routes
+    keys = dict.fromkeys(UPSTREAMS, 'stub') if args.stub else defaults.router.keys
+
+    async def run():
+        gateway = Gateway(args.host, args.port, upstreams, ttl=args.ttl,
+                          cache_entries=args.cache_entries, cache_bytes=args.cache_mb << 20,
+                          disk_cache=disk_cache, connections=args.connections, routes=routes,
+                          api_keys=keys, hedge=not args.no_hedge,
+                          hedge_quantile=args.hedge_quantile, hedge_budget=args.hedge_budget,
+                          half_life=args.half_life)
+        if not args.stub:
+            return await gateway.serve_forever()
+        from simgen.aistub import StubProvider
+        async with StubProvider(port=args.stub_port, latency_p50_ms=args.stub_p50,
+                                latency_p95_ms=args.stub_p95, tail_fraction=args.stub_tail_fraction,
+                                tail_ms=args.stub_tail_ms) as stub:
+            gateway.upstreams = dict.fromkeys(UPSTREAMS, stub.url)
+            print(f"🤖 stub AI providers on {stub.url} "
+                  f"(p50 {args.stub_p50:g}ms, p95 {args.stub_p95:g}ms)")
+            try:
+                await gateway.serve_forever()
+            finally:
+                print(f"🤖 upstream requests: {dict(stub.requests)}")
+
+    print("🔀 " + ', '.join(f"/{provider} -> {url}" for provider, url in (
+        upstreams.items() if not args.stub else [('*', 'stub')])))
+    for model, targets in routes.items():
+        print(f"🔀 {model}: " + ', '.join(f"{provider}:{name}" for provider, name in targets))
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_capture(args):
+    import json
+    from simgen.trace import capture
+
+    trace, lines, skipped = capture(args.logfiles)
+    if args.offset or args.span:
+        trace = trace.window(args.offset, args.span)
+    if not len(trace):
+        raise ValueError(f"No request logs found in {lines:,} lines")
+    size = trace.save(args.output)
+    summary = trace.summary(args.top)
+    if args.json:
+        print(json.dumps({'lines': lines, 'skipped': skipped, 'bytes': size, **summary},
+                         indent=2))
+        return 0
+    print(f"🎞️  {len(trace):,} requests from {lines:,} lines ({skipped:,} not requests) → "
+          f"{args.output} ({size / 1024:,.1f}KB, {size / len(trace):.1f} bytes/request)")
+    _print_trace(summary)
+    return 0
+
+
+def cmd_replay(args):
+    import asyncio
+    import json
+    from simgen import trace as traces
+
+    trace = traces.Trace.load(args.trace)
+    if args.offset or args.span:
+        trace = trace.window(args.offset, args.span)
+    if not len(trace):
+        raise ValueError("The trace (window) has no requests")
+    if args.dry_run:
+        summary = trace.summary(args.top)
+        print(json.dumps(summary, indent=2) if args.json else f"🎞️  {args.trace}")
+        if not args.json:
+            _print_trace(summary)
+        return 0
+    rewrites = []
+    for rule in args.map or []:
+        old, sep, new = rule.partition('=')
+        if not sep or not old:
+            raise ValueError(f"Invalid --map {rule!r} (expected OLD=NEW)")
+        rewrites.append((old, new))
+    headers = {}
+    for header in args.header or []:
+        key, sep, value = header.partition(':')
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid --header {header!r} (expected 'Name: value')")
+        headers[key.strip()] = value.strip()
+    progress = None if args.json else (lambda message: print(f"🎞️  {message}"))
+    report = asyncio.run(traces.replay(trace, args.url, speed=args.speed,
+                                       connections=args.connections, rewrites=rewrites,
+                                       headers=headers, timeout=args.timeout,
+                                       progress=progress))
+    if args.output:
+        from simgen.loadtest import save_report
+        save_report(report, args.output)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    def ms(value):
+        return '-' if value is None else f"{value:.1f}"
+
+    rows = sorted(report['diff'].items(), key=lambda item: -item[1]['captured'])[:args.top]
+    rows.append(('overall', report['diff_overall']))
+    width = max(7, max(len(route) for route, _ in rows))
+    print(f"\n{'route':<{width}} {'n (log/replay)':>15} {'p50 ms':>15} {'p95 ms':>15} "
+          f"{'p99 ms':>15} {'KS':>6}  verdict")
+    for route, row in rows:
+        cells = [f"{ms(a)}/{ms(b)}" for a, b in (row['p50_ms'], row['p95_ms'], row['p99_ms'])]
+        ks = '-' if row['ks'] is None else f"{row['ks']:.3f}"
+        print(f"{route:<{width}} {row['captured']:>7,}/{row['replayed']:<7,} {cells[0]:>15} "
+              f"{cells[1]:>15} {cells[2]:>15} {ks:>6}  {row['verdict']}")
+    overall = report['overall']
+    concurrency = report['concurrency']
+    print(f"\n⏱️  {overall['count']:,} requests in {report['duration_s']:,.1f}s at "
+          f"{report['speed']:g}×, {overall['errors']:,} failed (5xx or no answer); peak "
+          f"concurrency {concurrency['replay_peak']:,} (captured: "
+          f"{concurrency['captured_peak']:,} at 1×)")
+    for route, summary in report['requests'].items():
+        for failure, count in summary['failures'].items():
+            print(f"⚠️  {route}: {count:,} × {failure}")
+    if args.output:
+        print(f"📝 Report written to {args.output}")
+    return 0
+
+
+def cmd_results_add(args):
+    import json
+    from simgen import results as store_results
+
+    sha = args.sha or store_results.git_sha()
+    records = []
+    for path in args.reports:
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        records += store_results.from_report(report, sha, plan=args.plan, scenario=args.scenario)
+    if args.values:
+        if not args.benchmark or not args.metric:
+            raise ValueError("--values needs --benchmark and --metric")
+        records.append(store_results.Result(
+            args.benchmark, args.metric, sha, unit=args.unit, plan=args.plan,
+            scenario=args.scenario, samples=args.values, better=args.better))
+    if not records:
+        raise ValueError("Nothing to record: give report files or --values")
+    store = store_results.ResultStore(args.store)
+    store.append(records)
+    print(f"📥 {len(records)} result(s) for {sha} appended to {store.path}")
+    return 0
+
+
+def cmd_results_list(args):
+    from simgen.results import ResultStore, series_name
+
+    store = ResultStore(args.store)
+    series = store.series(args.benchmark, args.metric)
+    if not series:
+        print(f"📭 No results in {store.path}")
+        return 0
+    for key, records in series.items():
+        shas = list(dict.fromkeys(record.sha for record in records))
+        print(f"{series_name(key):<48} {len(records):>4} runs, {len(shas):>3} SHAs, "
+              f"latest {shas[-1]} ({records[-1].recorded_at})")
+    return 0
+
+
+def cmd_results_compare(args):
+    import json
+    from simgen.results import ResultStore, compare_series, series_name
+
+    comparisons = compare_series(ResultStore(args.store), baseline=args.baseline,
+                                 candidate=args.candidate, benchmark=args.benchmark,
+                                 metric=args.metric, statistic=args.statistic,
+                                 alpha=args.alpha, min_effect=args.min_effect)
+    regressions = [key for key, c in comparisons.items() if c['verdict'] == 'regression']
+    if args.json:
+        print(json.dumps([{'series': list(key), **c} for key, c in comparisons.items()],
+                         indent=2))
+        return 1 if regressions else 0
+    if not comparisons:
+        print("📭 No series with both a baseline and a candidate run")
+        return 0
+    icons = {'regression': '❌', 'improvement': '🚀', 'unchanged': '✅'}
+    for key, c in comparisons.items():
+        base, cand = c['baseline'], c['candidate']
+        stat = c['statistic']
+        print(f"{icons[c['verdict']]} {series_name(key)}: {stat} "
+              f"{base[stat]:.4g} → {cand[stat]:.4g} {c['unit']} ({c['ratio'] - 1:+.1%}, "
+              f"CI {c['ci'][0] - 1:+.1%}…{c['ci'][1] - 1:+.1%}, p={c['p_value']:.2g}, "
+              f"n={base['n']:,}/{cand['n']:,}) {base['sha']} → {cand['sha']}")
+    if regressions:
+        print(f"❌ {len(regressions)} significant regression(s)")
+        return 1
+    print("✅ No significant regressions")
+    return 0
+
+
+def cmd_results_chart(args):
+    from simgen.export import ExportSession
+    from simgen.results import ResultStore, TrendSpec
+
+    series = ResultStore(args.store).series(args.benchmark, args.metric)
+    if not series:
+        raise ValueError("No results to chart")
+    with ExportSession() as session:
+        results = session.export([TrendSpec(series, args.name)], args.formats, out_dir=args.out)
+    _print_results(results)
+    return 0
+
+
+def cmd_list(args):
+    from simgen.pipeline import artifact_graph
+    for node in artifact_graph(diagram=True):
+        deps = f"  (needs {', '.join(node.deps)})" if node.deps else ''
+        print(f"{node.name:<22} -> {node.path}{deps}")
+    return 0
+
+
+def _add_settings_arguments(p):
+    p.add_argument('--domain', default='your-simstudio-app.onrender.com',
+                   help='public domain of the web service')
+    p.add_argument('--region', default='oregon', help='Render region')
+    p.add_argument('--plan', default='standard', help='web service plan')
+    p.add_argument('--instances', type=int, default=1,
+                   help='web service instance count (minimum with --max-instances)')
+    p.add_argument('--max-instances', type=int,
+                   help='autoscale the web service up to this many instances')
+    p.add_argument('--disk-size', type=int,
+                   help='persistent disk size in GB (default: 5 for a single instance, '
+                        'none when scaling out; 0: no disk)')
+    p.add_argument('--realtime-plan', default='starter', help='realtime server plan')
+    p.add_argument('--realtime-instances', type=int, default=1,
+                   help='realtime server instance count (more than 1 implies --redis)')
+    p.add_argument('--db-plan', default='basic-1gb', help='Postgres plan')
+    p.add_argument('--db-pool-size', type=int, default=10,
+                   help='database pool of each web instance (DATABASE_POOL_SIZE)')
+    p.add_argument('--pgbouncer', action='store_true',
+                   help='route both services through a PgBouncer private service')
+    p.add_argument('--redis', action='store_true',
+                   help='add a Key Value (Redis) instance for the Socket.IO adapter')
+    p.add_argument('--llm-gateway', action='store_true',
+                   help='route the AI provider calls through a caching gateway private service')
+    p.add_argument('--gateway-disk-size', type=int, default=0,
+                   help='gateway disk cache size in GB (0: memory only; implies --llm-gateway)')
+
+
+def _add_topology_arguments(p):
+    p.add_argument('--blueprint', metavar='RENDER_YAML',
+                   help='read the topology from this Blueprint instead of the templates')
+    p.add_argument('--compose', default='docker-compose.yml',
+                   help='compose file read alongside --blueprint, if present '
+                        '(default: docker-compose.yml)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='simgen',
+        description='Generate the Sim Studio deployment tree for Render.')
+    sub = parser.add_subparsers(dest='command', metavar='<command>')
+    sub.required = True
+
+    p = sub.add_parser('generate', help='render the deployment files')
+    p.add_argument('--out', default='.', help='output directory (default: current directory)')
+    p.add_argument('--only', nargs='+', metavar='ARTIFACT',
+                   help='only write these artifacts (see `simgen list`)')
+    p.add_argument('--diagram', action='store_true',
+                   help='also render the architecture diagram (needs plotly + kaleido)')
+    p.add_argument('--jobs', type=int, default=None, help='render threads')
+    p.add_argument('-q', '--quiet', action='store_true', help='do not print per-file results')
+    p.add_argument('--profile', metavar='FILE',
+                   help='size plans, autoscaling and the database from this load profile '
+                        '(see `simgen plan`); overrides the sizing options')
+    _add_settings_arguments(p)
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser('batch', help='render one deployment tree per tenant into an archive')
+    p.add_argument('tenants', help='CSV (with header) or JSON list of tenants: '
+                                   'domain, region, plan, num_instances, disk_size_gb[, name]')
+    p.add_argument('-o', '--output', default='tenants.tar.gz',
+                   help="archive to write, or '-' for stdout (default: tenants.tar.gz)")
+    p.add_argument('--format', choices=('tar', 'tar.gz', 'zip'),
+                   help='archive format (default: from the output extension, tar.gz for stdout)')
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser('diagram', help='render the architecture diagram')
+    p.add_argument('-o', '--output',
+                   help='single file to write (format taken from the extension); '
+                        'overrides --formats/--name/--out-dir')
+    p.add_argument('--formats', nargs='+', default=['png'], choices=('png', 'svg', 'pdf', 'html'),
+                   help='formats to export in one batch (default: png)')
+    p.add_argument('--name', default='sim_studio_architecture', help='output file name stem')
+    p.add_argument('--out-dir', default='.', help='output directory')
+    p.add_argument('--width', type=int, help='image width in pixels')
+    p.add_argument('--height', type=int, help='image height in pixels')
+    p.add_argument('--scale', type=float, default=1, help='image scale factor')
+    p.add_argument('--jobs', type=int, default=1, help='parallel kaleido tabs')
+    p.add_argument('--cache-dir', help='render cache directory (default: ~/.cache/simgen/diagrams)')
+    p.add_argument('--no-cache', action='store_true', help='always re-render')
+    p.add_argument('--layout', choices=('auto', 'layered', 'force'), default='auto',
+                   help='layout engine (auto: layered unless the topology has cycles)')
+    _add_topology_arguments(p)
+    p.set_defaults(func=cmd_diagram)
+
+    p = sub.add_parser('validate', help='check the deployment topology for problems')
+    _add_topology_arguments(p)
+    _add_settings_arguments(p)
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser('probe', help='health-check services concurrently (like health-check.sh)')
+    p.add_argument('urls', nargs='*', metavar='URL',
+                   help='http(s):// health URLs, tcp://host:port or postgres:// URLs '
+                        '(default: the local services, plus $DATABASE_URL)')
+    p.add_argument('--targets', metavar='FILE', help="file with one '[stack] url' per line")
+    p.add_argument('--tenants', metavar='FILE',
+                   help="probe https://<domain>/health of every tenant in a batch file")
+    p.add_argument('--samples', type=int, default=1, help='probes per target (default: 1)')
+    p.add_argument('--timeout', type=float, default=5.0, help='deadline per probe in seconds')
+    p.add_argument('--retries', type=int, default=2, help='retries per failed probe')
+    p.add_argument('--backoff', type=float, default=0.2,
+                   help='initial retry backoff in seconds (doubles per retry)')
+    p.add_argument('--concurrency', type=int, default=100, help='probes in flight at once')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_probe)
+
+    p = sub.add_parser('logs', help='summarize JSON-lines logs written by lib/logger.js')
+    p.add_argument('logfile', help='log export (one JSON object per line, optional prefix)')
+    p.add_argument('--jobs', type=int, default=1, help='parser processes for large files')
+    p.add_argument('--sort', choices=('p50', 'p95', 'p99', 'max', 'count', 'errors'),
+                   default='p95', help='route ordering (default: p95)')
+    p.add_argument('--top', type=int, default=20, help='routes/bursts to show (0: all)')
+    p.add_argument('--raw-routes', action='store_true',
+                   help='do not collapse ids in paths into :id')
+    p.add_argument('--burst-threshold', type=int,
+                   help='errors per minute that count as a burst '
+                        '(default: 5x the median, at least 5)')
+    p.add_argument('--state', metavar='FILE',
+                   help='resume from / save to this state file, parsing only new lines')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_logs)
+
+    p = sub.add_parser('images', help='check the built images against their size budgets')
+    p.add_argument('--main', default='simstudio:latest', metavar='IMAGE',
+                   help='image built from Dockerfile (default: simstudio:latest)')
+    p.add_argument('--realtime', default='simstudio-realtime:latest', metavar='IMAGE',
+                   help='image built from Dockerfile.realtime '
+                        '(default: simstudio-realtime:latest)')
+    p.add_argument('--top', type=int, default=5, help='largest layers to show per image')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_images)
+
+    p = sub.add_parser('context', help='report the Docker build context and predict cache hits')
+    p.add_argument('root', nargs='?', default='.', help='build context (default: .)')
+    p.add_argument('-f', '--dockerfile', action='append', metavar='FILE',
+                   help='Dockerfile(s) to analyze, relative to the context '
+                        '(default: Dockerfile and Dockerfile.realtime)')
+    p.add_argument('--compare', nargs='+', metavar='REV',
+                   help='predict which instructions stay cached going from REV to REV2 '
+                        '(default: the working tree)')
+    p.add_argument('--top', type=int, default=10, help='largest files/directories to show')
+    p.add_argument('--jobs', type=int, help='hashing threads (default: CPU count)')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_context)
+
+    p = sub.add_parser('plan', help='size the services from a load profile (queueing model)')
+    p.add_argument('profile', help='YAML/JSON load profile: request_rate, latency {p50_ms, '
+                                   'p95_ms}, socket_clients, memory_mb_per_request, ...')
+    p.add_argument('--no-simulation', action='store_true',
+                   help='only use the M/M/c model (skip the heavy-tail simulation)')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser('fanout', help='load-test Socket.IO broadcast fan-out on the realtime '
+                                      'server')
+    p.add_argument('url', nargs='?', default='http://localhost:3001',
+                   help='realtime server (default: the compose service, http://localhost:3001)')
+    p.add_argument('--clients', type=int, default=1000, help='websocket clients to open')
+    p.add_argument('--rooms', type=int, default=50,
+                   help='rooms (workflows) the clients are spread over')
+    p.add_argument('--rate', type=float, default=100, help='edits per second, all rooms')
+    p.add_argument('--duration', type=float, default=30, help='seconds of edits')
+    p.add_argument('--connect-concurrency', type=int, default=200,
+                   help='connections being opened at once')
+    p.add_argument('--drain', type=float, default=5.0,
+                   help='seconds to wait for late deliveries after the last edit')
+    p.add_argument('--auth', metavar='JSON',
+                   help='Socket.IO auth payload, e.g. \'{"token": "..."}\'')
+    p.add_argument('--join-event', default='join-workflow', help='event that joins a room')
+    p.add_argument('--edit-event', default='workflow-operation', help='event sent as an edit')
+    p.add_argument('--receive-event', help='event the server broadcasts (default: --edit-event)')
+    p.add_argument('--room-key', default='workflowId', help='room id key of the join payload')
+    p.add_argument('--seed', type=int, default=1, help='seed of the sender choice')
+    p.add_argument('--memory', choices=('docker', 'metrics', 'none'), default='docker',
+                   help='where to sample server memory (default: docker stats of the compose '
+                        'realtime service)')
+    p.add_argument('--container', help='container to sample (default: compose service realtime)')
+    p.add_argument('--metrics-url', default='http://localhost:9091/metrics',
+                   help='lib/metrics.js endpoint for --memory metrics (sends $METRICS_TOKEN if set)')
+    p.add_argument('--sample-interval', type=float, default=2.0,
+                   help='seconds between memory samples')
+    p.add_argument('--stub', action='store_true',
+                   help='run against an in-process stub server (measures the client overhead)')
+    p.add_argument('-o', '--output', metavar='FILE', help='also write the JSON report here')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_fanout)
+
+    p = sub.add_parser('load', help='load-test the web service and check latency SLOs')
+    p.add_argument('scenario', nargs='?',
+                   help='YAML/JSON scenario: base_url, mode, stages, requests, slo (default: '
+                        'home page, health routes, sign-in and workflow execution)')
+    p.add_argument('--url', help='web service to load (overrides the scenario base_url)')
+    p.add_argument('--rate', type=float, help='open loop at this many requests/s')
+    p.add_argument('--users', type=int, help='closed loop with this many virtual users')
+    p.add_argument('--mode', choices=('open', 'closed'),
+                   help='only with --rate (open) or --users (closed)')
+    p.add_argument('--duration', type=float, default=60,
+                   help='seconds at --rate/--users (default: 60)')
+    p.add_argument('--ramp', type=float, default=0,
+                   help='seconds ramping up to --rate/--users first')
+    p.add_argument('--connections', type=int, help='keep-alive connection pool size')
+    p.add_argument('--think-ms', type=float, help='mean think time of a closed-loop user')
+    p.add_argument('--seed', type=int, default=1, help='seed of the arrivals and request mix')
+    p.add_argument('--stub-ai', action='store_true',
+                   help='serve stub AI providers for the run (see docker-compose.loadtest.yml)')
+    p.add_argument('--stub-ai-port', type=int, default=8090, help='stub AI provider port')
+    p.add_argument('--stub-ai-p50', type=float, default=800,
+                   help='stub completion latency median in ms')
+    p.add_argument('--stub-ai-p95', type=float, default=3000,
+                   help='stub completion latency p95 in ms')
+    p.add_argument('-o', '--output', metavar='FILE', help='also write the JSON report here')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser('gateway', help='run the caching LLM gateway locally')
+    p.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    p.add_argument('--port', type=int, default=8080, help='port to listen on')
+    p.add_argument('--upstream', action='append', default=[], metavar='PROVIDER=URL',
+                   help='provider base URL (repeatable; default: the public APIs, or '
+                        'GATEWAY_<PROVIDER>_URL)')
+    p.add_argument('--ttl', type=float, default=3600, help='cache entry lifetime in seconds')
+    p.add_argument('--cache-entries', type=int, default=2000,
+                   help='in-memory cache entries')
+    p.add_argument('--cache-mb', type=int, default=256, help='in-memory cache size in MB')
+    p.add_argument('--disk-cache', metavar='DIR',
+                   help='directory of the disk cache tier (default: $GATEWAY_DISK_CACHE)')
+    p.add_argument('--connections', type=int, default=100,
+                   help='upstream connections per provider')
+    p.add_argument('--routes', metavar='JSON_OR_FILE',
+                   help='equivalent models to route and hedge chat completions across, e.g. '
+                        '\'{"gpt-4o-mini": ["openai:gpt-4o-mini", "deepseek:deepseek-chat"]}\' '
+                        '(default: $GATEWAY_ROUTES)')
+    p.add_argument('--no-hedge', action='store_true',
+                   help='route routed models to the fastest target without hedging')
+    p.add_argument('--hedge-quantile', type=float, default=0.95,
+                   help='hedge an attempt still unanswered at this latency quantile')
+    p.add_argument('--hedge-budget', type=float, default=0.1,
+                   help='most hedges per routed request')
+    p.add_argument('--half-life', type=float, default=60,
+                   help='seconds for a latency sample to lose half its weight')
+    p.add_argument('--stub', action='store_true',
+                   help='answer every provider from in-process stub providers')
+    p.add_argument('--stub-port', type=int, default=0, help='stub provider port')
+    p.add_argument('--stub-p50', type=float, default=800,
+                   help='stub completion latency median in ms')
+    p.add_argument('--stub-p95', type=float, default=3000,
+                   help='stub completion latency p95 in ms')
+    p.add_argument('--stub-tail-fraction', type=float, default=0,
+                   help='share of stub requests that straggle')
+    p.add_argument('--stub-tail-ms', type=float, default=0, help='straggler delay in ms')
+    p.set_defaults(func=cmd_gateway)
+
+    p = sub.add_parser('capture', help='turn request logs into a binary traffic trace')
+    p.add_argument('logfiles', nargs='+',
+                   help='lib/logger.js JSON lines or logfmt platform request logs')
+    p.add_argument('-o', '--output', default='traffic.trace', help='trace file to write')
+    p.add_argument('--offset', type=float, default=0,
+                   help='skip this many seconds from the start of the logs')
+    p.add_argument('--span', type=float, help='keep this many seconds of traffic')
+    p.add_argument('--top', type=int, default=10, help='busiest routes to show')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_capture)
+
+    p = sub.add_parser('replay', help='replay a traffic trace and diff its latencies')
+    p.add_argument('trace', help='trace written by `simgen capture`')
+    p.add_argument('--url', default='http://localhost:3000',
+                   help='web service to replay against (default: the compose service)')
+    p.add_argument('--speed', type=float, default=1.0,
+                   help='compress inter-arrival times by this factor (1 to 50 is typical)')
+    p.add_argument('--offset', type=float, default=0,
+                   help='start this many seconds into the trace')
+    p.add_argument('--span', type=float, help='replay this many seconds of the trace')
+    p.add_argument('--map', action='append', metavar='OLD=NEW',
+                   help='rewrite paths, e.g. a production workflow id to a local one')
+    p.add_argument('--header', action='append', metavar="'NAME: VALUE'",
+                   help='add a header to every request (e.g. an API key)')
+    p.add_argument('--connections', type=int, default=100,
+                   help='requests in flight at once (sessions included); also the shared '
+                        'keep-alive connections for requests without a session')
+    p.add_argument('--timeout', type=float, default=300, help='seconds before a request fails')
+    p.add_argument('--dry-run', action='store_true', help='only describe the trace')
+    p.add_argument('--top', type=int, default=15, help='routes to show')
+    p.add_argument('-o', '--output', metavar='FILE', help='also write the JSON report here')
+    p.add_argument('--json', action='store_true', help='print machine-readable results')
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser('results', help='record benchmark results and detect regressions')
+    actions = p.add_subparsers(dest='action', required=True, metavar='ACTION')
+
+    def results_parser(name, func, help):
+        q = actions.add_parser(name, help=help)
+        q.add_argument('--store', help='results file (default: $SIMGEN_RESULTS or '
+                                       'benchmark-results.jsonl)')
+        q.set_defaults(func=func)
+        return q
+
+    q = results_parser('add', cmd_results_add, 'append results (reports or raw samples)')
+    q.add_argument('reports', nargs='*', help='JSON reports of simgen load, replay or fanout')
+    q.add_argument('--sha', help='git SHA of the run (default: HEAD, -dirty if modified)')
+    q.add_argument('--plan', default='', help='service plan the run measured')
+    q.add_argument('--scenario', default='', help='scenario name')
+    q.add_argument('--benchmark', help='benchmark name for --values')
+    q.add_argument('--metric', help='metric name for --values')
+    q.add_argument('--values', type=float, nargs='+', help='raw samples, e.g. build times')
+    q.add_argument('--unit', default='ms', help='unit of --values (default: ms)')
+    q.add_argument('--better', choices=('lower', 'higher'), default='lower',
+                   help='direction of improvement for --values')
+
+    q = results_parser('list', cmd_results_list, 'list the recorded series')
+    q.add_argument('--benchmark', help='only this benchmark')
+    q.add_argument('--metric', help='only this metric')
+
+    q = results_parser('compare', cmd_results_compare,
+                       'compare runs; exit 1 on a significant regression')
+    q.add_argument('--baseline', metavar='SHA',
+                   help='baseline run (default: the run before the candidate)')
+    q.add_argument('--candidate', metavar='SHA', help='candidate run (default: the latest)')
+    q.add_argument('--benchmark', help='only this benchmark')
+    q.add_argument('--metric', help='only this metric')
+    q.add_argument('--statistic', choices=('median', 'p90', 'p95', 'p99'), default='median',
+                   help='statistic whose ratio is bootstrapped (default: median)')
+    q.add_argument('--alpha', type=float, default=0.01,
+                   help='significance level of the tests (default: 0.01)')
+    q.add_argument('--min-effect', type=float, default=0.05,
+                   help='smallest relative change reported (default: 0.05, 5%%)')
+    q.add_argument('--json', action='store_true', help='print machine-readable results')
+
+    q = results_parser('chart', cmd_results_chart, 'render trend charts with plotly')
+    q.add_argument('--benchmark', help='only this benchmark')
+    q.add_argument('--metric', help='only this metric')
+    q.add_argument('--formats', nargs='+', default=['html'],
+                   help='output formats (html, png, svg, pdf; default: html)')
+    q.add_argument('--name', default='benchmark_trends', help='output file name')
+    q.add_argument('--out', default='.', help='output directory')
+
+    p = sub.add_parser('list', help='list the artifacts in the dependency graph')
+    p.set_defaults(func=cmd_list)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (KeyError, ValueError) as e:
+        print(f"❌ {e.args[0] if e.args else e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,509 @@
+# Docker build-context analyzer
+#
+# Walks a build context once, applying .dockerignore the way the Docker CLI
+# does (patterns are anchored at the context root, `**` spans directories,
+# `!` re-includes, the last matching line wins), and reports what a build
+# would upload. It also predicts which Dockerfile instructions stay cached
+# between two revisions: each COPY/ADD is keyed by the files it reads,
+# hashed as git blob ids, so a commit (read from `git ls-tree`, no file
+# contents needed) and the working tree (hashed by a thread pool) compare
+# directly.
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import stat
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+WORKTREE = 'WORKTREE'  # revision name of the files on disk
+DEFAULT_DOCKERFILES = ('Dockerfile', 'Dockerfile.realtime')
+
+_READ_SIZE = 1 << 20
+
+
+def _compile(pattern):
+    """Regex for a cleaned .dockerignore or COPY source pattern.
+
+    Same translation as Docker's patternmatcher: ``*`` and ``?`` stay within
+    one path segment, ``**`` matches any number of directories (including
+    none), ``[...]`` is a character class and ``\\`` escapes.
+    """
+    out = ['^']
+    i, n = 0, len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == '*':
+            if pattern.startswith('**', i):
+                i += 2
+                if i < n and pattern[i] == '/':
+                    i += 1
+                out.append('.*' if i == n else '(.*/)?')
+                continue
+            out.append('[^/]*')
+        elif ch == '?':
+            out.append('[^/]')
+        elif ch == '[' and pattern.find(']', i + 1) != -1:
+            end = pattern.find(']', i + 1)
+            out.append('[' + pattern[i + 1:end].replace('\\', '\\\\') + ']')
+            i = end
+        elif ch == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    out.append('$')
+    return re.compile(''.join(out), re.DOTALL)
+
+
+def _clean(pattern):
+    pattern = posixpath.normpath(pattern.replace(os.sep, '/'))
+    return pattern.lstrip('/') or '.'
+
+
+def _parents(path):
+    parts = path.split('/')[:-1]
+    return ['/'.join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def _depth(pattern):
+    """Number of path segments a pattern matches, or None if it contains
+    ``**`` (and so matches paths of any depth)."""
+    return None if '**' in pattern else pattern.count('/') + 1
+
+
+def _matches(regex, depth, path, parts):
+    """Whether ``regex`` matches ``path`` or one of its parent directories."""
+    if depth is None:
+        return regex.match(path) is not None or any(regex.match(parent) for parent in _parents(path))
+    if depth > len(parts):
+        return False
+    return regex.match(path if depth == len(parts) else '/'.join(parts[:depth])) is not None
+
+
+class IgnoreRules:
+    """Parsed .dockerignore: ``(pattern, regex, depth, exception)`` in file
+    order."""
+
+    __slots__ = ('patterns', 'has_exceptions', '_combined')
+
+    def __init__(self, lines=()):
+        self.patterns = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            exception = line.startswith('!')
+            if exception:
+                line = line[1:].strip()
+                if not line:
+                    continue
+            pattern = _clean(line)
+            self.patterns.append((pattern, _compile(pattern), _depth(pattern), exception))
+        self.has_exceptions = any(exception for *_, exception in self.patterns)
+        # Without `!` lines the order does not matter: one alternation per
+        # pattern depth answers in a couple of regex calls per path
+        self._combined = None
+        if not self.has_exceptions:
+            groups = {}
+            for _, regex, depth, _ in self.patterns:
+                groups.setdefault(depth, []).append(regex.pattern)
+            self._combined = [(re.compile('|'.join(f'(?:{p})' for p in group), re.DOTALL), depth)
+                              for depth, group in groups.items()]
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.splitlines())
+
+    def excluded(self, path):
+        """Whether ``path`` (relative, ``/``-separated) is left out of the
+        context: a pattern matches the path itself or any of its parents."""
+        parts = path.split('/')
+        if self._combined is not None:
+            return any(_matches(regex, depth, path, parts) for regex, depth in self._combined)
+        matched = False
+        for _, regex, depth, exception in self.patterns:
+            # Only lines that could flip the current verdict matter
+            if exception != matched:
+                continue
+            if _matches(regex, depth, path, parts):
+                matched = not exception
+        return matched
+
+    def may_reinclude(self, directory):
+        """Whether an ``!`` line could re-include something under an excluded
+        directory (the Docker CLI skips the directory otherwise)."""
+        prefix = directory + '/'
+        return any(exception and (pattern + '/').startswith(prefix)
+                   for pattern, _, _, exception in self.patterns)
+
+
+def _git_mode(mode):
+    if stat.S_ISLNK(mode):
+        return '120000'
+    return '100755' if mode & 0o111 else '100644'
+
+
+def blob_id(path):
+    """git blob id (``git hash-object``) of a file, or of a symlink's target."""
+    st = os.lstat(path)
+    digest = hashlib.sha1()
+    if stat.S_ISLNK(st.st_mode):
+        data = os.fsencode(os.readlink(path))
+        digest.update(b'blob %d\0' % len(data))
+        digest.update(data)
+        return digest.hexdigest()
+    digest.update(b'blob %d\0' % st.st_size)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_READ_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Context:
+    """The files a build would send, as ``path -> (size, git mode)``.
+
+    ``blobs`` holds the content hash of each file once known: read from git
+    for a revision, computed on demand (see :meth:`hash`) for the working
+    tree.
+    """
+
+    __slots__ = ('root', 'revision', 'rules', 'files', 'blobs', 'pruned')
+
+    def __init__(self, root, revision, rules, files, blobs=None, pruned=()):
+        self.root = root
+        self.revision = revision
+        self.rules = rules
+        self.files = files
+        self.blobs = blobs if blobs is not None else {}
+        self.pruned = list(pruned)
+
+    @property
+    def size(self):
+        return sum(size for size, _ in self.files.values())
+
+    def __len__(self):
+        return len(self.files)
+
+    def hash(self, paths, jobs=None):
+        """Fill in the blob ids of ``paths``, hashing files in parallel
+        (hashlib releases the GIL while digesting)."""
+        missing = [path for path in paths if path not in self.blobs]
+        if not missing:
+            return
+        if self.revision != WORKTREE:
+            raise KeyError(f"{missing[0]} is not part of {self.revision}")
+        full = [os.path.join(self.root, path) for path in missing]
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(full) < 64:
+            self.blobs.update(zip(missing, map(blob_id, full)))
+        else:
+            with ThreadPoolExecutor(jobs) as pool:
+                self.blobs.update(zip(missing, pool.map(blob_id, full)))
+
+    def read(self, path):
+        """Contents of a file of this revision (even if ignored), or None."""
+        if self.revision == WORKTREE:
+            try:
+                with open(os.path.join(self.root, path), encoding='utf-8') as f:
+                    return f.read()
+            except FileNotFoundError:
+                return None
+        return _git_show(self.root, self.revision, path)
+
+    def largest_files(self, top=10):
+        ranked = sorted(self.files.items(), key=lambda item: item[1][0], reverse=True)
+        return [(path, size) for path, (size, _) in ranked[:top]]
+
+    def largest_directories(self, top=10, depth=2):
+        """Largest directories down to ``depth`` levels, by total file size."""
+        totals = {}
+        for path, (size, _) in self.files.items():
+            for parent in _parents(path)[:depth]:
+                totals[parent] = totals.get(parent, 0) + size
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    def unanchored(self):
+        """Directories and files below the context root that a single-segment
+        pattern (``node_modules``, ``*.log``) would exclude at the root but
+        does not exclude here, since patterns are anchored at the root.
+
+        Returns ``(pattern, path, bytes)`` sorted by size.
+        """
+        rules = [(pattern, regex) for pattern, regex, _, exception in self.rules.patterns
+                 if not exception and '/' not in pattern and not pattern.startswith('**')]
+        if not rules:
+            return []
+        found = {}
+        names = {}
+
+        def matches(name):
+            if name not in names:
+                names[name] = next((pattern for pattern, regex in rules if regex.match(name)), None)
+            return names[name]
+
+        for path, (size, _) in self.files.items():
+            parts = path.split('/')
+            for depth in range(1, len(parts)):
+                pattern = matches(parts[depth])
+                if pattern is not None:
+                    key = (pattern, '/'.join(parts[:depth + 1]))
+                    found[key] = found.get(key, 0) + size
+                    break
+        return sorted(((pattern, path, size) for (pattern, path), size in found.items()),
+                      key=lambda item: item[2], reverse=True)
+
+
+def scan(root='.'):
+    """Walk the working tree once and return its build :class:`Context`."""
+    root = os.path.abspath(root)
+    try:
+        with open(os.path.join(root, '.dockerignore'), encoding='utf-8') as f:
+            rules = IgnoreRules(f.read().splitlines())
+    except FileNotFoundError:
+        rules = IgnoreRules()
+
+    files = {}
+    pruned = []
+    stack = ['']
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, directory) if directory else root)
+        except PermissionError:
+            continue
+        with entries:
+            for entry in entries:
+                path = f'{directory}/{entry.name}' if directory else entry.name
+                st = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(st.st_mode):
+                    if rules.excluded(path) and not rules.may_reinclude(path):
+                        pruned.append(path)
+                    else:
+                        stack.append(path)
+                elif not rules.excluded(path):
+                    files[path] = (st.st_size, _git_mode(st.st_mode))
+    return Context(root, WORKTREE, rules, files, pruned=sorted(pruned))
+
+
+def _git(root, *args):
+    proc = subprocess.run(['git', '-C', root, *args], capture_output=True)
+    if proc.returncode != 0:
+        message = proc.stderr.decode('utf-8', 'replace').strip()
+        raise ValueError(message or f"git {args[0]} failed")
+    return proc.stdout
+
+
+def _git_show(root, revision, path):
+    try:
+        return _git(root, 'show', f'{revision}:./{path}').decode('utf-8')
+    except ValueError:
+        return None
+
+
+def from_git(root, revision):
+    """Build :class:`Context` of ``root`` as of a git revision, with blob
+    ids straight from the tree (nothing is read or hashed)."""
+    root = os.path.abspath(root)
+    text = _git_show(root, revision, '.dockerignore')
+    rules = IgnoreRules.from_text(text or '')
+    files = {}
+    blobs = {}
+    # -C root limits the listing to the context directory, relative to it
+    for record in _git(root, 'ls-tree', '-r', '-l', '-z', revision).split(b'\0'):
+        if not record:
+            continue
+        meta, _, path = record.partition(b'\t')
+        mode, kind, blob, size = meta.decode().split()
+        path = path.decode('utf-8', 'surrogateescape')
+        if kind != 'blob' or rules.excluded(path):
+            continue
+        files[path] = (int(size), mode)
+        blobs[path] = blob
+    return Context(root, revision, rules, files, blobs)
+
+
+def load(root, revision=WORKTREE):
+    return scan(root) if revision == WORKTREE else from_git(root, revision)
+
+
+class Instruction:
+    """One Dockerfile instruction; ``sources`` are the context patterns of
+    a COPY/ADD, ``source_stage`` its ``--from``."""
+
+    __slots__ = ('stage', 'lineno', 'keyword', 'text', 'sources', 'source_stage')
+
+    def __init__(self, stage, lineno, keyword, text, sources=None, source_stage=None):
+        self.stage = stage
+        self.lineno = lineno
+        self.keyword = keyword
+        self.text = text
+        self.sources = sources
+        self.source_stage = source_stage
+
+
+def _logical_lines(text):
+    """``(lineno, line)`` with continuations joined and comments dropped."""
+    pending, start = [], None
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        line = raw.strip()
+        if line.startswith('#') or (not line and not pending):
+            continue
+        if start is None:
+            start = lineno
+        if line.endswith('\\'):
+            pending.append(line[:-1].strip())
+            continue
+        pending.append(line)
+        yield start, ' '.join(part for part in pending if part)
+        pending, start = [], None
+    if pending:
+        yield start, ' '.join(part for part in pending if part)
+
+
+def _copy_arguments(args):
+    flags = {}
+    while args and args[0].startswith('--'):
+        key, _, value = args.pop(0)[2:].partition('=')
+        flags[key] = value
+    if args and args[0].startswith('['):
+        try:
+            args = json.loads(' '.join(args))
+        except ValueError:
+            pass
+    return flags, args[:-1]
+
+
+def parse_dockerfile(text):
+    """Instructions of a Dockerfile, with the stage each belongs to.
+
+    Stages are named by their ``AS`` alias, or their index otherwise.
+    """
+    instructions = []
+    stage = None
+    stages = 0
+    for lineno, line in _logical_lines(text):
+        keyword, _, rest = line.partition(' ')
+        keyword = keyword.upper()
+        args = rest.split()
+        if keyword == 'FROM':
+            words = [word for word in args if not word.startswith('--')]
+            stage = words[2].lower() if len(words) >= 3 and words[1].lower() == 'as' else str(stages)
+            stages += 1
+            source = words[0].lower() if words else ''
+            instructions.append(Instruction(stage, lineno, keyword, line, source_stage=source))
+        elif keyword in ('COPY', 'ADD'):
+            flags, sources = _copy_arguments(args)
+            if 'from' in flags:
+                instructions.append(Instruction(stage, lineno, keyword, line,
+                                                source_stage=flags['from'].lower()))
+            else:
+                instructions.append(Instruction(stage, lineno, keyword, line, sources=sources))
+        else:
+            instructions.append(Instruction(stage, lineno, keyword, line))
+    return instructions
+
+
+def copy_files(context, sources):
+    """Context files read by COPY/ADD ``sources``: a source matches a file
+    or a directory it lives in, with the same glob rules as .dockerignore."""
+    matched = set()
+    globs = []
+    for source in sources:
+        if '://' in source:
+            continue  # remote ADD: not part of the context
+        pattern = _clean(source)
+        if pattern == '.':
+            return sorted(context.files)
+        if not any(ch in pattern for ch in '*?[\\'):
+            if pattern in context.files:
+                matched.add(pattern)
+            else:
+                prefix = pattern + '/'
+                matched.update(path for path in context.files if path.startswith(prefix))
+        else:
+            globs.append((_compile(pattern), _depth(pattern)))
+    if globs:
+        for path in context.files:
+            parts = path.split('/')
+            if any(_matches(regex, depth, path, parts) for regex, depth in globs):
+                matched.add(path)
+    return sorted(matched)
+
+
+class Step:
+    """An instruction with its predicted cache key and the files it reads."""
+
+    __slots__ = ('instruction', 'key', 'files')
+
+    def __init__(self, instruction, key, files=None):
+        self.instruction = instruction
+        self.key = key
+        self.files = files  # path -> (mode, blob) for context COPY/ADD
+
+
+def cache_keys(context, dockerfile_text, jobs=None):
+    """Chain every instruction to a cache key the way BuildKit does: a key
+    covers the parent step, the instruction text and, for COPY/ADD, the
+    mode and content of every file read from the context (or the final
+    key of the ``--from`` stage). Equal keys mean a cache hit."""
+    instructions = parse_dockerfile(dockerfile_text)
+    wanted = {}
+    for instruction in instructions:
+        if instruction.sources is not None:
+            wanted[instruction.lineno] = copy_files(context, instruction.sources)
+    context.hash(sorted({path for paths in wanted.values() for path in paths}), jobs=jobs)
+
+    steps = []
+    stage_keys = {}  # alias and index of each stage -> key of its last step
+    stage = -1
+    for instruction in instructions:
+        digest = hashlib.sha256()
+        files = None
+        if instruction.keyword == 'FROM':
+            stage += 1
+            parent = stage_keys.get(instruction.source_stage, instruction.source_stage)
+            digest.update(parent.encode())
+        else:
+            digest.update(steps[-1].key.encode() if steps else b'')
+            if instruction.source_stage is not None:
+                source = stage_keys.get(instruction.source_stage, instruction.source_stage)
+                digest.update(source.encode())
+            elif instruction.sources is not None:
+                files = {path: (context.files[path][1], context.blobs[path])
+                         for path in wanted[instruction.lineno]}
+                for path, (mode, blob) in sorted(files.items()):
+                    digest.update(f'{path}\0{mode}\0{blob}\0'.encode('utf-8', 'surrogateescape'))
+        digest.update(instruction.text.encode())
+        step = Step(instruction, digest.hexdigest(), files)
+        steps.append(step)
+        stage_keys[instruction.stage] = step.key
+        stage_keys[str(stage)] = step.key
+    return steps
+
+
+def predict(old_steps, new_steps):
+    """``(step, cached, changed_paths)`` for every step of the new build.
+
+    A step is cached if the old build produced the same key; for the first
+    uncached COPY/ADD of a stage the changed paths explain why.
+    """
+    old_keys = {step.key for step in old_steps}
+    old_files = {(step.instruction.stage, step.instruction.text): step.files
+                 for step in old_steps if step.files is not None}
+    report = []
+    for step in new_steps:
+        cached = step.key in old_keys
+        changed = []
+        if not cached and step.files is not None:
+            before = old_files.get((step.instruction.stage, step.instruction.text)) or {}
+            changed = sorted(path for path in set(before) | set(step.files)
+                             if before.get(path) != step.files.get(path))
+        report.append((step, cached, changed))
+    return report
@@ -0,0 +1,213 @@
+# Sim Studio architecture diagram
+#
+# Components and connections are derived from the deployment topology
+# (simgen.topology) and coordinates are computed by simgen.layout. plotly
+# and numpy are imported inside the functions that use them so that
+# importing this module (or the CLI) stays cheap when no diagram is wanted.
+
+from simgen.topology import GATEWAY_PROVIDERS, PROVIDER_ENV_KEYS
+
+# Marker style per topology node kind (see simgen.topology)
+KIND_STYLES = {
+    'web': {'color': '#FFC185', 'size': 30, 'symbol': 'square', 'type': 'Web Service'},
+    'pserv': {'color': '#ECEBD5', 'size': 25, 'symbol': 'square', 'type': 'Private Svc'},
+    'worker': {'color': '#ECEBD5', 'size': 25, 'symbol': 'square', 'type': 'Worker'},
+    'keyvalue': {'color': '#A84B2F', 'size': 25, 'symbol': 'diamond', 'type': 'Key Value'},
+    'database': {'color': '#5D878F', 'size': 25, 'symbol': 'diamond', 'type': 'Database'},
+    'disk': {'color': '#D2BA4C', 'size': 20, 'symbol': 'hexagon', 'type': 'Storage'},
+    'local': {'color': '#ECEBD5', 'size': 20, 'symbol': 'square', 'type': 'Local Only'},
+}
+
+# Nodes that are not Blueprint services
+USERS_STYLE = {'color': '#1FB8CD', 'size': 25, 'symbol': 'circle', 'type': 'External'}
+ENV_STYLE = {'color': '#DB4545', 'size': 20, 'symbol': 'triangle-up', 'type': 'Config'}
+HEALTH_STYLE = {'color': '#1FB8CD', 'size': 20, 'symbol': 'star', 'type': 'Monitor'}
+PROVIDER_COLORS = {
+    'OpenAI': '#B4413C',
+    'Anthropic': '#964325',
+    'Google AI': '#944454',
+    'DeepSeek': '#13343B',
+}
+
+
+def topology_graph(topology):
+    """Turn a :class:`simgen.topology.Topology` into ``(components, connections)``.
+
+    Users reach every web service, every service with env vars is fed by
+    "Env Vars", health-checked services are probed by "Health Check" and
+    services holding a provider API key call that provider, through the LLM
+    gateway when they are linked to one and its SDK is routed there.
+    """
+    components = {'Users': USERS_STYLE}
+    connections = []
+    configured, checked, providers = [], [], {}
+
+    for service in topology:
+        components[service.name] = KIND_STYLES.get(service.kind, KIND_STYLES['local'])
+        if service.kind == 'web':
+            connections.append(('Users', service.name))
+    gateways = {}
+    for source, target, key in topology.links:
+        # Provider keys copied from another service are not calls to it
+        if target in topology and key not in PROVIDER_ENV_KEYS:
+            connections.append((source, target))
+            if key == 'LLM_GATEWAY_HOSTPORT':
+                gateways[source] = target
+    for service in topology.runtime_services():
+        for provider in service.providers:
+            caller = (gateways.get(service.name, service.name) if provider in GATEWAY_PROVIDERS
+                      else service.name)
+            if caller not in providers.setdefault(provider, []):
+                providers[provider].append(caller)
+        if service.env:
+            configured.append(service.name)
+        if service.health_check_path or service.kind in ('web', 'pserv'):
+            checked.append(service.name)
+
+    for provider, callers in providers.items():
+        components[provider] = {'color': PROVIDER_COLORS.get(provider, '#13343B'), 'size': 15,
+                                'symbol': 'circle', 'type': 'AI API'}
+        connections.extend((caller, provider) for caller in callers)
+    if configured:
+        components['Env Vars'] = ENV_STYLE
+        connections.extend(('Env Vars', name) for name in configured)
+    if checked:
+        components['Health Check'] = HEALTH_STYLE
+        connections.extend(('Health Check', name) for name in checked)
+    return components, connections
+
+
+# Edge styling shared by the line and arrowhead traces
+EDGE_COLOR = '#666666'
+ARROW_OFFSET = 0.1
+
+
+def edge_geometry(positions, connections, arrow_offset=ARROW_OFFSET):
+    """Compute all edge lines and arrowheads in one NumPy pass.
+
+    Returns ``(line_x, line_y, arrow_x, arrow_y, arrow_angle)``. The line
+    arrays hold ``x0, x1, NaN`` per edge so every edge fits in a single
+    trace (plotly serializes NaN as a null gap). Arrowheads sit
+    ``arrow_offset`` before the target, rotated to point along the edge.
+    """
+    import numpy as np
+
+    names = list(positions)
+    index = {name: i for i, name in enumerate(names)}
+    coords = np.asarray([positions[name] for name in names], dtype=float).reshape(-1, 2)
+    src = coords[[index[a] for a, _ in connections]].reshape(-1, 2)
+    dst = coords[[index[b] for _, b in connections]].reshape(-1, 2)
+
+    delta = dst - src
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    # Zero-length edges keep their arrowhead on the target
+    unit = np.divide(delta, length[:, None], out=np.zeros_like(delta), where=length[:, None] > 0)
+    arrow = dst - arrow_offset * unit
+
+    # Marker angles are clockwise from "up", so convert from the math angle
+    angle = 90 - np.degrees(np.arctan2(delta[:, 1], delta[:, 0]))
+
+    gap = np.full(len(connections), np.nan)
+    line_x = np.column_stack([src[:, 0], dst[:, 0], gap]).ravel()
+    line_y = np.column_stack([src[:, 1], dst[:, 1], gap]).ravel()
+    return line_x, line_y, arrow[:, 0], arrow[:, 1], angle
+
+
+def build_figure(components, connections, positions=None, layout='auto'):
+    """Build the architecture figure for the given topology.
+
+    ``positions`` (``{name: (x, y)}``) is computed with
+    :func:`simgen.layout.auto_layout` using ``layout`` when not given. The
+    trace count is constant in the number of edges (one line trace, one
+    arrowhead trace) and grows only with the number of component types.
+    """
+    import plotly.graph_objects as go
+
+    if positions is None:
+        from simgen.layout import auto_layout
+        positions = auto_layout(list(components), connections, layout)
+
+    # Create figure
+    fig = go.Figure()
+
+    # Add all connection lines and arrowheads as two traces
+    line_x, line_y, arrow_x, arrow_y, arrow_angle = edge_geometry(positions, connections)
+    fig.add_trace(go.Scatter(
+        x=line_x,
+        y=line_y,
+        mode='lines',
+        line=dict(color=EDGE_COLOR, width=2),
+        connectgaps=False,
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=arrow_x,
+        y=arrow_y,
+        mode='markers',
+        marker=dict(
+            symbol='triangle-up',
+            size=8,
+            color=EDGE_COLOR,
+            angle=arrow_angle
+        ),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+
+    # Add component nodes, one trace (and legend entry) per component type
+    by_type = {}
+    for comp_name in positions:
+        by_type.setdefault(components[comp_name]['type'], []).append(comp_name)
+
+    for comp_type, names in by_type.items():
+        infos = [components[name] for name in names]
+        fig.add_trace(go.Scatter(
+            x=[positions[name][0] for name in names],
+            y=[positions[name][1] for name in names],
+            mode='markers+text',
+            marker=dict(
+                symbol=[info['symbol'] for info in infos],
+                size=[info['size'] for info in infos],
+                color=[info['color'] for info in infos],
+                line=dict(width=2, color='white')
+            ),
+            text=names,
+            textposition="middle center",
+            textfont=dict(size=9, color='black'),
+            name=comp_type,
+            showlegend=True,
+            hovertemplate="<b>%{text}</b><extra></extra>"
+        ))
+
+    # Fit the axes around the laid out nodes
+    xs = [pos[0] for pos in positions.values()] or [0]
+    ys = [pos[1] for pos in positions.values()] or [0]
+
+    # Update layout
+    fig.update_layout(
+        title="Sim Studio Architecture",
+        xaxis=dict(
+            showgrid=False,
+            showticklabels=False,
+            zeroline=False,
+            range=[min(xs) - 1, max(xs) + 1]
+        ),
+        yaxis=dict(
+            showgrid=False,
+            showticklabels=False,
+            zeroline=False,
+            range=[min(ys) - 1, max(ys) + 1]
+        ),
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=1.05,
+            xanchor='center',
+            x=0.5
+        ),
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+
+    return fig
@@ -0,0 +1,260 @@
+# Diagram export service
+#
+# Keeps one kaleido/Chromium process alive for a whole batch of figures x
+# formats, and skips rendering entirely when an identical diagram (same
+# topology, layout, style and export options) is already in the on-disk
+# render cache. HTML is written by plotly directly and never starts kaleido.
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from simgen import diagram
+from simgen.incremental import atomic_write, write_tree
+
+FORMATS = ('png', 'svg', 'pdf', 'html')
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'simgen', 'diagrams')
+
+# Source files whose code determines how a diagram looks; editing them
+# invalidates every cached render
+_STYLE_SOURCES = ('diagram.py', 'layout.py')
+
+
+def _style_fingerprint():
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _STYLE_SOURCES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class _KaleidoWorker:
+    """A kaleido >= 1.0 browser kept open on a private event loop thread.
+
+    Unlike kaleido's global sync server, failures (e.g. Chrome missing)
+    propagate to the caller instead of leaving it waiting forever.
+    """
+
+    def __init__(self, kaleido, jobs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        try:
+            self.browser = self._call(self._open(kaleido, jobs))
+        except BaseException:
+            self._stop_loop()
+            raise
+
+    @staticmethod
+    async def _open(kaleido, jobs):
+        browser = kaleido.Kaleido(n=jobs)
+        await browser.__aenter__()
+        return browser
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def write(self, fig_dicts):
+        self._call(self.browser.write_fig_from_object(fig_dicts, cancel_on_error=True))
+
+    def _stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def close(self):
+        try:
+            self._call(self.browser.__aexit__(None, None, None))
+        finally:
+            self._stop_loop()
+
+
+class DiagramSpec:
+    """Inputs of one diagram: its topology plus the layout to apply.
+
+    Components and connections come from ``topology`` (by default the one
+    described by the rendered templates) unless given explicitly.
+    """
+
+    __slots__ = ('name', 'components', 'connections', 'positions', 'layout')
+
+    def __init__(self, name='sim_studio_architecture', topology=None, components=None,
+                 connections=None, positions=None, layout='auto'):
+        if components is None or connections is None:
+            if topology is None:
+                from simgen.topology import default_topology
+                topology = default_topology()
+            derived = diagram.topology_graph(topology)
+            components = derived[0] if components is None else components
+            connections = derived[1] if connections is None else connections
+        self.name = name
+        self.components = components
+        self.connections = connections
+        self.positions = positions
+        self.layout = layout
+
+    def inputs(self):
+        return {
+            'components': self.components,
+            'connections': [list(edge) for edge in self.connections],
+            'positions': self.positions,
+            'layout': self.layout,
+        }
+
+    def build_figure(self):
+        return diagram.build_figure(self.components, self.connections,
+                                    positions=self.positions, layout=self.layout)
+
+
+class ExportSession:
+    """Render batches of diagrams through one long-lived kaleido process.
+
+    Use as a context manager; the export process is started lazily on the
+    first cache miss that needs it and stopped on exit::
+
+        with ExportSession() as session:
+            session.export([DiagramSpec()], ['png', 'svg', 'html'], out_dir='docs')
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, jobs=1, width=None, height=None, scale=1,
+                 use_cache=True):
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.options = {'width': width, 'height': height, 'scale': scale}
+        self.use_cache = use_cache
+        self._kaleido = None
+        self._fingerprint = None
+        self.stats = {'cached': 0, 'rendered': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._kaleido, _KaleidoWorker):
+            self._kaleido.close()
+        self._kaleido = None
+
+    def _start(self):
+        # kaleido >= 1.0 drives Chromium, which we keep open for the whole
+        # session; kaleido 0.2 keeps its own subprocess alive per interpreter
+        # through plotly's scope, so there is nothing to start
+        if self._kaleido is None:
+            import kaleido
+            if hasattr(kaleido, 'Kaleido'):
+                self._kaleido = _KaleidoWorker(kaleido, self.jobs)
+            else:
+                self._kaleido = kaleido
+        return self._kaleido
+
+    def cache_key(self, spec, fmt):
+        if self._fingerprint is None:
+            self._fingerprint = _style_fingerprint()
+        payload = json.dumps({
+            'style': self._fingerprint,
+            'inputs': spec.inputs(),
+            'format': fmt,
+            'options': self.options if fmt != 'html' else None,
+        }, sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.{fmt}')
+
+    def render(self, specs, formats):
+        """Render every spec in every format.
+
+        Returns ``{(spec.name, fmt): bytes}``. Cache hits are read from disk;
+        misses are rendered in one batch and stored in the cache.
+        """
+        unknown = [fmt for fmt in formats if fmt not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown format(s): {', '.join(unknown)} (expected: {', '.join(FORMATS)})")
+
+        names = [spec.name for spec in specs]
+        if len(set(names)) != len(names):
+            raise ValueError("Diagram names must be unique within a batch")
+
+        results = {}
+        misses = []
+        for spec in specs:
+            for fmt in formats:
+                key = self.cache_key(spec, fmt)
+                path = self._cache_path(key, fmt)
+                if self.use_cache and os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        results[(spec.name, fmt)] = f.read()
+                    self.stats['cached'] += 1
+                else:
+                    misses.append((spec, fmt, path))
+
+        if misses:
+            figures = {}
+            for spec, _, _ in misses:
+                if spec.name not in figures:
+                    figures[spec.name] = spec.build_figure()
+            for (spec, fmt, _), data in zip(misses, self._render_batch(figures, misses)):
+                results[(spec.name, fmt)] = data
+                self.stats['rendered'] += 1
+            if self.use_cache:
+                for spec, fmt, path in misses:
+                    atomic_write(path, results[(spec.name, fmt)])
+        return results
+
+    def _render_batch(self, figures, misses):
+        outputs = [None] * len(misses)
+        images = []
+        for i, (spec, fmt, _) in enumerate(misses):
+            if fmt == 'html':
+                html = figures[spec.name].to_html(include_plotlyjs='cdn', full_html=True)
+                outputs[i] = html.encode('utf-8')
+            else:
+                images.append(i)
+        if not images:
+            return outputs
+
+        kaleido = self._start()
+        opts = {key: value for key, value in self.options.items() if value is not None}
+        if isinstance(kaleido, _KaleidoWorker):
+            # One call hands the whole batch to the running Chromium tabs
+            staging = os.path.join(self.cache_dir, 'staging', str(os.getpid()))
+            os.makedirs(staging, exist_ok=True)
+            try:
+                jobs = []
+                for i in images:
+                    spec, fmt, _ = misses[i]
+                    jobs.append({
+                        'fig': figures[spec.name],
+                        'path': os.path.join(staging, f'{i}.{fmt}'),
+                        'opts': dict(opts, format=fmt),
+                    })
+                kaleido.write(jobs)
+                for i, job in zip(images, jobs):
+                    with open(job['path'], 'rb') as f:
+                        outputs[i] = f.read()
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        else:
+            for i in images:
+                spec, fmt, _ = misses[i]
+                outputs[i] = figures[spec.name].to_image(format=fmt, **opts)
+        return outputs
+
+    def export(self, specs, formats, out_dir='.'):
+        """Render and write ``{out_dir}/{spec.name}.{fmt}`` for every pair.
+
+        Outputs go through the incremental writer, so files whose bytes did
+        not change are left untouched. Returns ``{relpath: action}``.
+        """
+        rendered = self.render(specs, formats)
+        files = {f'{name}.{fmt}': data for (name, fmt), data in rendered.items()}
+        return write_tree(files, root=out_dir)
@@ -0,0 +1,387 @@
+# Socket.IO fan-out load test for the realtime server
+#
+# Opens thousands of websocket clients (simgen.sockio) spread over rooms,
+# the way collaborators spread over workflows, and drives edit events at a
+# target rate from random members. The load is open loop: edits go out on
+# schedule whether or not earlier ones were delivered, so a saturated server
+# shows up as growing latency and drops instead of a lower send rate. Every
+# edit carries its sequence number; receivers look up its send time for the
+# end-to-end broadcast latency and count deliveries against room size - 1
+# (the sender is excluded, as with socket.to(room)). The server's memory is
+# sampled throughout (docker stats of the compose service, or the RSS on its
+# /metrics), and the run is returned as one JSON-serializable report.
+
+import asyncio
+import json
+import random
+import re
+import subprocess
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+
+from simgen.logstats import Histogram
+from simgen.probe import percentile
+from simgen.sockio import Client
+
+DEFAULT_URL = 'http://localhost:3001'
+REPORT_VERSION = 1
+MARKER = '__bench'  # key of the [sequence] marker inside each edit
+
+_SIZE_RE = re.compile(r'^\s*([\d.]+)\s*([KMGT]?i?B)', re.IGNORECASE)
+_UNITS = {'b': 1, 'kb': 1e3, 'mb': 1e6, 'gb': 1e9, 'tb': 1e12,
+          'kib': 1 << 10, 'mib': 1 << 20, 'gib': 1 << 30, 'tib': 1 << 40}
+_RSS_RE = re.compile(r'^\w*process_memory_bytes\{[^}]*type="rss"[^}]*\}\s+(\S+)', re.MULTILINE)
+
+
+class FanoutConfig:
+    """What to run: ``clients`` connections over ``rooms`` rooms, ``rate``
+    edits per second for ``duration`` seconds. Event names and payload
+    keys default to Sim Studio's realtime protocol."""
+
+    FIELDS = ('url', 'clients', 'rooms', 'rate', 'duration', 'connect_concurrency',
+              'settle', 'drain', 'join_event', 'edit_event', 'receive_event', 'room_key',
+              'room_prefix', 'auth', 'seed')
+
+    __slots__ = FIELDS
+
+    def __init__(self, url=DEFAULT_URL, clients=1000, rooms=50, rate=100, duration=30,
+                 connect_concurrency=200, settle=1.0, drain=5.0, join_event='join-workflow',
+                 edit_event='workflow-operation', receive_event=None, room_key='workflowId',
+                 room_prefix='bench-', auth=None, seed=1):
+        self.url = url
+        self.clients = int(clients)
+        self.rooms = int(rooms)
+        self.rate = float(rate)
+        self.duration = float(duration)
+        self.connect_concurrency = int(connect_concurrency)
+        self.settle = float(settle)
+        self.drain = float(drain)
+        self.join_event = join_event
+        self.edit_event = edit_event
+        self.receive_event = receive_event or edit_event
+        self.room_key = room_key
+        self.room_prefix = room_prefix
+        self.auth = auth
+        self.seed = seed
+        if self.clients < 2:
+            raise ValueError(f"clients must be >= 2 (got {clients})")
+        if not 1 <= self.rooms <= self.clients // 2:
+            raise ValueError(f"rooms must be between 1 and clients / 2 so every room has a "
+                             f"receiver (got {rooms})")
+        if self.rate <= 0 or self.duration <= 0:
+            raise ValueError("rate and duration must be > 0")
+        if self.connect_concurrency < 1:
+            raise ValueError(f"connect_concurrency must be >= 1 (got {connect_concurrency})")
+
+    def as_dict(self):
+        values = {key: getattr(self, key) for key in self.FIELDS}
+        values['auth'] = None if self.auth is None else '<set>'  # never report tokens
+        return values
+
+    def edit(self, sequence, sender, room):
+        """The edit sent as the ``sequence``-th event (a block move)."""
+        return {
+            'operation': 'update-position',
+            'target': 'block',
+            'payload': {'id': f'bench-block-{sender}', 'position': {
+                'x': sequence % 800, 'y': sequence % 600}, MARKER: [sequence]},
+            'timestamp': int(time.time() * 1000),
+            'operationId': f'bench-{room}-{sequence}',
+        }
+
+
+def _marker(value, depth=0):
+    # The sequence marker, wherever the server put the edit in its broadcast
+    if isinstance(value, dict):
+        if MARKER in value:
+            return value[MARKER][0]
+        if depth < 3:
+            for item in value.values():
+                if isinstance(item, (dict, list)):
+                    found = _marker(item, depth + 1)
+                    if found is not None:
+                        return found
+    elif isinstance(value, list) and depth < 3:
+        for item in value:
+            found = _marker(item, depth + 1)
+            if found is not None:
+                return found
+    return None
+
+
+def parse_size(text):
+    """Bytes in a docker size such as ``123.4MiB`` (None if unparsable)."""
+    match = _SIZE_RE.match(text)
+    if not match:
+        return None
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def compose_container(service='realtime'):
+    """Container id of a docker compose service (None if not running)."""
+    try:
+        output = subprocess.run(['docker', 'compose', 'ps', '-q', service], capture_output=True,
+                                text=True, timeout=15).stdout.split()
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return output[0] if output else None
+
+
+async def docker_memory(container):
+    """Memory usage of ``container`` from ``docker stats`` (bytes)."""
+    proc = await asyncio.create_subprocess_exec(
+        'docker', 'stats', '--no-stream', '--format', '{{.MemUsage}}', container,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    output, _ = await proc.communicate()
+    return parse_size(output.decode('utf-8', 'replace'))
+
+
+async def metrics_memory(url, token=None):
+    """RSS reported by lib/metrics.js (``process_memory_bytes{type="rss"}``),
+    sending ``token`` as its METRICS_TOKEN bearer token when given."""
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    auth = f'Authorization: Bearer {token}\r\n' if token else ''
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        writer.write((f'GET {parts.path or "/"} HTTP/1.1\r\nHost: {parts.hostname}\r\n'
+                      f'{auth}Connection: close\r\n\r\n').encode('latin-1'))
+        body = (await reader.read()).decode('utf-8', 'replace')
+    finally:
+        writer.close()
+    match = _RSS_RE.search(body)
+    return int(float(match.group(1))) if match else None
+
+
+class MemorySampler:
+    """Samples ``read()`` (an async callable returning bytes) every
+    ``interval`` seconds in the background."""
+
+    def __init__(self, source, read, interval=2.0):
+        self.source = source
+        self.read = read
+        self.interval = interval
+        self.samples = []
+        self.errors = 0
+        self._start = None
+        self._task = None
+
+    async def sample(self):
+        try:
+            value = await asyncio.wait_for(self.read(), max(5.0, self.interval))
+        except (OSError, asyncio.TimeoutError, ValueError):
+            value = None
+        if value is None:
+            self.errors += 1
+        else:
+            self.samples.append((round(time.perf_counter() - self._start, 2), value))
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sample()
+
+    async def start(self):
+        self._start = time.perf_counter()
+        await self.sample()
+        self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.sample()
+
+    def as_dict(self):
+        values = [value for _, value in self.samples]
+        return {
+            'source': self.source,
+            'start_bytes': values[0] if values else None,
+            'peak_bytes': max(values) if values else None,
+            'end_bytes': values[-1] if values else None,
+            'growth_bytes': values[-1] - values[0] if values else None,
+            'failed_samples': self.errors,
+            'samples': self.samples,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _raise_open_files(needed):
+    # Every client is a socket; the usual soft limit of 1024 is too low
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+async def run_fanout(config, memory=None, progress=None):
+    """Run one fan-out test; return the report (a JSON-serializable dict).
+
+    ``memory`` is an optional :class:`MemorySampler`; ``progress`` is called
+    with a short status string between phases.
+    """
+    _raise_open_files(config.clients + 256)
+    rng = random.Random(config.seed)
+    rooms = [f'{config.room_prefix}{i}' for i in range(config.rooms)]
+    total = max(1, round(config.rate * config.duration))
+    sent_at = array('d', bytes(8 * total))
+    expected = array('l', bytes(array('l').itemsize * total))
+    received = array('l', bytes(array('l').itemsize * total))
+    latencies = array('d')
+    connect_times = []
+    errors = Counter()
+    state = {'running': False, 'disconnected': 0, 'unmatched': 0}
+
+    def on_edit(*args):
+        now = time.perf_counter()
+        sequence = _marker(list(args))
+        if sequence is None or not 0 <= sequence < total or not sent_at[sequence]:
+            state['unmatched'] += 1
+            return
+        received[sequence] += 1
+        latencies.append(now - sent_at[sequence])
+
+    def on_disconnect(reason):
+        if state['running']:
+            state['disconnected'] += 1
+            errors[f'disconnected: {reason}'] += 1
+
+    semaphore = asyncio.Semaphore(config.connect_concurrency)
+    members = {room: [] for room in rooms}
+
+    async def open_client(index):
+        room = rooms[index % len(rooms)]
+        client = Client(config.url)
+        client.on(config.receive_event, on_edit)
+        client.on('disconnect', on_disconnect)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(client.connect(auth=config.auth), 15)
+            except asyncio.TimeoutError:
+                errors['connect: timed out after 15s'] += 1
+                return None
+            except (OSError, ValueError) as e:
+                errors[f'connect: {e.strerror or e if isinstance(e, OSError) else e}'] += 1
+                return None
+            connect_times.append(time.perf_counter() - start)
+        client.emit(config.join_event, {config.room_key: room})
+        members[room].append(client)
+        return client
+
+    if memory:
+        await memory.start()
+    if progress:
+        progress(f"connecting {config.clients:,} clients to {config.url}")
+    started = time.perf_counter()
+    clients = [c for c in await asyncio.gather(*(open_client(i) for i in range(config.clients)))
+               if c is not None]
+    connect_elapsed = time.perf_counter() - started
+    await asyncio.sleep(config.settle)  # let the server process the joins
+
+    senders = [(client, room) for room, room_members in members.items() if len(room_members) > 1
+               for client in room_members]
+    sent = 0
+    max_lag = 0.0
+    send_elapsed = 0.0
+    if senders:
+        if progress:
+            progress(f"sending {total:,} edits at {config.rate:g}/s over {len(clients):,} "
+                     f"connected clients")
+        state['running'] = True
+        interval = 1 / config.rate
+        start = time.perf_counter()
+        while sent < total:
+            delay = start + sent * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.perf_counter()
+            # Catch up in a burst when the loop fell behind the schedule
+            while sent < total and start + sent * interval <= now:
+                max_lag = max(max_lag, now - (start + sent * interval))
+                sender = rng.randrange(len(senders))
+                client, room = senders[sender]
+                if client.connected:
+                    expected[sent] = sum(1 for member in members[room] if member.connected) - 1
+                    sent_at[sent] = time.perf_counter()
+                    client.emit(config.edit_event, config.edit(sent, sender, room))
+                sent += 1
+        send_elapsed = time.perf_counter() - start
+
+        # Wait for stragglers
+        deadline = time.perf_counter() + config.drain
+        want = sum(expected)
+        while sum(received) < want and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        state['running'] = False
+
+    if memory:
+        await memory.stop()
+    await asyncio.gather(*(client.close() for client in clients))
+
+    attempted = sum(1 for t in sent_at if t)
+    want = sum(expected)
+    delivered = sum(min(r, e) for r, e in zip(received, expected))
+    duplicates = sum(max(0, r - e) for r, e in zip(received, expected))
+    ordered = sorted(latencies)
+    connect = sorted(connect_times)
+    histogram = Histogram()
+    for latency in ordered:
+        histogram.record(latency * 1e6)
+    return {
+        'version': REPORT_VERSION,
+        'kind': 'fanout',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': config.as_dict(),
+        'connections': {
+            'requested': config.clients,
+            'connected': len(clients),
+            'failed': config.clients - len(clients),
+            'disconnected': state['disconnected'],
+            'connect_s': round(connect_elapsed, 3),
+            'connect_p50_ms': _ms(percentile(connect, 50)),
+            'connect_p99_ms': _ms(percentile(connect, 99)),
+        },
+        'edits': {
+            'sent': attempted,
+            'target_rate': config.rate,
+            'achieved_rate': round(attempted / send_elapsed, 2) if send_elapsed else 0.0,
+            'max_send_lag_ms': _ms(max_lag),
+            'expected_deliveries': want,
+            'delivered': delivered,
+            'dropped': want - delivered,
+            'drop_rate': round((want - delivered) / want, 6) if want else None,
+            'duplicates': duplicates,
+            'unmatched': state['unmatched'],
+        },
+        'latency_ms': {
+            'p50': _ms(percentile(ordered, 50)),
+            'p90': _ms(percentile(ordered, 90)),
+            'p99': _ms(percentile(ordered, 99)),
+            'p99.9': _ms(percentile(ordered, 99.9)),
+            'max': _ms(ordered[-1] if ordered else None),
+            'mean': _ms(sum(ordered) / len(ordered) if ordered else None),
+        },
+        'histogram': histogram.to_dict(),
+        'memory': memory.as_dict() if memory else None,
+        'errors': dict(errors.most_common(10)),
+    }
+
+
+def run(config, **options):
+    """Synchronous wrapper around :func:`run_fanout`."""
+    return asyncio.run(run_fanout(config, **options))
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
@@ -0,0 +1,896 @@
+# Caching gateway for the AI provider APIs
+#
+# A private service between the web app and OpenAI, Anthropic, Google AI and
+# DeepSeek (`/<provider>/<API path>`). Upstream connections are pooled per
+# provider and kept open (HTTP/2 when the h2 package is installed, so one
+# connection multiplexes every request). Deterministic completions (an
+# explicit temperature of 0) are cached: an in-memory LRU bounded by entries
+# and bytes with a TTL, in front of an optional disk tier that survives
+# restarts (GATEWAY_DISK_CACHE, on the service's disk at /app/data).
+# Identical requests already in flight are coalesced into one upstream call,
+# so a burst of workflow runs sending the same prompt pays for it once.
+# Everything else is streamed through untouched. API keys pass through from
+# the app; their hash is part of the cache key, so accounts never share
+# entries.
+#
+# Chat completions for models listed in GATEWAY_ROUTES are also routed:
+# latency is tracked per provider and model with exponentially decaying
+# weights, traffic moves to the fastest healthy equivalent, and a request
+# still unanswered at its target's p95 is hedged with a duplicate to the
+# next one, the slower of the two being cancelled. Other providers are
+# reached through their OpenAI-compatible APIs with the keys the gateway
+# holds (OPENAI_API_KEY, ...).
+#
+# This file is shipped as-is into the generated tree (gateway/gateway.py)
+# and only needs the standard library and httpx:
+#
+#   python gateway.py                    # configured from the environment
+#   python -m simgen gateway --stub      # locally, against stub providers
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import random
+import time
+from collections import Counter, OrderedDict
+from http import HTTPStatus
+
+UPSTREAMS = {
+    'openai': 'https://api.openai.com',
+    'anthropic': 'https://api.anthropic.com',
+    'google': 'https://generativelanguage.googleapis.com',
+    'deepseek': 'https://api.deepseek.com',
+}
+# Request headers that select the account; hashed into the cache key
+AUTH_HEADERS = ('authorization', 'x-api-key', 'x-goog-api-key', 'api-key')
+FORWARD_HEADERS = AUTH_HEADERS + (
+    'content-type', 'accept', 'user-agent', 'anthropic-version', 'anthropic-beta',
+    'openai-organization', 'openai-project', 'openai-beta', 'x-stainless-retry-count')
+# Response headers forwarded (and cached); encodings are undone by httpx
+RESPONSE_HEADERS = ('content-type', 'request-id', 'x-request-id', 'openai-model',
+                    'openai-processing-ms', 'retry-after')
+# OpenAI-compatible chat completions of each provider: where routed and
+# hedged requests go when they change provider
+CHAT_PATHS = {
+    'openai': '/v1/chat/completions',
+    'anthropic': '/v1/chat/completions',
+    'google': '/v1beta/openai/chat/completions',
+    'deepseek': '/chat/completions',
+}
+# Keys used for a provider other than the one the app called (the app's own
+# key is passed through for its provider)
+API_KEY_ENV = {'openai': 'OPENAI_API_KEY', 'anthropic': 'ANTHROPIC_API_KEY',
+               'google': 'GOOGLE_API_KEY', 'deepseek': 'DEEPSEEK_API_KEY'}
+
+# Latency buckets 5% wide from 1ms to ~40 minutes
+_BUCKET_MIN_S = 0.001
+_BUCKET_GROWTH = 1.05
+_BUCKETS = 300
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+
+def _env(environ, name, default, kind=int):
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return kind(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} value {value!r}") from None
+
+
+def deterministic(provider, payload):
+    """Whether a request body asks for a reproducible completion."""
+    if not isinstance(payload, dict):
+        return False
+    if provider == 'google':
+        config = payload.get('generationConfig') or {}
+        return config.get('temperature') == 0 and not config.get('candidateCount', 1) > 1
+    return payload.get('temperature') == 0 and payload.get('n', 1) == 1
+
+
+def _model(provider, path, payload):
+    if isinstance(payload, dict) and isinstance(payload.get('model'), str):
+        return payload['model']
+    if provider == 'google' and '/models/' in path:
+        return path.split('/models/', 1)[1].split(':', 1)[0].split('?', 1)[0]
+    return None
+
+
+def _retryable(status):
+    return status >= 500 or status == 429
+
+
+def load_routes(text):
+    """Parse GATEWAY_ROUTES: JSON, or the path of a JSON file, mapping a
+    requested model to its equivalent ``provider:model`` targets::
+
+        {"gpt-4o-mini": ["openai:gpt-4o-mini", "deepseek:deepseek-chat"]}
+    """
+    text = (text or '').strip()
+    if not text:
+        return {}
+    if not text.startswith('{'):
+        with open(text, encoding='utf-8') as f:
+            text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid GATEWAY_ROUTES: {e}") from None
+    routes = {}
+    for model, targets in data.items():
+        group = []
+        for target in targets:
+            provider, sep, name = str(target).partition(':')
+            if not sep or not name or provider not in CHAT_PATHS:
+                raise ValueError(f"Invalid GATEWAY_ROUTES target {target!r} for {model!r} "
+                                 f"(expected PROVIDER:MODEL with PROVIDER one of: "
+                                 f"{', '.join(CHAT_PATHS)})")
+            group.append((provider, name))
+        routes[model] = group
+    return routes
+
+
+def cache_key(provider, method, path, payload, headers, query_key=None):
+    """Cache key of a request: provider, route, canonical JSON body and a
+    hash of the credentials (header or ``?key=``)."""
+    digest = hashlib.sha256()
+    credentials = '\0'.join(headers.get(name, '') for name in AUTH_HEADERS) + (query_key or '')
+    for part in (provider, method, path, json.dumps(payload, sort_keys=True, separators=(',', ':')),
+                 hashlib.sha256(credentials.encode('utf-8')).hexdigest()):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class Entry:
+    """A cached response; ``elapsed`` is what the upstream call took."""
+
+    __slots__ = ('status', 'headers', 'body', 'expires', 'elapsed')
+
+    def __init__(self, status, headers, body, expires, elapsed=0.0):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+        self.elapsed = elapsed
+
+    def to_bytes(self):
+        meta = json.dumps({'status': self.status, 'headers': self.headers,
+                           'expires': self.expires, 'elapsed': self.elapsed}).encode('utf-8')
+        return len(meta).to_bytes(4, 'little') + meta + self.body
+
+    @classmethod
+    def from_bytes(cls, data):
+        length = int.from_bytes(data[:4], 'little')
+        meta = json.loads(data[4:4 + length])
+        return cls(meta['status'], [tuple(h) for h in meta['headers']], data[4 + length:],
+                   meta['expires'], meta.get('elapsed', 0.0))
+
+
+class MemoryCache:
+    """LRU of entries, bounded by count and total body bytes."""
+
+    def __init__(self, max_entries=2000, max_bytes=256 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key, now=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= (now or time.time()):
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if len(entry.body) > self.max_bytes or self.max_entries < 1:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.bytes += len(entry.body)
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        self.bytes -= len(self.entries.pop(key).body)
+
+
+class DiskCache:
+    """Entries as files under ``directory``, oldest removed past ``max_bytes``.
+
+    Methods block; the gateway calls them on a worker thread.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.bytes = sum(entry.stat().st_size for entry in self._files())
+
+    def _files(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                yield from (entry for entry in os.scandir(shard.path)
+                            if entry.name.endswith('.entry'))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.entry')
+
+    def get(self, key, now=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = Entry.from_bytes(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry.expires <= (now or time.time()):
+            self._unlink(path)
+            return None
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = entry.to_bytes()
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        self.bytes += len(data)
+        if self.bytes > self.max_bytes:
+            self.trim()
+
+    def _unlink(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+            self.bytes -= size
+        except OSError:
+            pass
+
+    def trim(self):
+        """Remove the least recently written entries down to 90% of the cap."""
+        files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                        for entry in self._files()))
+        self.bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.bytes <= self.max_bytes * 0.9:
+                break
+            self._unlink(path)
+
+
+class TargetStats:
+    """Latency (time to first byte) and error rate of one provider and
+    model, with exponentially decaying weights: forward decay, where a
+    sample counts twice as much as one recorded ``half_life`` seconds
+    earlier, so percentiles follow a provider that slows down or recovers
+    within a few half-lives."""
+
+    __slots__ = ('half_life', 'landmark', 'buckets', 'successes', 'errors')
+
+    def __init__(self, half_life=60.0, now=None):
+        self.half_life = half_life
+        self.landmark = time.monotonic() if now is None else now
+        self.buckets = [0.0] * _BUCKETS
+        self.successes = 0.0
+        self.errors = 0.0
+
+    def _weight(self, now):
+        weight = 2.0 ** ((now - self.landmark) / self.half_life)
+        if weight > 1e12:  # rescale before the weights overflow
+            self.buckets = [count / weight for count in self.buckets]
+            self.successes /= weight
+            self.errors /= weight
+            self.landmark = now
+            weight = 1.0
+        return weight
+
+    def record(self, seconds, ok, now):
+        weight = self._weight(now)
+        if not ok:
+            self.errors += weight
+            return
+        self.successes += weight
+        index = (0 if seconds <= _BUCKET_MIN_S else
+                 int(math.log(seconds / _BUCKET_MIN_S) / _LOG_GROWTH) + 1)
+        self.buckets[min(index, _BUCKETS - 1)] += weight
+
+    def samples(self, now):
+        """Requests recorded, decayed to ``now``."""
+        return (self.successes + self.errors) / 2.0 ** ((now - self.landmark) / self.half_life)
+
+    def error_rate(self):
+        total = self.successes + self.errors
+        return self.errors / total if total else 0.0
+
+    def quantile(self, q):
+        """Upper bound in seconds of the bucket holding quantile ``q``."""
+        rank = q * sum(self.buckets)
+        if not rank:
+            return None
+        cumulative = 0.0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if count and cumulative >= rank:
+                return _BUCKET_MIN_S * _BUCKET_GROWTH ** index
+        return _BUCKET_MIN_S * _BUCKET_GROWTH ** max(
+            i for i, count in enumerate(self.buckets) if count)
+
+    def as_dict(self, now):
+        def ms(q):
+            value = self.quantile(q)
+            return None if value is None else round(value * 1000, 1)
+        return {'samples': round(self.samples(now), 1), 'p50_ms': ms(0.5), 'p95_ms': ms(0.95),
+                'error_rate': round(self.error_rate(), 4)}
+
+
+class Router:
+    """Where routed chat completions go and when they are hedged.
+
+    ``routes`` maps a requested model to equivalent ``(provider, model)``
+    targets; targets on another provider need its key in ``keys``. A
+    request stays on its own target unless that is unhealthy (half its
+    recent calls failing) or another healthy target's median is below
+    ``margin`` of its own; an ``explore`` share goes to the least measured
+    alternative so every target's numbers stay current. An attempt still
+    unanswered at its target's ``hedge_quantile`` latency gets one duplicate
+    on the next target, and hedges are capped at ``hedge_budget`` of routed
+    requests so a slowdown everywhere cannot double the load.
+    """
+
+    def __init__(self, routes=None, keys=None, half_life=60.0, hedge=True,
+                 hedge_quantile=0.95, hedge_budget=0.1, margin=0.8, explore=0.02,
+                 min_samples=5, seed=None):
+        if not 0 < hedge_quantile < 1:
+            raise ValueError(f"hedge quantile must be between 0 and 1 (got {hedge_quantile})")
+        if hedge_budget < 0:
+            raise ValueError(f"hedge budget must be >= 0 (got {hedge_budget})")
+        if half_life <= 0:
+            raise ValueError(f"latency half-life must be > 0 (got {half_life})")
+        self.routes = dict(routes or {})
+        self.keys = dict(keys or {})
+        self.half_life = half_life
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.margin = margin
+        self.explore = explore
+        self.min_samples = min_samples
+        self.random = random.Random(seed)
+        self.targets = {}
+        self.counts = Counter()
+        self._tokens = 1.0
+
+    def stats(self, target, now=None):
+        stats = self.targets.get(target)
+        if stats is None:
+            stats = self.targets[target] = TargetStats(self.half_life, now)
+        return stats
+
+    def record(self, target, seconds, ok, now):
+        self.stats(target, now).record(seconds, ok, now)
+
+    def _median(self, target, now):
+        stats = self.stats(target, now)
+        return stats.quantile(0.5) if stats.samples(now) >= self.min_samples else None
+
+    def _healthy(self, target, now):
+        stats = self.stats(target, now)
+        return stats.samples(now) < self.min_samples or stats.error_rate() < 0.5
+
+    def plan(self, provider, model, now):
+        """Targets to try for ``model`` requested from ``provider``, first
+        choice first; None when the model is not routed."""
+        group = self.routes.get(model)
+        if not group:
+            return None
+        requested = (provider, model)
+        targets = [t for t in group if t[0] == provider or t[0] in self.keys]
+        if requested not in targets:
+            targets.insert(0, requested)
+        self.counts['routed'] += 1
+        self._tokens = min(self._tokens + self.hedge_budget, 10.0)
+
+        healthy = [t for t in targets if self._healthy(t, now)]
+        medians = {t: self._median(t, now) for t in healthy}
+        ranked = sorted(healthy, key=lambda t: (medians[t] is None, medians[t] or 0.0))
+        first = requested if requested in medians else (ranked[0] if ranked else requested)
+        if first != requested:
+            self.counts['shifted'] += 1
+        elif ranked and medians[ranked[0]] is not None and medians[first] is not None \
+                and medians[ranked[0]] < self.margin * medians[first]:
+            first = ranked[0]
+            self.counts['shifted'] += 1
+        others = [t for t in healthy if t != first]
+        if others and self.random.random() < self.explore:
+            first = min(others, key=lambda t: self.stats(t, now).samples(now))
+            self.counts['explored'] += 1
+        return [first] + [t for t in ranked if t != first] + [
+            t for t in targets if t not in medians and t != first]
+
+    def hedge_delay(self, target, now):
+        """Seconds before hedging an attempt on ``target`` (None: never)."""
+        if not self.hedge or self._median(target, now) is None:
+            return None
+        return self.stats(target, now).quantile(self.hedge_quantile)
+
+    def take_hedge(self):
+        if self._tokens < 1:
+            self.counts['hedges_denied'] += 1
+            return False
+        self._tokens -= 1
+        self.counts['hedged'] += 1
+        return True
+
+    def snapshot(self, now):
+        return {**self.counts, 'targets': {
+            f'{provider}:{model}': stats.as_dict(now)
+            for (provider, model), stats in sorted(self.targets.items())}}
+
+
+class Upstream:
+    """An upstream response whose first body chunk has arrived."""
+
+    __slots__ = ('response', 'first', 'chunks', 'target', 'routed', 'hedged')
+
+    def __init__(self, response, first, chunks, target):
+        self.response = response
+        self.first = first
+        self.chunks = chunks
+        self.target = target
+        self.routed = False
+        self.hedged = False
+
+    async def body(self):
+        if self.first:
+            yield self.first
+        async for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+class Gateway:
+    """The gateway server. ``upstreams`` maps a provider name (the first
+    path segment) to its base URL."""
+
+    def __init__(self, host='0.0.0.0', port=8080, upstreams=None, ttl=3600.0,
+                 cache_entries=2000, cache_bytes=256 << 20, disk_cache=None,
+                 disk_cache_bytes=1 << 30, connections=100, timeout=600.0, routes=None,
+                 api_keys=None, hedge=True, hedge_quantile=0.95, hedge_budget=0.1,
+                 half_life=60.0, seed=None):
+        self.host = host
+        self.port = port
+        self.upstreams = dict(upstreams or UPSTREAMS)
+        self.ttl = ttl
+        self.memory = MemoryCache(cache_entries, cache_bytes)
+        self.disk = DiskCache(disk_cache, disk_cache_bytes) if disk_cache else None
+        self.connections = connections
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'memory_hits': 0, 'disk_hits': 0, 'coalesced': 0,
+                      'misses': 0, 'bypassed': 0, 'upstream_errors': 0, 'saved_s': 0.0}
+        self.router = Router(routes, api_keys, half_life, hedge, hedge_quantile, hedge_budget,
+                             seed=seed)
+        self.http2 = importlib.util.find_spec('h2') is not None
+        self.clients = {}
+        self.server = None
+        self._inflight = {}
+        self._writers = set()
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Configuration from PORT and the GATEWAY_* variables."""
+        environ = os.environ if environ is None else environ
+        upstreams = {provider: environ.get(f'GATEWAY_{provider.upper()}_URL') or url
+                     for provider, url in UPSTREAMS.items()}
+        return cls(
+            host=environ.get('GATEWAY_HOST') or '0.0.0.0',
+            port=_env(environ, 'PORT', 8080),
+            upstreams=upstreams,
+            ttl=_env(environ, 'GATEWAY_CACHE_TTL_S', 3600.0, float),
+            cache_entries=_env(environ, 'GATEWAY_CACHE_ENTRIES', 2000),
+            cache_bytes=_env(environ, 'GATEWAY_CACHE_MB', 256) << 20,
+            disk_cache=environ.get('GATEWAY_DISK_CACHE') or None,
+            disk_cache_bytes=_env(environ, 'GATEWAY_DISK_CACHE_MB', 1024) << 20,
+            connections=_env(environ, 'GATEWAY_CONNECTIONS', 100),
+            timeout=_env(environ, 'GATEWAY_TIMEOUT_S', 600.0, float),
+            routes=load_routes(environ.get('GATEWAY_ROUTES')),
+            api_keys={provider: environ[key] for provider, key in API_KEY_ENV.items()
+                      if environ.get(key)},
+            hedge=(environ.get('GATEWAY_HEDGE') or 'on').lower() not in ('0', 'false', 'no', 'off'),
+            hedge_quantile=_env(environ, 'GATEWAY_HEDGE_QUANTILE', 0.95, float),
+            hedge_budget=_env(environ, 'GATEWAY_HEDGE_BUDGET', 0.1, float),
+            half_life=_env(environ, 'GATEWAY_LATENCY_HALF_LIFE_S', 60.0, float),
+        )
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        import httpx
+
+        limits = httpx.Limits(max_connections=self.connections,
+                              max_keepalive_connections=self.connections, keepalive_expiry=300)
+        timeout = httpx.Timeout(self.timeout, connect=10.0)
+        for provider, base in self.upstreams.items():
+            self.clients[provider] = httpx.AsyncClient(
+                base_url=base.rstrip('/'), http2=self.http2, limits=limits, timeout=timeout)
+        self.server = await asyncio.start_server(self._session, self.host, self.port,
+                                                 backlog=1024)
+        self.host, self.port = self.server.sockets[0].getsockname()[:2]
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.sleep(0)  # let the sessions see their connections close
+        await self.server.wait_closed()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for client in self.clients.values():
+            await client.aclose()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"LLM gateway on {self.url} (HTTP/2 upstream: {self.http2}, disk cache: "
+              f"{self.disk.directory if self.disk else 'off'}, routed models: "
+              f"{len(self.router.routes)}, hedging: {'on' if self.router.hedge else 'off'})",
+              flush=True)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    def snapshot(self):
+        return {**self.stats, 'saved_s': round(self.stats['saved_s'], 3),
+                'memory_entries': len(self.memory.entries), 'memory_bytes': self.memory.bytes,
+                'memory_evictions': self.memory.evictions,
+                'disk_bytes': self.disk.bytes if self.disk else None,
+                'inflight': len(self._inflight), 'http2': self.http2,
+                'routing': self.router.snapshot(time.monotonic())}
+
+    # HTTP/1.1 server side
+
+    async def _session(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    body = await _read_chunked(reader)
+                else:
+                    body = await reader.readexactly(int(headers.get('content-length') or 0))
+                await self._handle(writer, method, target, headers, body)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # shut down mid-request (nothing awaits connection handlers)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle(self, writer, method, target, headers, body):
+        path, _, query = target.partition('?')
+        if path in ('/health', '/stats'):
+            return await _respond(writer, 200, _json_headers(), json.dumps(
+                {'status': 'ok', **self.snapshot()}).encode('utf-8'))
+        provider, _, rest = path.lstrip('/').partition('/')
+        if provider not in self.clients:
+            return await _respond(writer, 404, _json_headers(), _error(
+                f"unknown provider {provider!r} (expected one of: {', '.join(self.clients)})"))
+        self.stats['requests'] += 1
+        upstream_path = '/' + rest + (f'?{query}' if query else '')
+        forward = {key: value for key, value in headers.items() if key in FORWARD_HEADERS}
+
+        payload = None
+        if method == 'POST' and body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+        if payload is None or not deterministic(provider, payload):
+            self.stats['bypassed'] += 1
+            return await self._forward(writer, provider, method, upstream_path, forward, body,
+                                       payload, 'BYPASS')
+
+        query_key = ''.join(part for part in query.split('&') if part.startswith('key='))
+        key = cache_key(provider, method, '/' + rest, payload, headers, query_key)
+        now = time.time()
+        entry = self.memory.get(key, now)
+        if entry is not None:
+            self.stats['memory_hits'] += 1
+        elif self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key, now)
+            if entry is not None:
+                self.stats['disk_hits'] += 1
+                self.memory.put(key, entry)
+        if entry is not None:
+            self.stats['saved_s'] += entry.elapsed
+            return await _respond(writer, entry.status, entry.headers + [('X-Cache', 'HIT')],
+                                  entry.body)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            entry = await asyncio.shield(pending)
+            self.stats['saved_s'] += entry.elapsed
+            return await _respond(writer, entry.status,
+                                  entry.headers + [('X-Cache', 'COALESCED')], entry.body)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            entry = await self._forward(writer, provider, method, upstream_path, forward, body,
+                                        payload, 'MISS', keep=True)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else ConnectionError('cancelled'))
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(entry)
+        if 200 <= entry.status < 300:
+            self.memory.put(key, entry)
+            if self.disk is not None:
+                task = asyncio.ensure_future(asyncio.to_thread(self.disk.put, key, entry))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _forward(self, writer, provider, method, path, headers, body, payload,
+                       cache_status, keep=False):
+        """Stream the upstream response to the client as it arrives; with
+        ``keep``, also return it as an :class:`Entry` (even if the client
+        went away, so coalesced requests still get it)."""
+        import httpx
+
+        start = time.perf_counter()
+        try:
+            upstream = await self._open(provider, method, path, headers, body, payload)
+        except httpx.HTTPError as e:
+            self.stats['upstream_errors'] += 1
+            message = _error(f"upstream {type(e).__name__}: {e}")
+            await _respond(writer, 502, _json_headers(), message)
+            return Entry(502, _json_headers(), message, 0.0) if keep else None
+
+        response = upstream.response
+        status = response.status_code
+        kept = [(name, response.headers[name]) for name in RESPONSE_HEADERS
+                if name in response.headers]
+        extra = [('X-Cache', cache_status)]
+        if upstream.routed:
+            extra.append(('X-Upstream', ':'.join(upstream.target)))
+        if upstream.hedged:
+            extra.append(('X-Hedged', '1'))
+        chunks = []
+        client_open = True
+        try:
+            try:
+                writer.write(_head(status, kept + extra))
+            except (ConnectionError, RuntimeError):
+                client_open = False
+            async for chunk in upstream.body():
+                if keep:
+                    chunks.append(chunk)
+                if client_open and chunk:
+                    try:
+                        writer.write(b'%x\r\n%b\r\n' % (len(chunk), chunk))
+                        await writer.drain()
+                    except (ConnectionError, RuntimeError):
+                        client_open = False
+        except httpx.HTTPError:
+            # Too late for a 502: cut the response short
+            self.stats['upstream_errors'] += 1
+            status = 502
+            if client_open:
+                writer.close()
+                client_open = False
+        finally:
+            await upstream.aclose()
+        if client_open:
+            try:
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            except (ConnectionError, RuntimeError):
+                pass
+        if keep:
+            return Entry(status, kept, b''.join(chunks), time.time() + self.ttl,
+                         time.perf_counter() - start)
+        return None
+
+    async def _open(self, provider, method, path, headers, body, payload):
+        """The upstream response to a request: sent as-is, or for a routed
+        chat completion, to the planned targets with hedging and failover."""
+        import httpx
+
+        model = _model(provider, path, payload)
+        now = time.monotonic()
+        plan = None
+        if method == 'POST' and path.split('?', 1)[0].endswith('/chat/completions'):
+            plan = self.router.plan(provider, model, now)
+        if not plan:
+            return await self._send((provider, model), method, path, headers, body)
+
+        requested = (provider, model)
+        queue = list(plan)
+        pending = {}
+
+        def launch():
+            target = queue.pop(0)
+            target_path, target_headers, target_body = path, headers, body
+            if target[0] != provider:
+                target_path = CHAT_PATHS[target[0]]
+                target_headers = {key: value for key, value in headers.items()
+                                  if key not in AUTH_HEADERS}
+                target_headers['authorization'] = f'Bearer {self.router.keys[target[0]]}'
+            if target[1] != model:
+                target_body = json.dumps({**payload, 'model': target[1]}).encode('utf-8')
+            task = asyncio.ensure_future(self._send(target, method, target_path,
+                                                    target_headers, target_body))
+            pending[task] = target
+
+        launch()
+        delay = self.router.hedge_delay(plan[0], now) if queue else None
+        hedged = False
+        failed = None
+        try:
+            while pending:
+                timeout = None if delay is None else max(0.0, now + delay - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    delay = None  # one hedge per request
+                    if queue and self.router.take_hedge():
+                        hedged = True
+                        launch()
+                    continue
+                for task in done:
+                    target = pending.pop(task)
+                    try:
+                        upstream = task.result()
+                    except httpx.HTTPError as e:
+                        failed = failed or e
+                        continue
+                    if _retryable(upstream.response.status_code):
+                        if isinstance(failed, Upstream):
+                            await failed.aclose()
+                        failed = upstream
+                        continue
+                    if isinstance(failed, Upstream):
+                        await failed.aclose()
+                    if hedged and target != plan[0]:
+                        self.router.counts['hedge_wins'] += 1
+                    upstream.routed = target != requested or len(plan) > 1
+                    upstream.hedged = hedged
+                    return upstream
+                if not pending and queue:
+                    delay = None
+                    self.router.counts['failovers'] += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, Upstream):
+                    await result.aclose()
+        if isinstance(failed, Upstream):
+            failed.routed = True
+            return failed
+        raise failed
+
+    async def _send(self, target, method, path, headers, body):
+        """Send one upstream request and wait for the first body chunk,
+        recording the time to it against ``target`` (provider, model)."""
+        import httpx
+
+        client = self.clients[target[0]]
+        start = time.monotonic()
+        response = None
+        try:
+            response = await client.send(client.build_request(
+                method, path, headers=headers, content=body or None), stream=True)
+            chunks = response.aiter_bytes()
+            first = await anext(chunks, b'')
+        except asyncio.CancelledError:
+            # A hedged attempt that lost: it took at least this long
+            self._record(target, time.monotonic() - start, True)
+            if response is not None:
+                await response.aclose()
+            raise
+        except httpx.HTTPError:
+            self._record(target, time.monotonic() - start, False)
+            if response is not None:
+                await response.aclose()
+            raise
+        self._record(target, time.monotonic() - start, not _retryable(response.status_code))
+        return Upstream(response, first, chunks, target)
+
+    def _record(self, target, seconds, ok):
+        if target[1] is not None:
+            self.router.record(target, seconds, ok, time.monotonic())
+
+
+async def _read_chunked(reader):
+    body = bytearray()
+    while True:
+        size = int((await reader.readline()).split(b';', 1)[0], 16)
+        if not size:
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # trailers
+            return bytes(body)
+        body += await reader.readexactly(size)
+        await reader.readexactly(2)
+
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+def _head(status, headers, length=None):
+    lines = [f'HTTP/1.1 {status} {_reason(status)}']
+    lines += [f'{name}: {value}' for name, value in headers]
+    lines.append('Transfer-Encoding: chunked' if length is None else f'Content-Length: {length}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _respond(writer, status, headers, body):
+    try:
+        writer.write(_head(status, headers, len(body)) + body)
+        await writer.drain()
+    except (ConnectionError, RuntimeError):
+        pass
+
+
+def _json_headers():
+    return [('content-type', 'application/json')]
+
+
+def _error(message):
+    return json.dumps({'error': {'type': 'gateway_error', 'message': message}}).encode('utf-8')
+
+
+def main():
+    try:
+        asyncio.run(Gateway.from_env().serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
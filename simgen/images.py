@@ -0,0 +1,105 @@
+# Docker image size budgets
+#
+# Every generated Dockerfile has a size budget: the image is pulled on each
+# deploy, restart and scale-out, so its size goes straight into cold-start
+# time. `simgen images` reads the built images through `docker image
+# inspect` / `docker history` and reports each one against its budget with
+# its largest layers.
+
+import json
+import shutil
+import subprocess
+
+MB = 1000 * 1000
+
+# Uncompressed size, as reported by `docker image inspect`. node:20-alpine
+# alone is ~135MB.
+IMAGE_BUDGETS = {
+    'Dockerfile': 450 * MB,
+    'Dockerfile.realtime': 250 * MB,
+}
+
+
+class Layer:
+    """One image layer: its size in bytes and the instruction that made it."""
+
+    __slots__ = ('size', 'created_by')
+
+    def __init__(self, size, created_by):
+        self.size = size
+        self.created_by = created_by
+
+    @property
+    def instruction(self):
+        # BuildKit records 'RUN /bin/sh -c ...' / 'COPY ... # buildkit'
+        text = ' '.join(self.created_by.split())
+        for prefix in ('/bin/sh -c #(nop) ', '/bin/sh -c '):
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+        return text.removesuffix(' # buildkit')
+
+
+class ImageReport:
+    """Size of one built image against the budget of its Dockerfile."""
+
+    __slots__ = ('dockerfile', 'image', 'size', 'budget', 'layers')
+
+    def __init__(self, dockerfile, image, size, budget, layers):
+        self.dockerfile = dockerfile
+        self.image = image
+        self.size = size
+        self.budget = budget
+        self.layers = layers
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.size > self.budget
+
+    def largest_layers(self, top=5):
+        return sorted(self.layers, key=lambda layer: layer.size, reverse=True)[:top]
+
+    def as_dict(self, top=5):
+        return {
+            'dockerfile': self.dockerfile,
+            'image': self.image,
+            'size_mb': round(self.size / MB, 1),
+            'budget_mb': None if self.budget is None else round(self.budget / MB, 1),
+            'over_budget': self.over_budget,
+            'largest_layers': [{'size_mb': round(layer.size / MB, 1),
+                                'instruction': layer.instruction}
+                               for layer in self.largest_layers(top)],
+        }
+
+
+def _docker(*args):
+    docker = shutil.which('docker')
+    if not docker:
+        raise FileNotFoundError("docker is required to inspect images")
+    proc = subprocess.run([docker, *args], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise ValueError(proc.stderr.strip() or f"docker {args[0]} failed")
+    return proc.stdout
+
+
+def inspect(image, dockerfile=None, budget=None):
+    """Size and layers of a local image; ``budget`` defaults to the one of
+    ``dockerfile``."""
+    try:
+        size = int(_docker('image', 'inspect', '--format', '{{.Size}}', image).strip())
+    except ValueError:
+        hint = f" (build it with: docker build -f {dockerfile} -t {image} .)" if dockerfile else ''
+        raise ValueError(f"No local image {image!r}{hint}") from None
+    layers = []
+    for line in _docker('history', '--no-trunc', '--human=false', '--format', '{{json .}}',
+                        image).splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            layers.append(Layer(int(entry.get('Size') or 0), entry.get('CreatedBy', '')))
+    if budget is None:
+        budget = IMAGE_BUDGETS.get(dockerfile)
+    return ImageReport(dockerfile, image, size, budget, layers)
+
+
+def budget_summary():
+    """One-line summary of the budgets, printed after generation."""
+    return ', '.join(f"{name} ≤ {budget / MB:.0f}MB" for name, budget in IMAGE_BUDGETS.items())
@@ -0,0 +1,149 @@
+# Incremental, content-hashed file generation
+#
+# Every rendered template is hashed and compared with a manifest of what was
+# last written. Files are only rewritten when their content actually changed,
+# and only re-chmodded when their mode changed, so unchanged outputs keep
+# their mtimes and Docker layer caches (`COPY . .`) stay warm.
+
+import hashlib
+import itertools
+import json
+import os
+import stat
+
+MANIFEST_NAME = '.simgen-manifest.json'
+
+# Read the process umask once; os.umask() is not safe to call from threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+DEFAULT_MODE = 0o666 & ~_UMASK
+
+# Temp names only need to be unique within this process (pid) and across
+# threads (counter); `tempfile` is avoided to keep CLI startup cheap
+_tmp_counter = itertools.count()
+
+
+def content_hash(data):
+    """Return the sha256 hex digest of rendered template content."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path, data, mode=None):
+    """Write ``data`` to ``path`` through a temp file + rename.
+
+    Readers never observe a half-written file, and the final mode is applied
+    before the rename so the file never appears with the wrong permissions.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(
+        directory, f'.{os.path.basename(path)}.{os.getpid()}.{next(_tmp_counter)}.tmp')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, DEFAULT_MODE if mode is None else mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class Manifest:
+    """Record of the hash, mode and stat signature of every generated file."""
+
+    def __init__(self, root='.', name=MANIFEST_NAME):
+        self.root = root
+        self.path = os.path.join(root, name)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, relpath):
+        return self.entries.get(relpath)
+
+    def record(self, relpath, digest, st):
+        entry = {
+            'sha256': digest,
+            'mode': stat.S_IMODE(st.st_mode),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+        }
+        if self.entries.get(relpath) != entry:
+            self.entries[relpath] = entry
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return False
+        data = json.dumps({'version': 1, 'files': self.entries}, indent=2, sort_keys=True)
+        atomic_write(self.path, data + '\n')
+        self.dirty = False
+        return True
+
+
+def _disk_matches(path, digest, entry, st):
+    # Fast path: the manifest vouches for the file and its stat is unchanged
+    if entry and entry['sha256'] == digest and entry['size'] == st.st_size \
+            and entry['mtime_ns'] == st.st_mtime_ns:
+        return True
+    # Otherwise the file was touched outside the generator; compare bytes
+    with open(path, 'rb') as f:
+        return content_hash(f.read()) == digest
+
+
+def sync_file(manifest, relpath, content, mode=None):
+    """Bring one generated file up to date.
+
+    Returns one of ``'created'``, ``'updated'``, ``'chmod'`` or ``'unchanged'``.
+    """
+    path = os.path.join(manifest.root, relpath)
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    digest = content_hash(data)
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        st = None
+
+    if st is None:
+        atomic_write(path, data, mode)
+        action = 'created'
+    elif not _disk_matches(path, digest, manifest.get(relpath), st):
+        # Keep the existing permissions unless a mode was requested
+        atomic_write(path, data, stat.S_IMODE(st.st_mode) if mode is None else mode)
+        action = 'updated'
+    elif mode is not None and stat.S_IMODE(st.st_mode) != mode:
+        os.chmod(path, mode)
+        action = 'chmod'
+    else:
+        action = 'unchanged'
+
+    manifest.record(relpath, digest, os.stat(path))
+    return action
+
+
+def write_tree(files, modes=None, root='.'):
+    """Sync a ``{relpath: content}`` mapping into ``root``.
+
+    ``modes`` optionally maps relpaths to permission bits (e.g. ``0o755`` for
+    shell scripts). Returns ``{relpath: action}`` in input order.
+    """
+    modes = modes or {}
+    manifest = Manifest(root)
+    results = {}
+    for relpath, content in files.items():
+        results[relpath] = sync_file(manifest, relpath, content, modes.get(relpath))
+    manifest.save()
+    return results
@@ -0,0 +1,243 @@
+# Automatic graph layout for the architecture diagram
+#
+# Two engines compute (x, y) coordinates from the component names and the
+# directed connections:
+#
+# - layered_layout(): Sugiyama-style tiers (Users -> web -> services ->
+#   providers). Cycles are broken, nodes are assigned to layers by longest
+#   path to a sink, long edges get dummy nodes, and crossings are reduced
+#   with vectorized barycenter sweeps.
+# - force_layout(): Fruchterman-Reingold with grid-bucketed repulsion, so
+#   each iteration only compares nodes in neighbouring cells.
+#
+# auto_layout() uses the layered engine for DAGs and falls back to the force
+# engine when the connections contain cycles. numpy is imported lazily.
+
+
+def _index_edges(nodes, edges):
+    index = {name: i for i, name in enumerate(nodes)}
+    missing = sorted({name for edge in edges for name in edge if name not in index})
+    if missing:
+        raise ValueError(f"Connections reference unknown component(s): {', '.join(missing)}")
+    # Self-loops and duplicate edges carry no layout information
+    pairs = {(index[a], index[b]) for a, b in edges if a != b}
+    return index, sorted(pairs)
+
+
+def _back_edges(n, pairs):
+    """Return the set of edges closing a cycle (iterative DFS)."""
+    adjacency = [[] for _ in range(n)]
+    for a, b in pairs:
+        adjacency[a].append(b)
+    state = [0] * n  # 0 = unvisited, 1 = on stack, 2 = done
+    back = set()
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state[child] == 1:
+                    back.add((node, child))
+                elif state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(adjacency[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return back
+
+
+def is_acyclic(nodes, edges):
+    """True if the directed connections contain no cycle."""
+    _, pairs = _index_edges(nodes, edges)
+    return not _back_edges(len(nodes), pairs)
+
+
+def _longest_path_layers(n, pairs):
+    # Sinks sit on layer 0 and every node sits one layer above its highest
+    # child, so providers end up at the bottom and entry points at the top
+    children = [[] for _ in range(n)]
+    outdegree = [0] * n
+    parents = [[] for _ in range(n)]
+    for a, b in pairs:
+        children[a].append(b)
+        parents[b].append(a)
+        outdegree[a] += 1
+    layer = [0] * n
+    ready = [v for v in range(n) if outdegree[v] == 0]
+    while ready:
+        v = ready.pop()
+        for p in parents[v]:
+            if layer[v] + 1 > layer[p]:
+                layer[p] = layer[v] + 1
+            outdegree[p] -= 1
+            if outdegree[p] == 0:
+                ready.append(p)
+    return layer
+
+
+def layered_layout(nodes, edges, layer_gap=2.0, node_gap=1.0, sweeps=8):
+    """Sugiyama-style layered layout.
+
+    Returns ``{name: (x, y)}`` with layers ``layer_gap`` apart (sources on
+    top) and nodes ``node_gap`` apart within a layer, each layer centred on
+    ``x = 0``.
+    """
+    import numpy as np
+
+    nodes = list(nodes)
+    if not nodes:
+        return {}
+    _, pairs = _index_edges(nodes, edges)
+    n = len(nodes)
+
+    # Break cycles by reversing back edges, then layer by longest path
+    back = _back_edges(n, pairs)
+    pairs = [(b, a) if (a, b) in back else (a, b) for a, b in pairs]
+    layer = _longest_path_layers(n, pairs)
+
+    # Split edges spanning several layers with dummy nodes so every edge
+    # joins adjacent layers (upper -> lower)
+    upper, lower = [], []
+    for a, b in pairs:
+        previous = a
+        for level in range(layer[a] - 1, layer[b], -1):
+            layer.append(level)
+            upper.append(previous)
+            lower.append(len(layer) - 1)
+            previous = len(layer) - 1
+        upper.append(previous)
+        lower.append(b)
+
+    layer = np.asarray(layer)
+    upper = np.asarray(upper, dtype=np.intp)
+    lower = np.asarray(lower, dtype=np.intp)
+    total = len(layer)
+
+    # Initial order: by node index within each layer
+    order = np.lexsort((np.arange(total), layer))
+    rank = np.empty(total)
+    layer_sizes = np.bincount(layer)
+    starts = np.concatenate([[0], np.cumsum(layer_sizes)[:-1]])
+    rank[order] = np.arange(total) - np.repeat(starts, layer_sizes)
+
+    # Barycenter sweeps: each node moves to the mean rank of its neighbours
+    # in the adjacent layer; nodes without neighbours keep their rank
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            moved, fixed = lower, upper  # top-down
+        else:
+            moved, fixed = upper, lower  # bottom-up
+        sums = np.bincount(moved, weights=rank[fixed], minlength=total)
+        counts = np.bincount(moved, minlength=total)
+        barycenter = np.where(counts > 0, sums / np.maximum(counts, 1), rank)
+        order = np.lexsort((rank, barycenter, layer))
+        rank[order] = np.arange(total) - np.repeat(starts, layer_sizes)
+
+    x = (rank - (layer_sizes[layer] - 1) / 2.0) * node_gap
+    y = layer * float(layer_gap)
+    return {name: (float(x[i]), float(y[i])) for i, name in enumerate(nodes)}
+
+
+def force_layout(nodes, edges, iterations=50, seed=0, size=None):
+    """Fruchterman-Reingold layout with grid-bucketed repulsion.
+
+    Repulsion is only computed between nodes in the same or neighbouring
+    grid cells (cell size = the ideal edge length), which keeps each
+    iteration close to linear in the number of nodes. Each unordered pair
+    of nodes is visited once and both ends receive the equal and opposite
+    force.
+    """
+    import numpy as np
+
+    nodes = list(nodes)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    _, pairs = _index_edges(nodes, edges)
+    size = size or max(1.0, np.sqrt(n))
+    k = size / np.sqrt(n)  # ideal edge length
+
+    rng = np.random.default_rng(seed)
+    # Separate x/y vectors: 1-D gathers are much cheaper than row gathers
+    x = rng.uniform(0, size, n)
+    y = rng.uniform(0, size, n)
+    edge_array = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+    src, dst = edge_array[:, 0], edge_array[:, 1]
+    # The own cell plus half of the 8 neighbours covers every pair once
+    offsets = [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]
+    temperature = size / 10
+
+    for _ in range(iterations):
+        # Bucket nodes into grid cells
+        gx = ((x - x.min()) / k).astype(np.intp)
+        gy = ((y - y.min()) / k).astype(np.intp)
+        rows = gy.max() + 1
+        cols = gx.max() + 1
+        cell_id = gx * rows + gy
+        by_cell = np.argsort(cell_id, kind='stable')
+        counts = np.bincount(cell_id, minlength=cols * rows)
+        cell_start = np.cumsum(counts) - counts
+
+        # Collect candidate pairs from the half neighbourhood
+        first, second = [], []
+        for dx, dy in offsets:
+            nx = gx + dx
+            ny = gy + dy
+            i = np.nonzero((nx < cols) & (ny >= 0) & (ny < rows))[0]
+            neighbour = nx[i] * rows + ny[i]
+            per_node = counts[neighbour]
+            i = np.repeat(i, per_node)
+            within = np.arange(len(i)) - np.repeat(np.cumsum(per_node) - per_node, per_node)
+            j = by_cell[np.repeat(cell_start[neighbour], per_node) + within]
+            # Within the own cell, keep each unordered pair once
+            if (dx, dy) == (0, 0):
+                keep = i < j
+                i, j = i[keep], j[keep]
+            first.append(i)
+            second.append(j)
+        i = np.concatenate(first)
+        j = np.concatenate(second)
+
+        # Repulsion k^2/d along the pair direction, applied to both ends
+        rx = x[i] - x[j]
+        ry = y[i] - y[j]
+        scale = (k * k) / np.maximum(rx * rx + ry * ry, 1e-9)
+        rx *= scale
+        ry *= scale
+
+        # Attraction d^2/k along edges
+        ax = x[src] - x[dst]
+        ay = y[src] - y[dst]
+        scale = np.sqrt(ax * ax + ay * ay) / k
+        ax *= scale
+        ay *= scale
+
+        # Scatter all forces with one bincount per axis
+        targets = np.concatenate([i, j, dst, src])
+        fx = np.bincount(targets, weights=np.concatenate([rx, -rx, ax, -ax]), minlength=n)
+        fy = np.bincount(targets, weights=np.concatenate([ry, -ry, ay, -ay]), minlength=n)
+
+        # Move each node at most `temperature`, then cool down
+        length = np.maximum(np.sqrt(fx * fx + fy * fy), 1e-9)
+        step = np.minimum(length, temperature) / length
+        x += fx * step
+        y += fy * step
+        temperature *= 0.95
+
+    return {name: (float(x[i]), float(y[i])) for i, name in enumerate(nodes)}
+
+
+def auto_layout(nodes, edges, method='auto'):
+    """Lay out ``nodes``; ``method`` is ``'auto'``, ``'layered'`` or ``'force'``."""
+    if method == 'auto':
+        method = 'layered' if is_acyclic(nodes, edges) else 'force'
+    if method == 'layered':
+        return layered_layout(nodes, edges)
+    if method == 'force':
+        return force_layout(nodes, edges)
+    raise ValueError(f"Unknown layout method {method!r} (expected auto, layered or force)")
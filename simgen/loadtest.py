@@ -0,0 +1,528 @@
+# HTTP load generator for the web service
+#
+# Runs a scenario (a weighted mix of requests plus ramp stages) against the
+# web service in one of two modes. Open loop: requests arrive as a Poisson
+# process at the stage's rate, ramping linearly between stages, however
+# fast the server answers; latency is measured from each request's
+# scheduled arrival, so a stalled server is charged for the queueing it
+# causes (no coordinated omission). Closed loop: a ramping number of
+# virtual users each send a request, wait for the answer, think, and
+# repeat. Connections are pooled and kept alive. Latencies go into HDR
+# histograms (simgen.logstats) per request and overall, and the run is checked
+# against the scenario's SLOs for a pass/fail report.
+
+import asyncio
+import bisect
+import contextlib
+import json
+import os
+import random
+import re
+import ssl
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from string import Template
+from urllib.parse import urlsplit
+
+from simgen.logstats import Histogram
+from simgen.probe import read_response
+
+REPORT_VERSION = 1
+MODES = ('open', 'closed')
+PERCENTILES = (50, 90, 95, 99, 99.9)
+# SLO keys on latency, and the percentile each one reads
+SLO_LATENCIES = {'p50_ms': 50, 'p90_ms': 90, 'p95_ms': 95, 'p99_ms': 99, 'p99.9_ms': 99.9,
+                 'max_ms': 100}
+
+_VARIABLE_RE = re.compile(r'\$\{(\w+)\}')
+
+# Home page, health routes, sign-in and workflow execution. The last two
+# need an account and a deployed workflow (with an API key), given through
+# the environment; without them they are skipped.
+DEFAULT_SCENARIO = {
+    'base_url': 'http://localhost:3000',
+    'mode': 'open',
+    'stages': [
+        {'duration': 30, 'rate': 5},
+        {'duration': 30, 'rate': 20},
+        {'duration': 60, 'rate': 20},
+    ],
+    'requests': [
+        {'name': 'home', 'path': '/', 'weight': 4},
+        {'name': 'health', 'path': '/health/live', 'weight': 2},
+        {'name': 'ready', 'path': '/health/ready', 'weight': 1},
+        {'name': 'sign-in', 'method': 'POST', 'path': '/api/auth/sign-in/email', 'weight': 1,
+         'optional': True,
+         'json': {'email': '${LOADTEST_EMAIL}', 'password': '${LOADTEST_PASSWORD}'}},
+        {'name': 'execute', 'method': 'POST',
+         'path': '/api/workflows/${LOADTEST_WORKFLOW_ID}/execute', 'weight': 2,
+         'optional': True, 'timeout': 120, 'headers': {'X-API-Key': '${LOADTEST_API_KEY}'},
+         'json': {'input': 'load test'}},
+    ],
+    'slo': {
+        'error_rate': 0.01,
+        'requests': {
+            'home': {'p95_ms': 800},
+            'health': {'p99_ms': 100},
+            'ready': {'p99_ms': 250},
+            'sign-in': {'p95_ms': 1500},
+            'execute': {'p95_ms': 15000},
+        },
+    },
+}
+
+
+def _substitute(value, variables, missing):
+    if isinstance(value, str):
+        missing.update(name for name in _VARIABLE_RE.findall(value) if name not in variables)
+        return Template(value).safe_substitute(variables)
+    if isinstance(value, dict):
+        return {key: _substitute(item, variables, missing) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, variables, missing) for item in value]
+    return value
+
+
+class Request:
+    """One entry of the request mix. A status in ``expect`` (default: any
+    status below 400) counts as a success."""
+
+    __slots__ = ('name', 'method', 'path', 'headers', 'body', 'weight', 'timeout', 'expect')
+
+    def __init__(self, name, path, method='GET', headers=None, body=None, weight=1,
+                 timeout=30.0, expect=None):
+        self.name = name
+        self.method = method.upper()
+        self.path = path if path.startswith('/') else '/' + path
+        self.headers = dict(headers or {})
+        self.body = body
+        self.weight = float(weight)
+        self.timeout = float(timeout)
+        self.expect = frozenset(expect) if expect else None
+        if self.weight <= 0:
+            raise ValueError(f"{name}: weight must be > 0")
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        body = data.pop('body', None)
+        if 'json' in data:
+            body = json.dumps(data.pop('json'), separators=(',', ':'))
+            data.setdefault('headers', {}).setdefault('Content-Type', 'application/json')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        data.pop('optional', None)
+        unknown = set(data) - {'name', 'path', 'method', 'headers', 'weight', 'timeout', 'expect'}
+        if unknown:
+            raise ValueError(f"Unknown request key(s): {', '.join(sorted(unknown))}")
+        if 'name' not in data or 'path' not in data:
+            raise ValueError(f"Every request needs a name and a path (got {data})")
+        return cls(body=body, **data)
+
+    def ok(self, status):
+        return status in self.expect if self.expect else status < 400
+
+    def __repr__(self):
+        return f'Request({self.name!r}, {self.method} {self.path})'
+
+
+class Scenario:
+    """Request mix, ramp stages and SLOs.
+
+    Every stage ramps linearly from the previous stage's target (0 for the
+    first) to its own over ``duration`` seconds: ``rate`` (requests/s) in
+    open mode, ``users`` in closed mode; a 0s stage jumps to its target.
+    ``${NAME}`` in a request is replaced from ``variables``, then the
+    environment; requests marked ``optional`` are skipped (``skipped`` maps
+    them to the missing names) when a variable is missing.
+    """
+
+    __slots__ = ('base_url', 'mode', 'stages', 'requests', 'slo', 'connections', 'think_ms',
+                 'max_in_flight', 'skipped', '_cumulative')
+
+    def __init__(self, base_url, requests, stages, mode='open', slo=None, connections=100,
+                 think_ms=1000, max_in_flight=10000, skipped=None):
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode {mode!r} (expected one of: {', '.join(MODES)})")
+        if not requests:
+            raise ValueError("The scenario has no requests to send")
+        key = 'rate' if mode == 'open' else 'users'
+        self.stages = []
+        for stage in stages:
+            if key not in stage or float(stage.get('duration', -1)) < 0:
+                raise ValueError(f"Every {mode}-loop stage needs a duration and a {key} "
+                                 f"(got {stage})")
+            self.stages.append((float(stage['duration']), float(stage[key])))
+        if not sum(duration for duration, _ in self.stages):
+            raise ValueError("The scenario has no stages (or they all last 0s)")
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Invalid base_url {base_url!r} (expected http(s)://host[:port])")
+        self.base_url = base_url.rstrip('/')
+        self.mode = mode
+        self.requests = list(requests)
+        self.slo = slo or {}
+        self.connections = int(connections)
+        self.think_ms = float(think_ms)
+        self.max_in_flight = int(max_in_flight)
+        self.skipped = dict(skipped or {})
+        total = 0.0
+        self._cumulative = []
+        for request in self.requests:
+            total += request.weight
+            self._cumulative.append(total)
+
+    @classmethod
+    def from_dict(cls, data, variables=None):
+        data = dict(data)
+        values = dict(os.environ)
+        values.update({key: str(value) for key, value in (data.pop('variables', None) or {})
+                       .items()})
+        values.update(variables or {})
+        requests, skipped = [], {}
+        for spec in data.pop('requests', None) or []:
+            missing = set()
+            spec = _substitute(spec, values, missing)
+            if missing:
+                if spec.get('optional'):
+                    skipped[spec.get('name')] = sorted(missing)
+                    continue
+                raise ValueError(f"Request {spec.get('name')!r} uses undefined variable(s): "
+                                 f"{', '.join(sorted(missing))}")
+            requests.append(Request.from_dict(spec))
+        unknown = set(data) - {'base_url', 'mode', 'stages', 'slo', 'connections', 'think_ms',
+                               'max_in_flight'}
+        if unknown:
+            raise ValueError(f"Unknown scenario key(s): {', '.join(sorted(unknown))}")
+        return cls(data.get('base_url', DEFAULT_SCENARIO['base_url']), requests,
+                   data.get('stages') or [], mode=data.get('mode', 'open'), slo=data.get('slo'),
+                   connections=data.get('connections', 100),
+                   think_ms=data.get('think_ms', 1000),
+                   max_in_flight=data.get('max_in_flight', 10000), skipped=skipped)
+
+    @property
+    def duration(self):
+        return sum(duration for duration, _ in self.stages)
+
+    def target(self, t):
+        """Rate (open) or user count (closed) ``t`` seconds into the run."""
+        previous = 0.0
+        for duration, target in self.stages:
+            if t < duration:
+                return previous + (target - previous) * t / duration
+            t -= duration
+            previous = target
+        return previous
+
+    def pick(self, rng):
+        return self.requests[bisect.bisect(self._cumulative, rng.random() * self._cumulative[-1])]
+
+    def as_dict(self):
+        key = 'rate' if self.mode == 'open' else 'users'
+        return {
+            'base_url': self.base_url,
+            'mode': self.mode,
+            'stages': [{'duration': duration, key: target} for duration, target in self.stages],
+            'requests': [{'name': r.name, 'method': r.method, 'path': r.path, 'weight': r.weight}
+                         for r in self.requests],
+            'skipped': self.skipped,
+            'connections': self.connections,
+            'think_ms': self.think_ms if self.mode == 'closed' else None,
+            'slo': self.slo,
+        }
+
+
+def load_scenario(path, variables=None, overrides=None):
+    """Read a :class:`Scenario` from a YAML or JSON file, with top-level
+    keys replaced from ``overrides``."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith('.json'):
+        data = json.loads(text)
+    else:
+        from simgen.topology import load_yaml
+        data = load_yaml(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping of scenario keys")
+    return Scenario.from_dict({**data, **(overrides or {})}, variables)
+
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 connections to one origin, at most ``size`` open.
+
+    A request waits for a free connection; that wait is part of its
+    latency, as it would be for a browser or a proxy with a connection cap.
+    Pools sharing a ``limit`` semaphore also share its cap on requests in
+    flight.
+    """
+
+    def __init__(self, base_url, size, limit=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.host_header = parts.netloc
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self._limit = limit or contextlib.nullcontext()
+
+    async def _connection(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.opened += 1
+        return reader, writer, False
+
+    async def request(self, request):
+        """Send ``request``; return the response status."""
+        head = [f'{request.method} {request.path} HTTP/1.1', f'Host: {self.host_header}',
+                'User-Agent: simgen-load', 'Accept: */*', 'Connection: keep-alive']
+        head += [f'{key}: {value}' for key, value in request.headers.items()]
+        if request.body is not None:
+            head.append(f'Content-Length: {len(request.body)}')
+        data = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + (request.body or b'')
+        async with self._slots, self._limit:
+            while True:
+                reader, writer, reused = await self._connection()
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                    status, reusable = await read_response(reader)
+                except ConnectionError:
+                    writer.close()
+                    if reused:
+                        # The server closed an idle connection before any of
+                        # the response arrived, so it never saw the request
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if reusable:
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def _ms(micros):
+    return None if micros is None else round(micros / 1000, 3)
+
+
+def _latency(histogram):
+    values = histogram.percentiles(PERCENTILES)
+    latency = {f'p{q:g}': _ms(values[q]) for q in PERCENTILES}
+    latency['max'] = _ms(histogram.max if histogram.count else None)
+    latency['mean'] = _ms(histogram.mean)
+    return latency
+
+
+class Stats:
+    """Outcomes per request name, overall and per second of the run."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.overall = Histogram()
+        self.counts = Counter()
+        self.errors = Counter()
+        self.statuses = {}
+        self.failures = {}
+        self.timeline = {}
+        self.shed = 0
+        self.start = None
+
+    def record(self, request, elapsed, status=None, failure=None):
+        name = request.name
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+            self.statuses[name] = Counter()
+            self.failures[name] = Counter()
+        histogram.record(elapsed * 1e6)
+        self.overall.record(elapsed * 1e6)
+        self.counts[name] += 1
+        second = int(time.perf_counter() - self.start)
+        bucket = self.timeline.setdefault(second, [0, 0])
+        bucket[0] += 1
+        if status is not None:
+            self.statuses[name][status] += 1
+        ok = failure is None and request.ok(status)
+        if not ok:
+            self.errors[name] += 1
+            bucket[1] += 1
+            self.failures[name][failure or f'HTTP {status}'] += 1
+
+    def summary(self, name, histogram, elapsed):
+        count = histogram.count
+        errors = sum(self.errors.values()) if name is None else self.errors[name]
+        summary = {
+            'count': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 6) if count else None,
+            'rps': round(count / elapsed, 3) if elapsed else None,
+            'latency_ms': _latency(histogram),
+            'histogram': histogram.to_dict(),
+        }
+        if name is not None:
+            summary['statuses'] = {str(k): v for k, v in sorted(self.statuses[name].items())}
+            summary['failures'] = dict(self.failures[name].most_common(5))
+        return summary
+
+
+async def send_request(pool, request, stats, scheduled):
+    """Send ``request`` through ``pool`` and record the outcome in ``stats``.
+
+    Latency runs from ``scheduled``, so time spent waiting for a connection
+    or behind a late generator counts; failures are recorded, never raised.
+    """
+    try:
+        status = await asyncio.wait_for(pool.request(request), request.timeout)
+    except asyncio.TimeoutError:
+        stats.record(request, time.perf_counter() - scheduled,
+                     failure=f'timeout after {request.timeout:g}s')
+    except (OSError, EOFError, ValueError) as e:
+        # Truncated and malformed responses (probe.ResponseError) included
+        failure = (e.strerror if isinstance(e, OSError) else None) or str(e) or type(e).__name__
+        stats.record(request, time.perf_counter() - scheduled, failure=failure)
+    else:
+        stats.record(request, time.perf_counter() - scheduled, status=status)
+
+
+async def _open_loop(scenario, pool, stats, rng):
+    in_flight = set()
+    start = stats.start
+    end = scenario.duration
+    t = 0.0
+    while True:
+        rate = scenario.target(t)
+        if rate <= 0:
+            t += 0.05  # nothing to send yet (a ramp from 0)
+            if t >= end:
+                break
+            continue
+        t += rng.expovariate(rate)
+        if t >= end:
+            break
+        scheduled = start + t
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= scenario.max_in_flight:
+            stats.shed += 1  # the generator itself is saturated
+            continue
+        task = asyncio.ensure_future(send_request(pool, scenario.pick(rng), stats, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def _closed_loop(scenario, pool, stats, rng):
+    start = stats.start
+    end = start + scenario.duration
+    think = scenario.think_ms / 1000
+    active = []
+
+    async def user(index):
+        while time.perf_counter() < end and index < len(active):
+            began = time.perf_counter()
+            await send_request(pool, scenario.pick(rng), stats, began)
+            if think:
+                await asyncio.sleep(min(rng.expovariate(1 / think), max(0.0, end - began)))
+
+    tasks = []
+    while time.perf_counter() < end:
+        wanted = int(round(scenario.target(time.perf_counter() - start)))
+        while len(active) < wanted:
+            active.append(True)
+            tasks.append(asyncio.ensure_future(user(len(active) - 1)))
+        del active[wanted:]  # surplus users stop after their current request
+        await asyncio.sleep(0.1)
+    active.clear()
+    await asyncio.gather(*tasks)
+
+
+def evaluate_slos(report, slo):
+    """Check ``report`` against ``slo``; return one dict per check.
+
+    ``slo`` holds overall limits (``error_rate``, ``min_rps``, latency keys
+    such as ``p99_ms``) and per-request ones under ``requests``.
+    """
+    checks = []
+
+    def check(scope, summary, limits):
+        for metric, limit in limits.items():
+            if metric in SLO_LATENCIES:
+                key = 'max' if metric == 'max_ms' else metric[:-3]
+                actual = summary['latency_ms'][key] if summary else None
+                ok = actual is not None and actual <= limit
+            elif metric == 'error_rate':
+                actual = summary['error_rate'] if summary else None
+                ok = actual is not None and actual <= limit
+            elif metric == 'min_rps':
+                actual = summary['rps'] if summary else None
+                ok = actual is not None and actual >= limit
+            else:
+                raise ValueError(f"Unknown SLO metric {metric!r} for {scope}")
+            checks.append({'scope': scope, 'metric': metric, 'limit': limit, 'actual': actual,
+                           'ok': ok})
+
+    check('overall', report['overall'],
+          {key: value for key, value in slo.items() if key != 'requests'})
+    for name, limits in (slo.get('requests') or {}).items():
+        if name in report['scenario']['skipped']:
+            continue
+        check(name, report['requests'].get(name), limits)
+    return checks
+
+
+async def run_load(scenario, seed=None, progress=None):
+    """Run ``scenario``; return the report (a JSON-serializable dict)."""
+    rng = random.Random(seed)
+    pool = HttpPool(scenario.base_url, scenario.connections)
+    stats = Stats()
+    if progress:
+        key = 'req/s' if scenario.mode == 'open' else 'users'
+        progress(f"{scenario.mode}-loop load on {scenario.base_url} for {scenario.duration:g}s: "
+                 + ' → '.join(f"{target:g} {key}" for _, target in scenario.stages))
+    stats.start = time.perf_counter()
+    try:
+        if scenario.mode == 'open':
+            await _open_loop(scenario, pool, stats, rng)
+        else:
+            await _closed_loop(scenario, pool, stats, rng)
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - stats.start
+
+    report = {
+        'version': REPORT_VERSION,
+        'kind': 'load',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'scenario': scenario.as_dict(),
+        'duration_s': round(elapsed, 3),
+        'overall': stats.summary(None, stats.overall, elapsed),
+        'requests': {name: stats.summary(name, histogram, elapsed)
+                     for name, histogram in stats.histograms.items()},
+        'timeline': [[second, *counts] for second, counts in sorted(stats.timeline.items())],
+        'generator': {'connections_opened': pool.opened, 'shed': stats.shed},
+    }
+    report['slo'] = {'checks': evaluate_slos(report, scenario.slo)}
+    report['slo']['passed'] = all(check['ok'] for check in report['slo']['checks'])
+    return report
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
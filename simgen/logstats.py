@@ -0,0 +1,448 @@
+# Log analytics for the JSON lines written by lib/logger.js
+#
+# Log exports are memory-mapped and parsed line by line, so a multi-GB file
+# is never loaded into memory. Large files are split at line boundaries and
+# parsed by several processes; each produces a Rollup and the rollups are
+# merged. Latencies go into HDR-style log-linear histograms (fixed relative
+# error, mergeable by adding bucket counts), errors are counted per minute
+# to find bursts, and a state file lets a later run parse only the lines
+# appended since the previous one.
+
+import functools
+import json
+import mmap
+import os
+import re
+from collections import Counter
+
+# Meta keys the routes/latencies/status codes may be logged under
+ROUTE_KEYS = ('route', 'path', 'url', 'pathname')
+LATENCY_KEYS = ('durationMs', 'duration_ms', 'latencyMs', 'latency_ms', 'responseTimeMs', 'duration')
+STATUS_KEYS = ('status', 'statusCode', 'status_code')
+
+_ID_SEGMENT_RE = re.compile(
+    r'/(?:\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,}|[A-Za-z0-9_-]{21,})'
+    r'(?=/|$)', re.IGNORECASE)
+
+# 64 sub-buckets per power of two: values are kept within ~1.6%
+_SUB_BUCKET_BITS = 6
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+CHUNK_SIZE = 64 << 20
+BLOCK_SIZE = 4 << 20
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalize_route(route):
+    """Strip the query string and replace id-like path segments with ``:id``."""
+    route = route.split('?', 1)[0].split('#', 1)[0]
+    if '://' in route:
+        route = '/' + route.split('://', 1)[1].partition('/')[2]
+    return _ID_SEGMENT_RE.sub('/:id', route) or '/'
+
+
+class Histogram:
+    """HDR-style latency histogram over integer microseconds."""
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < 2 * _SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+        return (shift << _SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def _value(index):
+        if index < 2 * _SUB_BUCKETS:
+            return index
+        shift = index // _SUB_BUCKETS - 1
+        low = (index - (shift << _SUB_BUCKET_BITS)) << shift
+        return low + (1 << shift) // 2  # bucket midpoint
+
+    def record(self, micros):
+        micros = max(0, int(micros))
+        self.buckets[self._index(micros)] += 1
+        self.count += 1
+        self.total += micros
+        if micros > self.max:
+            self.max = micros
+        if self.min is None or micros < self.min:
+            self.min = micros
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        return self
+
+    def percentile(self, q):
+        """Value (microseconds) at percentile ``q``; None when empty."""
+        return self.percentiles((q,))[q]
+
+    def percentiles(self, qs):
+        """``{q: microseconds}`` for several percentiles in one pass."""
+        result = dict.fromkeys(qs)
+        if not self.count:
+            return result
+        wanted = sorted((max(1, -(-self.count * q // 100)), q) for q in qs)
+        seen = 0
+        position = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            while position < len(wanted) and seen >= wanted[position][0]:
+                result[wanted[position][1]] = min(self._value(index), self.max)
+                position += 1
+            if position == len(wanted):
+                break
+        return result
+
+    @property
+    def mean(self):
+        """Mean value (microseconds); None when empty."""
+        return self.total / self.count if self.count else None
+
+    def values(self):
+        """``(microseconds, count)`` of every non-empty bucket, ascending."""
+        return [(min(self._value(index), self.max), self.buckets[index])
+                for index in sorted(self.buckets)]
+
+    def to_dict(self):
+        return {'buckets': {str(k): v for k, v in self.buckets.items()}, 'count': self.count,
+                'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = Counter({int(k): v for k, v in data['buckets'].items()})
+        histogram.count = data['count']
+        # Rollups saved before totals were kept only lack the mean
+        histogram.total = data.get('total', 0)
+        histogram.min = data.get('min')
+        histogram.max = data['max']
+        return histogram
+
+
+def ks_statistic(a, b):
+    """Largest gap between the cumulative distributions of two histograms
+    (the two-sample Kolmogorov-Smirnov D); None when either is empty."""
+    if not a.count or not b.count:
+        return None
+    gap = 0.0
+    seen_a = seen_b = 0
+    for index in sorted(a.buckets.keys() | b.buckets.keys()):
+        seen_a += a.buckets[index]
+        seen_b += b.buckets[index]
+        gap = max(gap, abs(seen_a / a.count - seen_b / b.count))
+    return gap
+
+
+class RouteStats:
+    """Counts per level, server errors and latency histogram of one route."""
+
+    __slots__ = ('levels', 'errors', 'latency')
+
+    def __init__(self):
+        self.levels = Counter()
+        self.errors = 0
+        self.latency = Histogram()
+
+    @property
+    def count(self):
+        return sum(self.levels.values())
+
+    def merge(self, other):
+        self.levels.update(other.levels)
+        self.errors += other.errors
+        self.latency.merge(other.latency)
+
+    def to_dict(self):
+        return {'levels': dict(self.levels), 'errors': self.errors, 'latency': self.latency.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.levels = Counter(data['levels'])
+        stats.errors = data['errors']
+        stats.latency = Histogram.from_dict(data['latency'])
+        return stats
+
+
+class Rollup:
+    """Mergeable aggregate of a range of log lines."""
+
+    __slots__ = ('routes', 'levels', 'minutes', 'lines', 'skipped')
+
+    def __init__(self):
+        self.routes = {}
+        self.levels = Counter()
+        self.minutes = {}  # 'YYYY-MM-DDTHH:MM' -> [entries, errors]
+        self.lines = 0
+        self.skipped = 0
+
+    def add(self, entry, normalize=True):
+        self.lines += 1
+        get = entry.get
+        level = get('level', 'unknown')
+        if level.__class__ is not str:
+            level = str(level)
+        self.levels[level] += 1
+
+        status = None
+        for key in STATUS_KEYS:
+            if key in entry:
+                try:
+                    status = int(entry[key])
+                except (TypeError, ValueError):
+                    pass
+                break
+        is_error = level == 'error' or level == 'fatal' or (status is not None and status >= 500)
+
+        timestamp = get('timestamp')
+        if timestamp.__class__ is str and len(timestamp) >= 16:
+            key = timestamp[:16]
+            minute = self.minutes.get(key)
+            if minute is None:
+                minute = self.minutes[key] = [0, 0]
+            minute[0] += 1
+            if is_error:
+                minute[1] += 1
+
+        route = None
+        for key in ROUTE_KEYS:
+            value = get(key)
+            if value.__class__ is str and value:
+                route = normalize_route(value) if normalize else value
+                break
+        if route is None:
+            return
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteStats()
+        stats.levels[level] += 1
+        if is_error:
+            stats.errors += 1
+        for key in LATENCY_KEYS:
+            value = get(key)
+            if value.__class__ is float or value.__class__ is int:
+                stats.latency.record(value * 1000)
+                break
+
+    def merge(self, other):
+        for route, stats in other.routes.items():
+            if route in self.routes:
+                self.routes[route].merge(stats)
+            else:
+                self.routes[route] = stats
+        self.levels.update(other.levels)
+        for minute, (entries, errors) in other.minutes.items():
+            counts = self.minutes.setdefault(minute, [0, 0])
+            counts[0] += entries
+            counts[1] += errors
+        self.lines += other.lines
+        self.skipped += other.skipped
+        return self
+
+    def error_bursts(self, threshold=None):
+        """Runs of consecutive minutes whose error count reaches ``threshold``.
+
+        The default threshold is five times the median errors per minute
+        (over minutes with any errors), and at least 5. Returns
+        ``[(first_minute, last_minute, errors)]`` sorted by errors.
+        """
+        errors = sorted(counts[1] for counts in self.minutes.values() if counts[1])
+        if not errors:
+            return []
+        if threshold is None:
+            threshold = max(5, 5 * errors[len(errors) // 2])
+        bursts = []
+        current = None
+        previous = None
+        for minute in sorted(self.minutes):
+            count = self.minutes[minute][1]
+            if count >= threshold:
+                if current and previous is not None and _next_minute(previous) == minute:
+                    current[1] = minute
+                    current[2] += count
+                else:
+                    current = [minute, minute, count]
+                    bursts.append(current)
+            else:
+                current = None
+            previous = minute
+        return sorted((tuple(burst) for burst in bursts), key=lambda burst: -burst[2])
+
+    def to_dict(self):
+        return {
+            'routes': {route: stats.to_dict() for route, stats in self.routes.items()},
+            'levels': dict(self.levels),
+            'minutes': self.minutes,
+            'lines': self.lines,
+            'skipped': self.skipped,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls()
+        rollup.routes = {route: RouteStats.from_dict(stats) for route, stats in data['routes'].items()}
+        rollup.levels = Counter(data['levels'])
+        rollup.minutes = {minute: list(counts) for minute, counts in data['minutes'].items()}
+        rollup.lines = data['lines']
+        rollup.skipped = data['skipped']
+        return rollup
+
+
+def _next_minute(minute):
+    from datetime import datetime, timedelta
+    try:
+        moment = datetime.strptime(minute, '%Y-%m-%dT%H:%M')
+    except ValueError:
+        return None
+    return (moment + timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M')
+
+
+def parse_range(path, start, end, normalize=True):
+    """Parse the complete lines in ``[start, end)`` of ``path`` into a Rollup.
+
+    Lines may carry a prefix before the JSON object (e.g. the timestamp and
+    instance id a log export adds); anything up to the first ``{`` is
+    skipped. Lines that are not JSON objects are counted in ``skipped``.
+    The range is decoded in blocks of whole lines, so memory use stays at
+    about ``BLOCK_SIZE`` whatever the file size.
+    """
+    rollup = Rollup()
+    add = rollup.add
+    decode = json.JSONDecoder().raw_decode
+    skipped = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = start
+        while position < end:
+            cut = min(position + BLOCK_SIZE, end)
+            if cut < end:
+                newline = data.rfind(b'\n', position, cut)
+                if newline < 0:
+                    newline = data.find(b'\n', cut, end)
+                cut = end if newline < 0 else newline + 1
+            block = data[position:cut].decode('utf-8', 'replace')
+            position = cut
+            for line in block.split('\n'):
+                brace = line.find('{')
+                if brace < 0:
+                    if line.strip():
+                        skipped += 1
+                    continue
+                try:
+                    entry = decode(line, brace)[0]
+                except ValueError:
+                    skipped += 1
+                    continue
+                if entry.__class__ is dict:
+                    add(entry, normalize)
+                else:
+                    skipped += 1
+    rollup.skipped += skipped
+    return rollup
+
+
+def split_ranges(path, start, end, chunk_size=CHUNK_SIZE):
+    """Split ``[start, end)`` into ranges that begin and end on line boundaries."""
+    ranges = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = start
+        while position < end:
+            cut = min(position + chunk_size, end)
+            if cut < end:
+                newline = data.find(b'\n', cut, end)
+                cut = end if newline < 0 else newline + 1
+            ranges.append((position, cut))
+            position = cut
+    return ranges
+
+
+def _parse_range_args(args):
+    return parse_range(*args)
+
+
+def complete_end(path, start, size):
+    """Offset just past the last newline in ``[start, size)`` (a partial last
+    line is left for the next incremental run)."""
+    if size <= start:
+        return start
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        newline = data.rfind(b'\n', start, size)
+    return start if newline < 0 else newline + 1
+
+
+def _fingerprint(path):
+    with open(path, 'rb') as f:
+        return f.read(4096).hex()
+
+
+def analyze(path, jobs=1, state_path=None, normalize=True, chunk_size=CHUNK_SIZE):
+    """Roll up ``path``; returns ``(rollup, bytes_parsed)``.
+
+    With ``jobs > 1`` the file is split into ``chunk_size`` ranges parsed by
+    a process pool. With ``state_path``, the rollup and offset reached are
+    saved there and the next run only parses what was appended (the state is
+    discarded if the file was truncated or replaced).
+    """
+    rollup = Rollup()
+    start = 0
+    size = os.path.getsize(path)
+    if state_path and os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        head = state.get('head', '')
+        if (state.get('path') == os.path.abspath(path) and state.get('offset', 0) <= size
+                and _fingerprint(path)[:len(head)] == head):
+            rollup = Rollup.from_dict(state['rollup'])
+            start = state['offset']
+
+    end = complete_end(path, start, size) if state_path else size
+    if end > start:
+        ranges = split_ranges(path, start, end, chunk_size)
+        if jobs > 1 and len(ranges) > 1:
+            import multiprocessing
+            with multiprocessing.Pool(min(jobs, len(ranges))) as pool:
+                parts = pool.imap(_parse_range_args,
+                                  [(path, a, b, normalize) for a, b in ranges])
+                for part in parts:
+                    rollup.merge(part)
+        else:
+            for a, b in ranges:
+                rollup.merge(parse_range(path, a, b, normalize))
+
+    if state_path:
+        from simgen.incremental import atomic_write
+        state = {'path': os.path.abspath(path), 'offset': end,
+                 'head': _fingerprint(path) if end else '', 'rollup': rollup.to_dict()}
+        atomic_write(state_path, json.dumps(state).encode('utf-8'))
+    return rollup, end - start
+
+
+def route_table(rollup, sort='p95', top=20):
+    """Rows of ``{route, count, errors, p50_ms, p95_ms, p99_ms, max_ms}``."""
+    rows = []
+    for route, stats in rollup.routes.items():
+        latency = stats.latency
+        row = {'route': route, 'count': stats.count, 'errors': stats.errors,
+               'levels': dict(stats.levels), 'timed': latency.count}
+        for q in (50, 95, 99):
+            value = latency.percentile(q)
+            row[f'p{q}_ms'] = None if value is None else value / 1000
+        row['max_ms'] = latency.max / 1000 if latency.count else None
+        rows.append(row)
+    key = {'count': lambda r: r['count'], 'errors': lambda r: r['errors']}.get(
+        sort, lambda r: r.get(f'{sort}_ms') or -1)
+    rows.sort(key=key, reverse=True)
+    return rows[:top] if top else rows
@@ -0,0 +1,430 @@
+# Postgres wire protocol: connection-setup probe and a local stub server
+#
+# probe_connection() opens a real frontend/backend session (SSLRequest, TLS,
+# StartupMessage, cleartext/MD5/SCRAM-SHA-256 authentication, SELECT 1) and
+# times each phase separately, so slow connection setup can be told apart
+# from a slow query. StubServer speaks enough of the backend side of the
+# same protocol (with optional injected delays) to exercise the probe
+# without a database.
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import ssl
+import struct
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SSL_REQUEST_CODE = 80877103
+PROTOCOL_VERSION = 196608  # 3.0
+SCRAM_ITERATIONS = 4096
+SSL_MODES = ('disable', 'allow', 'prefer', 'require', 'verify-ca', 'verify-full')
+
+PHASES = ('tcp', 'tls', 'auth', 'query')
+
+
+class ProtocolError(ConnectionError):
+    """The server rejected the session or spoke something unexpected."""
+
+
+def parse_database_url(url):
+    """Split a ``postgres(ql)://`` URL into connection parameters.
+
+    User name, password and database are percent-decoded, so credentials
+    containing ``:``, ``@`` or ``/`` work when URL-encoded (and ``:``/``@``
+    in the password work even unencoded). ``sslmode`` is read from the
+    query string and defaults to ``prefer`` like libpq.
+    """
+    parts = urlsplit(url.strip())
+    if parts.scheme not in ('postgres', 'postgresql'):
+        raise ValueError(f"Not a postgres:// URL: {parts.scheme or url!r}")
+    query = parse_qs(parts.query)
+    user = unquote(parts.username or '') or 'postgres'
+    sslmode = query.get('sslmode', ['prefer'])[0]
+    if sslmode not in SSL_MODES:
+        raise ValueError(f"Invalid sslmode {sslmode!r} (expected one of: {', '.join(SSL_MODES)})")
+    try:
+        port = parts.port or 5432
+    except ValueError:
+        raise ValueError(f"Invalid port in database URL for host {parts.hostname!r}") from None
+    return {
+        'host': parts.hostname or 'localhost',
+        'port': port,
+        'user': user,
+        'password': None if parts.password is None else unquote(parts.password),
+        'database': unquote(parts.path.lstrip('/')) or user,
+        'sslmode': sslmode,
+    }
+
+
+def _message(kind, payload=b''):
+    return kind + struct.pack('!I', len(payload) + 4) + payload
+
+
+def _cstr(value):
+    return value.encode('utf-8') + b'\0'
+
+
+async def _read_message(reader):
+    header = await reader.readexactly(5)
+    length = struct.unpack('!I', header[1:])[0]
+    return header[:1], await reader.readexactly(length - 4)
+
+
+def _error_text(payload):
+    fields = {}
+    for field in payload.split(b'\0'):
+        if field:
+            fields[field[:1]] = field[1:].decode('utf-8', 'replace')
+    return f"{fields.get(b'S', 'ERROR')}: {fields.get(b'M', 'unknown error')} ({fields.get(b'C', '?')})"
+
+
+def _client_ssl_context(sslmode):
+    if sslmode == 'verify-full':
+        return ssl.create_default_context()
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    if sslmode != 'verify-ca':
+        # require/prefer only ask for encryption, like libpq
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _scram_keys(password, salt, iterations):
+    salted = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    client_key = hmac.new(salted, b'Client Key', hashlib.sha256).digest()
+    server_key = hmac.new(salted, b'Server Key', hashlib.sha256).digest()
+    return client_key, hashlib.sha256(client_key).digest(), server_key
+
+
+def _scram_attributes(message):
+    return dict(item.split('=', 1) for item in message.split(','))
+
+
+def _md5_password(user, password, salt):
+    inner = hashlib.md5((password + user).encode('utf-8')).hexdigest()
+    return 'md5' + hashlib.md5(inner.encode('ascii') + salt).hexdigest()
+
+
+class _Scram:
+    """Client side of SCRAM-SHA-256 (without channel binding)."""
+
+    def __init__(self, password):
+        self.password = password
+        self.nonce = base64.b64encode(os.urandom(18)).decode('ascii')
+        self.first_bare = f'n=,r={self.nonce}'
+        self.server_signature = None
+
+    def first(self):
+        return 'n,,' + self.first_bare
+
+    def final(self, server_first):
+        attrs = _scram_attributes(server_first)
+        if not attrs['r'].startswith(self.nonce):
+            raise ProtocolError('SCRAM: server nonce does not extend the client nonce')
+        client_key, stored_key, server_key = _scram_keys(
+            self.password, base64.b64decode(attrs['s']), int(attrs['i']))
+        without_proof = f"c=biws,r={attrs['r']}"
+        auth_message = f'{self.first_bare},{server_first},{without_proof}'.encode('utf-8')
+        signature = hmac.new(stored_key, auth_message, hashlib.sha256).digest()
+        proof = bytes(a ^ b for a, b in zip(client_key, signature))
+        self.server_signature = hmac.new(server_key, auth_message, hashlib.sha256).digest()
+        return f"{without_proof},p={base64.b64encode(proof).decode('ascii')}"
+
+    def verify(self, server_final):
+        attrs = _scram_attributes(server_final)
+        if 'e' in attrs:
+            raise ProtocolError(f"SCRAM: {attrs['e']}")
+        if not hmac.compare_digest(base64.b64decode(attrs.get('v', '')), self.server_signature):
+            raise ProtocolError('SCRAM: server signature mismatch')
+
+
+async def _authenticate(reader, writer, params):
+    """Handle Authentication* messages until ReadyForQuery; return the
+    server parameters (server_version etc.)."""
+    scram = None
+    server = {}
+    while True:
+        kind, payload = await _read_message(reader)
+        if kind == b'E':
+            raise ProtocolError(_error_text(payload))
+        if kind == b'S':
+            name, value = payload.rstrip(b'\0').split(b'\0', 1)
+            server[name.decode()] = value.decode()
+        elif kind == b'Z':
+            return server
+        elif kind == b'R':
+            code = struct.unpack('!I', payload[:4])[0]
+            if code == 0:
+                continue
+            password = params['password']
+            if password is None:
+                raise ProtocolError('server requested a password but the URL has none')
+            if code == 3:
+                writer.write(_message(b'p', _cstr(password)))
+            elif code == 5:
+                writer.write(_message(b'p', _cstr(_md5_password(params['user'], password, payload[4:8]))))
+            elif code == 10:
+                mechanisms = payload[4:].split(b'\0')
+                if b'SCRAM-SHA-256' not in mechanisms:
+                    raise ProtocolError(f'unsupported SASL mechanisms: {mechanisms}')
+                scram = _Scram(password)
+                first = scram.first().encode('utf-8')
+                writer.write(_message(b'p', _cstr('SCRAM-SHA-256') + struct.pack('!I', len(first)) + first))
+            elif code == 11 and scram:
+                writer.write(_message(b'p', scram.final(payload[4:].decode('utf-8')).encode('utf-8')))
+            elif code == 12 and scram:
+                scram.verify(payload[4:].decode('utf-8'))
+            else:
+                raise ProtocolError(f'unsupported authentication request {code}')
+            await writer.drain()
+        # BackendKeyData ('K') and notices ('N') need no answer
+
+
+async def _query(reader, writer, sql):
+    writer.write(_message(b'Q', _cstr(sql)))
+    await writer.drain()
+    rows = []
+    error = None
+    while True:
+        kind, payload = await _read_message(reader)
+        if kind == b'D':
+            count = struct.unpack('!H', payload[:2])[0]
+            offset, row = 2, []
+            for _ in range(count):
+                length = struct.unpack('!i', payload[offset:offset + 4])[0]
+                offset += 4
+                if length < 0:
+                    row.append(None)
+                else:
+                    row.append(payload[offset:offset + length].decode('utf-8'))
+                    offset += length
+            rows.append(row)
+        elif kind == b'E':
+            error = _error_text(payload)
+        elif kind == b'Z':
+            if error:
+                raise ProtocolError(error)
+            return rows
+
+
+async def probe_connection(url, query='SELECT 1'):
+    """Open a session, run ``query`` and close it.
+
+    Returns ``{'tcp': s, 'tls': s, 'auth': s, 'query': s, 'server_version': str}``;
+    ``tls`` is omitted when the session is not encrypted. ``auth`` spans
+    StartupMessage to ReadyForQuery, i.e. authentication plus backend start.
+    """
+    params = parse_database_url(url) if isinstance(url, str) else url
+    timings = {}
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(params['host'], params['port'])
+    timings['tcp'] = time.perf_counter() - start
+    try:
+        if params['sslmode'] != 'disable':
+            start = time.perf_counter()
+            writer.write(struct.pack('!II', 8, SSL_REQUEST_CODE))
+            await writer.drain()
+            answer = await reader.readexactly(1)
+            if answer == b'S':
+                await writer.start_tls(_client_ssl_context(params['sslmode']),
+                                       server_hostname=params['host'])
+                timings['tls'] = time.perf_counter() - start
+            elif params['sslmode'] in ('require', 'verify-ca', 'verify-full'):
+                raise ProtocolError(f"server does not support SSL (sslmode={params['sslmode']})")
+
+        start = time.perf_counter()
+        startup = (struct.pack('!I', PROTOCOL_VERSION) + _cstr('user') + _cstr(params['user'])
+                   + _cstr('database') + _cstr(params['database'])
+                   + _cstr('application_name') + _cstr('simgen-probe') + b'\0')
+        writer.write(struct.pack('!I', len(startup) + 4) + startup)
+        await writer.drain()
+        server = await _authenticate(reader, writer, params)
+        timings['auth'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await _query(reader, writer, query)
+        timings['query'] = time.perf_counter() - start
+
+        timings['server_version'] = server.get('server_version')
+        writer.write(_message(b'X'))
+        await writer.drain()
+    except asyncio.IncompleteReadError:
+        raise ProtocolError('server closed the connection') from None
+    finally:
+        writer.close()
+    return timings
+
+
+class StubServer:
+    """Minimal Postgres backend for exercising :func:`probe_connection`.
+
+    ``auth`` is ``'trust'``, ``'password'``, ``'md5'`` or ``'scram'``.
+    Pass an ``ssl_context`` (server side, with a certificate loaded) to
+    accept SSLRequest; ``auth_delay``/``query_delay`` (seconds) simulate a
+    slow backend start and a slow query::
+
+        async with StubServer(password='secret') as stub:
+            timings = await probe_connection(stub.url)
+    """
+
+    def __init__(self, user='postgres', password=None, database='postgres', auth='scram',
+                 ssl_context=None, auth_delay=0.0, query_delay=0.0):
+        if auth not in ('trust', 'password', 'md5', 'scram'):
+            raise ValueError(f"Unknown auth method {auth!r}")
+        if auth != 'trust' and password is None:
+            raise ValueError(f"auth={auth!r} needs a password")
+        self.user = user
+        self.password = password
+        self.database = database
+        self.auth = auth
+        self.ssl_context = ssl_context
+        self.auth_delay = auth_delay
+        self.query_delay = query_delay
+        self.server = None
+        self._writers = set()
+        self.host = None
+        self.port = None
+        self.sessions = 0
+
+    @property
+    def url(self):
+        credentials = self.user if self.password is None else f'{self.user}:{self.password}'
+        return f'postgresql://{credentials}@{self.host}:{self.port}/{self.database}'
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.server = await asyncio.start_server(self._session, host, port)
+        self.host, self.port = self.server.sockets[0].getsockname()[:2]
+        return self
+
+    async def close(self):
+        self.server.close()
+        # Ending open sessions lets their handlers finish instead of being
+        # cancelled mid-read
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @staticmethod
+    def _error(code, text):
+        return _message(b'E', b'SFATAL\0' + b'C' + code.encode() + b'\0M' + _cstr(text) + b'\0')
+
+    async def _session(self, reader, writer):
+        self.sessions += 1
+        self._writers.add(writer)
+        try:
+            await self._serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _startup(self, reader, writer):
+        while True:
+            length = struct.unpack('!I', await reader.readexactly(4))[0]
+            body = await reader.readexactly(length - 4)
+            code = struct.unpack('!I', body[:4])[0]
+            if code != SSL_REQUEST_CODE:
+                break
+            if self.ssl_context is None:
+                writer.write(b'N')
+                await writer.drain()
+            else:
+                writer.write(b'S')
+                await writer.drain()
+                await writer.start_tls(self.ssl_context)
+        fields = body[4:].split(b'\0')
+        return {fields[i].decode(): fields[i + 1].decode() for i in range(0, len(fields) - 1, 2)
+                if fields[i]}
+
+    async def _password_message(self, reader):
+        kind, payload = await _read_message(reader)
+        if kind != b'p':
+            raise ConnectionError('expected a password message')
+        return payload
+
+    async def _check_auth(self, reader, writer, user):
+        if self.auth == 'trust':
+            return True
+        if self.auth == 'password':
+            writer.write(_message(b'R', struct.pack('!I', 3)))
+            await writer.drain()
+            return (await self._password_message(reader)).rstrip(b'\0').decode() == self.password
+        if self.auth == 'md5':
+            salt = os.urandom(4)
+            writer.write(_message(b'R', struct.pack('!I', 5) + salt))
+            await writer.drain()
+            answer = (await self._password_message(reader)).rstrip(b'\0').decode()
+            return hmac.compare_digest(answer, _md5_password(user, self.password, salt))
+
+        writer.write(_message(b'R', struct.pack('!I', 10) + _cstr('SCRAM-SHA-256') + b'\0'))
+        await writer.drain()
+        payload = await self._password_message(reader)
+        mechanism, _, rest = payload.partition(b'\0')
+        client_first = rest[4:].decode('utf-8')
+        first_bare = client_first.split(',', 2)[2]
+        nonce = _scram_attributes(first_bare)['r'] + base64.b64encode(os.urandom(18)).decode()
+        salt = os.urandom(16)
+        server_first = f"r={nonce},s={base64.b64encode(salt).decode()},i={SCRAM_ITERATIONS}"
+        writer.write(_message(b'R', struct.pack('!I', 11) + server_first.encode()))
+        await writer.drain()
+
+        client_final = (await self._password_message(reader)).decode('utf-8')
+        attrs = _scram_attributes(client_final)
+        client_key, stored_key, server_key = _scram_keys(self.password, salt, SCRAM_ITERATIONS)
+        without_proof = client_final.rsplit(',p=', 1)[0]
+        auth_message = f'{first_bare},{server_first},{without_proof}'.encode()
+        signature = hmac.new(stored_key, auth_message, hashlib.sha256).digest()
+        proof = base64.b64decode(attrs.get('p', ''))
+        recovered = bytes(a ^ b for a, b in zip(proof, signature))
+        if attrs.get('r') != nonce or hashlib.sha256(recovered).digest() != stored_key:
+            return False
+        verifier = hmac.new(server_key, auth_message, hashlib.sha256).digest()
+        writer.write(_message(b'R', struct.pack('!I', 12) + f'v={base64.b64encode(verifier).decode()}'.encode()))
+        return True
+
+    async def _serve(self, reader, writer):
+        params = await self._startup(reader, writer)
+        user = params.get('user', '')
+        if user != self.user or not await self._check_auth(reader, writer, user):
+            writer.write(self._error('28P01', f'password authentication failed for user "{user}"'))
+            await writer.drain()
+            return
+        if self.auth_delay:
+            await asyncio.sleep(self.auth_delay)
+        writer.write(_message(b'R', struct.pack('!I', 0))
+                     + _message(b'S', _cstr('server_version') + _cstr('16.0 (simgen stub)'))
+                     + _message(b'K', struct.pack('!II', os.getpid(), self.sessions))
+                     + _message(b'Z', b'I'))
+        await writer.drain()
+
+        while True:
+            kind, payload = await _read_message(reader)
+            if kind == b'X':
+                return
+            if kind != b'Q':
+                writer.write(self._error('08P01', f'unsupported message {kind!r}') + _message(b'Z', b'I'))
+                await writer.drain()
+                continue
+            if self.query_delay:
+                await asyncio.sleep(self.query_delay)
+            sql = payload.rstrip(b'\0').decode('utf-8').strip().rstrip(';').strip()
+            if sql.upper() == 'SELECT 1':
+                column = _cstr('?column?') + struct.pack('!IhIhih', 0, 0, 23, 4, -1, 0)
+                writer.write(_message(b'T', struct.pack('!H', 1) + column)
+                             + _message(b'D', struct.pack('!HI', 1, 1) + b'1')
+                             + _message(b'C', _cstr('SELECT 1')))
+            else:
+                writer.write(self._error('0A000', f'the stub only answers SELECT 1, not {sql!r}'))
+            writer.write(_message(b'Z', b'I'))
+            await writer.drain()
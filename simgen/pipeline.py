@@ -0,0 +1,302 @@
+# Dependency graph of every generated artifact
+#
+# Each artifact is a node that renders its content from the outputs of the
+# nodes it depends on. Independent nodes are rendered concurrently on a
+# thread pool, and the results are synced to disk through the incremental
+# writer so unchanged files are left alone.
+
+import os
+import queue
+import re
+import threading
+
+from simgen import templates
+from simgen.incremental import write_tree
+from simgen.settings import DEFAULT_SETTINGS, Settings
+
+
+class Node:
+    """One generated artifact.
+
+    ``render`` is called with a ``{node_name: content}`` mapping holding the
+    outputs of every node listed in ``deps``, and the deployment
+    :class:`~simgen.settings.Settings`. ``when`` marks the files of an
+    optional service: called with the settings, it tells whether
+    :func:`generate` and tenant exports write them.
+    """
+
+    __slots__ = ('name', 'path', 'render', 'deps', 'mode', 'when')
+
+    def __init__(self, name, path, render, deps=(), mode=None, when=None):
+        self.name = name
+        self.path = path
+        self.render = render
+        self.deps = tuple(deps)
+        self.mode = mode
+        self.when = when
+
+    def __repr__(self):
+        return f'Node({self.name!r}, deps={list(self.deps)!r})'
+
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class CompiledTemplate:
+    """A template pre-split into literal text and placeholder names.
+
+    Rendering is a single ``''.join`` over the precomputed parts, so it can be
+    repeated for thousands of deployments without re-scanning the text.
+    """
+
+    __slots__ = ('parts', 'fields')
+
+    def __init__(self, text):
+        pieces = _PLACEHOLDER_RE.split(text)
+        self.parts = pieces
+        self.fields = tuple(pieces[1::2])
+        unknown = set(self.fields) - set(Settings.PLACEHOLDERS)
+        if unknown:
+            raise ValueError(f"Unknown template placeholder(s): {', '.join(sorted(unknown))}")
+
+    def render(self, values):
+        if not self.fields:
+            return self.parts[0]
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return ''.join(parts)
+
+
+def _template(text):
+    compiled = CompiledTemplate(text.strip())
+    return lambda deps, settings: compiled.render(settings.values())
+
+
+def _source(name):
+    # Shipped verbatim: a simgen module that runs standalone in its service
+    with open(os.path.join(os.path.dirname(__file__), name), encoding='utf-8') as f:
+        text = f.read()
+    return lambda deps, settings: text
+
+
+def _diagram(deps, settings):
+    # plotly/kaleido are only imported when the diagram is actually rendered,
+    # and an unchanged topology is served from the render cache
+    from simgen import topology
+    from simgen.export import DiagramSpec, ExportSession
+    spec = DiagramSpec(topology=topology.load(deps['render.yaml'], deps['docker-compose.yml']))
+    with ExportSession() as session:
+        return session.render([spec], ['png'])[(spec.name, 'png')]
+
+
+def _pgbouncer(settings):
+    return settings.pgbouncer
+
+
+def _llm_gateway(settings):
+    return settings.llm_gateway
+
+
+# Files written by `script (2).py`
+CORE_NODES = [
+    Node('render.yaml', 'render.yaml', _template(templates.RENDER_YAML)),
+    Node('Dockerfile', 'Dockerfile', _template(templates.DOCKERFILE)),
+    Node('Dockerfile.realtime', 'Dockerfile.realtime', _template(templates.DOCKERFILE_REALTIME)),
+    Node('package.json', 'package.json', _template(templates.PACKAGE_JSON)),
+    Node('.env.example', '.env.example', _template(templates.ENV_EXAMPLE)),
+    Node('docker-compose.yml', 'docker-compose.yml', _template(templates.DOCKER_COMPOSE)),
+    Node('docker-compose.loadtest.yml', 'docker-compose.loadtest.yml',
+         _template(templates.DOCKER_COMPOSE_LOADTEST)),
+    Node('README.md', 'README.md', _template(templates.README)),
+    Node('deploy.sh', 'deploy.sh', _template(templates.DEPLOY_SCRIPT), mode=0o755),
+    Node('health-check.sh', 'health-check.sh', _template(templates.HEALTH_CHECK), mode=0o755),
+    Node('db-entrypoint.sh', 'db-entrypoint.sh', _template(templates.DB_ENTRYPOINT), mode=0o755),
+    Node('pgbouncer/Dockerfile', 'pgbouncer/Dockerfile', _template(templates.PGBOUNCER_DOCKERFILE),
+         when=_pgbouncer),
+    Node('pgbouncer/pgbouncer.ini', 'pgbouncer/pgbouncer.ini', _template(templates.PGBOUNCER_INI),
+         when=_pgbouncer),
+    Node('pgbouncer/entrypoint.sh', 'pgbouncer/entrypoint.sh',
+         _template(templates.PGBOUNCER_ENTRYPOINT), mode=0o755, when=_pgbouncer),
+    Node('gateway/Dockerfile', 'gateway/Dockerfile', _template(templates.GATEWAY_DOCKERFILE),
+         when=_llm_gateway),
+    Node('gateway/gateway.py', 'gateway/gateway.py', _source('gateway.py'), when=_llm_gateway),
+]
+
+# Files written by `script (3).py`
+ADDITIONAL_NODES = [
+    Node('.dockerignore', '.dockerignore', _template(templates.DOCKERIGNORE)),
+    Node('.gitignore', '.gitignore', _template(templates.GITIGNORE)),
+    Node('next.config.js', 'next.config.js', _template(templates.NEXT_CONFIG)),
+    Node('app/health/route.js', 'app/health/route.js', _template(templates.HEALTH_ENDPOINT)),
+    Node('app/health/live/route.js', 'app/health/live/route.js',
+         _template(templates.HEALTH_LIVE_ENDPOINT)),
+    Node('app/health/ready/route.js', 'app/health/ready/route.js',
+         _template(templates.HEALTH_READY_ENDPOINT)),
+    Node('lib/health.js', 'lib/health.js', _template(templates.HEALTH_LIB)),
+    Node('app/metrics/route.js', 'app/metrics/route.js', _template(templates.METRICS_ENDPOINT)),
+    Node('lib/metrics.js', 'lib/metrics.js', _template(templates.METRICS_LIB)),
+    Node('lib/realtime.js', 'lib/realtime.js', _template(templates.REALTIME_LIB)),
+    Node('migrate.sh', 'migrate.sh', _template(templates.MIGRATION_SCRIPT), mode=0o755),
+    Node('lib/logger.js', 'lib/logger.js', _template(templates.LOGGING_CONFIG)),
+]
+
+# The architecture diagram describes the services in the blueprint and compose file
+DIAGRAM_NODE = Node('diagram', 'sim_studio_architecture.png', _diagram,
+                    deps=('render.yaml', 'docker-compose.yml'))
+
+
+def artifact_graph(diagram=False):
+    """Return every node of the deployment tree, optionally with the diagram."""
+    nodes = CORE_NODES + ADDITIONAL_NODES
+    if diagram:
+        nodes = nodes + [DIAGRAM_NODE]
+    return nodes
+
+
+def select(nodes, names):
+    """Restrict ``nodes`` to ``names`` plus everything they transitively need."""
+    by_name = {node.name: node for node in nodes}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise KeyError(f"Unknown artifact(s): {', '.join(unknown)}")
+    wanted = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(by_name[name].deps)
+    return [node for node in nodes if node.name in wanted]
+
+
+def _check_deps(nodes):
+    by_name = {node.name: node for node in nodes}
+    for node in nodes:
+        missing = [dep for dep in node.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"{node.name} depends on unknown node(s): {', '.join(missing)}")
+    return by_name
+
+
+def topological_order(nodes):
+    """Return ``nodes`` sorted so every node comes after its dependencies."""
+    by_name = _check_deps(nodes)
+    order = []
+    state = {}
+
+    def visit(node):
+        if state.get(node.name) == 'done':
+            return
+        if state.get(node.name) == 'visiting':
+            raise ValueError(f"Dependency cycle through: {node.name}")
+        state[node.name] = 'visiting'
+        for dep in node.deps:
+            visit(by_name[dep])
+        state[node.name] = 'done'
+        order.append(node)
+
+    for node in nodes:
+        visit(node)
+    return order
+
+
+def render_sequential(ordered_nodes, settings=DEFAULT_SETTINGS):
+    """Render nodes already in topological order on the calling thread.
+
+    Used for batch generation, where spinning up a pool per deployment would
+    cost more than the (string-only) rendering itself.
+    """
+    outputs = {}
+    for node in ordered_nodes:
+        outputs[node.name] = node.render({dep: outputs[dep] for dep in node.deps}, settings)
+    return outputs
+
+
+def render_graph(nodes, jobs=None, settings=DEFAULT_SETTINGS):
+    """Render every node, running independent nodes concurrently.
+
+    Returns ``{node_name: content}``. Raises ``ValueError`` on missing
+    dependencies or cycles.
+    """
+    by_name = _check_deps(nodes)
+    if jobs == 1:
+        return render_sequential(topological_order(nodes), settings)
+
+    outputs = {}
+    pending = {node.name: set(node.deps) for node in nodes}
+    dependents = {node.name: [] for node in nodes}
+    for node in nodes:
+        for dep in node.deps:
+            dependents[dep].append(node.name)
+
+    # A minimal thread pool: concurrent.futures costs more to import than
+    # rendering the whole tree does
+    jobs = jobs or min(8, (os.cpu_count() or 1) + 4)
+    tasks = queue.SimpleQueue()
+    done = queue.SimpleQueue()
+
+    def worker():
+        while True:
+            node = tasks.get()
+            if node is None:
+                return
+            try:
+                done.put((node.name, node.render({dep: outputs[dep] for dep in node.deps}, settings), None))
+            except BaseException as e:
+                done.put((node.name, None, e))
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(min(jobs, len(nodes)))]
+    for thread in workers:
+        thread.start()
+
+    running = 0
+    error = None
+    try:
+        while True:
+            if error is None:
+                for name in [name for name, deps in pending.items() if not deps]:
+                    del pending[name]
+                    tasks.put(by_name[name])
+                    running += 1
+            if not running:
+                break
+            name, content, exc = done.get()
+            running -= 1
+            if exc is not None:
+                # Let in-flight nodes finish, then report the first failure
+                error = error or exc
+                continue
+            outputs[name] = content
+            for child in dependents[name]:
+                pending[child].discard(name)
+    finally:
+        for _ in workers:
+            tasks.put(None)
+
+    if error is not None:
+        raise error
+    if pending:
+        raise ValueError(f"Dependency cycle between: {', '.join(sorted(pending))}")
+    return outputs
+
+
+def generate(root='.', names=None, diagram=False, jobs=None, settings=DEFAULT_SETTINGS):
+    """Render the deployment tree for ``settings`` into ``root``.
+
+    Only files whose content or mode changed are touched. Files of an
+    optional service ``settings`` does not run are skipped unless ``names``
+    asks for them. Returns ``{path: action}`` as reported by
+    :func:`simgen.incremental.write_tree`.
+    """
+    nodes = artifact_graph(diagram=diagram or (names is not None and 'diagram' in names))
+    if names is not None:
+        # Dependencies are rendered as inputs but only the requested files are written
+        nodes = select(nodes, names)
+    else:
+        nodes = [node for node in nodes if node.when is None or node.when(settings)]
+    outputs = render_graph(nodes, jobs, settings)
+    targets = [node for node in nodes if names is None or node.name in names]
+    files = {node.path: outputs[node.name] for node in targets}
+    modes = {node.path: node.mode for node in targets if node.mode is not None}
+    return write_tree(files, modes, root)
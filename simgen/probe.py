@@ -0,0 +1,383 @@
+# Concurrent health prober
+#
+# The asyncio counterpart of health-check.sh: every target (HTTP health
+# endpoints, databases and TCP ports, for any number of stacks) is probed at
+# the same time, each attempt under its own deadline, with retries and
+# exponential backoff. HTTP probes keep their connections alive between
+# samples and retries, so repeated samples measure the endpoint rather than
+# TCP/TLS setup. Database targets run a full Postgres session (see
+# simgen.pgwire) and report TCP, TLS, auth and query latency separately.
+# Exit codes match the script: 0 when everything is healthy,
+# 1 when any check fails.
+
+import asyncio
+import os
+import random
+import ssl
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.2
+DEFAULT_CONCURRENCY = 100
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443, 'tcp': None, 'postgres': 5432, 'postgresql': 5432}
+
+
+class ResponseError(ValueError):
+    """A response that started arriving but was truncated or malformed."""
+
+
+class Target:
+    """One endpoint to probe: ``http(s)://`` health URL, database or TCP port."""
+
+    __slots__ = ('stack', 'name', 'scheme', 'host', 'port', 'path', 'url', 'dsn')
+
+    def __init__(self, stack, name, scheme, host, port, path='/', url=None, dsn=None):
+        self.stack = stack
+        self.name = name
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url or f'{scheme}://{host}:{port}{path if scheme.startswith("http") else ""}'
+        self.dsn = dsn  # full connection URL (with credentials) of a database
+
+    @classmethod
+    def from_url(cls, url, stack=None, name=None):
+        """Parse ``http(s)://host[:port]/path``, ``tcp://host:port`` or a
+        ``postgres(ql)://user:pass@host[:port]/db`` connection string.
+
+        Credentials are parsed properly (passwords may contain ``@`` or
+        ``:``) and only kept in ``dsn``, never in the displayed ``url``.
+        """
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        if scheme not in _DEFAULT_PORTS:
+            raise ValueError(f"Unsupported probe URL {url!r} (expected http, https, tcp or postgres)")
+        if not parts.hostname:
+            raise ValueError(f"Probe URL {url!r} has no host")
+        port = parts.port or _DEFAULT_PORTS[scheme]
+        if port is None:
+            raise ValueError(f"Probe URL {url!r} has no port")
+        dsn = None
+        if scheme.startswith('http'):
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            shown = f'{scheme}://{parts.hostname}:{port}{path}'
+        else:
+            path = parts.path.lstrip('/') or None  # database name, if any
+            if scheme != 'tcp':
+                scheme, dsn = 'postgres', url.strip()
+            shown = f'{scheme}://{parts.hostname}:{port}'
+        return cls(stack, name or parts.hostname, scheme, parts.hostname, port, path, shown, dsn)
+
+    @property
+    def label(self):
+        return f'{self.stack}/{self.name}' if self.stack else self.name
+
+    def __repr__(self):
+        return f'Target({self.label!r}, {self.url!r})'
+
+
+class Result:
+    """Outcome of probing one target: latencies of successful attempts (s),
+    plus per-phase latencies for database sessions."""
+
+    __slots__ = ('target', 'ok', 'status', 'error', 'latencies', 'phases', 'attempts')
+
+    def __init__(self, target):
+        self.target = target
+        self.ok = True
+        self.status = None
+        self.error = None
+        self.latencies = []
+        self.phases = {}
+        self.attempts = 0
+
+    def percentile(self, q):
+        return percentile(sorted(self.latencies), q)
+
+    def as_dict(self):
+        values = sorted(self.latencies)
+        return {
+            'stack': self.target.stack,
+            'name': self.target.name,
+            'url': self.target.url,
+            'ok': self.ok,
+            'status': self.status,
+            'error': self.error,
+            'attempts': self.attempts,
+            'samples': len(values),
+            'p50_ms': _ms(percentile(values, 50)),
+            'p95_ms': _ms(percentile(values, 95)),
+            'p99_ms': _ms(percentile(values, 99)),
+            'max_ms': _ms(values[-1] if values else None),
+            'phases': {phase: {'p50_ms': _ms(percentile(sorted(times), 50)),
+                               'p95_ms': _ms(percentile(sorted(times), 95))}
+                       for phase, times in self.phases.items()},
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))  # ceil without floats
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+
+class _ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port)."""
+
+    def __init__(self):
+        self.idle = {}
+        self.opened = 0
+        self._ssl = None
+
+    def _ssl_context(self):
+        if self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    async def acquire(self, target):
+        idle = self.idle.get((target.scheme, target.host, target.port))
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        context = self._ssl_context() if target.scheme == 'https' else None
+        reader, writer = await asyncio.open_connection(target.host, target.port, ssl=context)
+        self.opened += 1
+        return reader, writer, False
+
+    def release(self, target, reader, writer):
+        self.idle.setdefault((target.scheme, target.host, target.port), []).append((reader, writer))
+
+    def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+
+async def read_response(reader):
+    """Read one HTTP/1.x response; return ``(status, reusable)``.
+
+    Raises ConnectionError when the connection closed before any of the
+    response arrived (the request may be retried on another connection)
+    and :class:`ResponseError` when it was truncated or malformed.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    try:
+        return await _read_rest(reader, status_line)
+    except ResponseError:
+        raise
+    except asyncio.IncompleteReadError as e:
+        raise ResponseError(f'truncated response ({len(e.partial)} of {e.expected} '
+                            'bytes)') from None
+    except (ConnectionError, ValueError) as e:
+        raise ResponseError(f'broken response: {e}') from None
+
+
+async def _read_rest(reader, status_line):
+    try:
+        status = int(status_line.split(None, 2)[1])
+    except (IndexError, ValueError):
+        raise ResponseError(f'malformed status line {status_line[:40]!r}') from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    reusable = headers.get('connection', '').lower() != 'close'
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            await reader.readexactly(size + 2)
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        reusable = False
+    return status, reusable
+
+
+async def _http_probe(pool, target):
+    request = (f'GET {target.path} HTTP/1.1\r\n'
+               f'Host: {target.host}\r\n'
+               'User-Agent: simgen-probe\r\n'
+               'Accept: */*\r\n'
+               'Connection: keep-alive\r\n\r\n').encode('latin-1')
+    while True:
+        reader, writer, reused = await pool.acquire(target)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, reusable = await read_response(reader)
+        except ConnectionError:
+            writer.close()
+            if reused:
+                # The server dropped an idle keep-alive connection before
+                # answering; that says nothing about its health, so retry
+                # on a fresh one
+                continue
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        if reusable:
+            pool.release(target, reader, writer)
+        else:
+            writer.close()
+        return status, None
+
+
+async def _tcp_probe(pool, target):
+    reader, writer = await asyncio.open_connection(target.host, target.port)
+    pool.opened += 1
+    writer.close()
+    return None, None
+
+
+async def _postgres_probe(pool, target):
+    # Every sample is a fresh session: connection setup is what we measure
+    from simgen.pgwire import probe_connection
+    timings = await probe_connection(target.dsn)
+    pool.opened += 1
+    timings.pop('server_version', None)
+    return None, timings
+
+
+async def _probe_target(target, pool, semaphore, samples, timeout, retries, backoff):
+    result = Result(target)
+    check = _CHECKS.get(target.scheme, _tcp_probe)
+    for _ in range(samples):
+        for attempt in range(retries + 1):
+            if attempt:
+                # Exponential backoff with full jitter
+                await asyncio.sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
+            result.attempts += 1
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    status, phases = await asyncio.wait_for(check(pool, target), timeout)
+                except asyncio.TimeoutError:
+                    result.error = f'no response within {timeout:g}s'
+                    continue
+                except OSError as e:
+                    result.error = e.strerror or str(e) or type(e).__name__
+                    continue
+                except (EOFError, ValueError) as e:
+                    # Truncated or malformed responses fail this target only
+                    result.error = str(e) or type(e).__name__
+                    continue
+                elapsed = time.perf_counter() - start
+            result.status = status
+            if status is not None and status >= 400:
+                # Like `curl -f`: an HTTP error status is a failed check
+                result.error = f'HTTP {status}'
+                continue
+            result.error = None
+            result.latencies.append(elapsed)
+            for phase, seconds in (phases or {}).items():
+                result.phases.setdefault(phase, []).append(seconds)
+            break
+        else:
+            result.ok = False
+    return result
+
+
+_CHECKS = {'http': _http_probe, 'https': _http_probe, 'postgres': _postgres_probe}
+
+
+async def probe_all(targets, samples=1, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                    backoff=DEFAULT_BACKOFF, concurrency=DEFAULT_CONCURRENCY):
+    """Probe every target concurrently; return ``(results, connections_opened)``.
+
+    Each target is sampled ``samples`` times (sequentially, reusing its
+    keep-alive connection); a sample fails after ``retries`` retries, and a
+    target is healthy only if all of its samples succeeded. At most
+    ``concurrency`` probes are in flight at once.
+    """
+    pool = _ConnectionPool()
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        results = await asyncio.gather(*(
+            _probe_target(target, pool, semaphore, samples, timeout, retries, backoff)
+            for target in targets))
+    finally:
+        pool.close()
+    return results, pool.opened
+
+
+def run(targets, **options):
+    """Synchronous wrapper around :func:`probe_all`."""
+    return asyncio.run(probe_all(targets, **options))
+
+
+def load_targets(path):
+    """Read targets from a file with one ``[stack] url`` per line (``#`` comments)."""
+    targets = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, start=1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(f"{path}:{lineno}: expected '[stack] url'")
+            stack, url = fields if len(fields) == 2 else (None, fields[0])
+            try:
+                targets.append(Target.from_url(url, stack=stack))
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+    return targets
+
+
+def tenant_targets(tenants):
+    """Public health endpoint of every tenant's web service."""
+    return [Target.from_url(f'https://{tenant.domain}/health', stack=tenant.name, name='simstudio')
+            for tenant in tenants]
+
+
+def local_targets(topology, database_url=None):
+    """What health-check.sh checks: each service's local health endpoint,
+    the local Redis port, plus the database from ``DATABASE_URL`` when it
+    is set.
+    """
+    targets = []
+    for service in topology.runtime_services():
+        if service.local_port is None:
+            continue
+        if service.port is None and not service.health_check_path:
+            # Not an HTTP service (no PORT), e.g. PgBouncer: check it accepts connections
+            targets.append(Target(None, service.name, 'tcp', 'localhost', service.local_port))
+        else:
+            path = service.health_check_path or '/health'
+            targets.append(Target(None, service.name, 'http', 'localhost', service.local_port, path))
+    for service in topology.of_kind('keyvalue'):
+        if service.local_port is not None:
+            targets.append(Target(None, service.name, 'tcp', 'localhost', service.local_port))
+    database_url = database_url if database_url is not None else os.environ.get('DATABASE_URL')
+    if database_url:
+        databases = topology.of_kind('database')
+        name = databases[0].name if databases else 'database'
+        targets.append(Target.from_url(database_url, name=name))
+    return targets
@@ -0,0 +1,383 @@
+# Benchmark result store
+#
+# Results of benchmarks and load tests (benchmarks/bench_startup.py,
+# `simgen load`, `simgen replay`, `simgen fanout`, or any list of samples)
+# are appended to a JSON-lines file, one record per run and metric, keyed
+# by git SHA, plan and scenario. A record keeps its raw samples, or the HDR
+# histogram of a load test, so any two runs of a series can be compared
+# later: a one-sided Mann-Whitney U test asks whether the candidate tends
+# to be worse than the baseline, and a bootstrap confidence interval bounds
+# the ratio of their medians (or another percentile). A change is reported
+# as a regression only when both agree and it is at least `min_effect`
+# large; with thousands of requests per run almost any difference is
+# "significant", so the effect size is what keeps the gate meaningful.
+# Trend charts render through the plotly export session of chart_script.py.
+
+import json
+import math
+import os
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+RECORD_VERSION = 1
+DEFAULT_STORE = 'benchmark-results.jsonl'
+STATISTICS = {'median': 50, 'p90': 90, 'p95': 95, 'p99': 99}
+
+
+def default_store():
+    return os.environ.get('SIMGEN_RESULTS') or DEFAULT_STORE
+
+
+def series_name(key):
+    """``benchmark metric [plan, scenario]`` for display."""
+    benchmark, metric, plan, scenario = key
+    context = ', '.join(filter(None, (plan, scenario)))
+    return f"{benchmark} {metric}" + (f" [{context}]" if context else '')
+
+
+def git_sha(root='.'):
+    """Short SHA of HEAD, suffixed with ``-dirty`` for uncommitted changes;
+    ``unknown`` outside a git checkout."""
+    try:
+        sha = subprocess.run(['git', '-C', root, 'rev-parse', '--short=12', 'HEAD'],
+                             capture_output=True, text=True)
+        if sha.returncode != 0:
+            return 'unknown'
+        dirty = subprocess.run(['git', '-C', root, 'status', '--porcelain', '-uno'],
+                               capture_output=True, text=True)
+    except OSError:
+        return 'unknown'
+    return sha.stdout.strip() + ('-dirty' if dirty.stdout.strip() else '')
+
+
+class Result:
+    """One metric of one run: ``samples`` or an HDR ``histogram`` (microseconds,
+    reported in ms). ``better`` is ``lower`` (latency, time) or ``higher``
+    (throughput)."""
+
+    __slots__ = ('benchmark', 'metric', 'unit', 'sha', 'plan', 'scenario', 'recorded_at',
+                 'samples', 'histogram', 'better', 'meta')
+
+    def __init__(self, benchmark, metric, sha, unit='ms', plan='', scenario='', samples=None,
+                 histogram=None, better='lower', recorded_at=None, meta=None):
+        if (samples is None) == (histogram is None):
+            raise ValueError(f"{benchmark}/{metric}: a result needs samples or a histogram")
+        if samples is not None and not samples:
+            raise ValueError(f"{benchmark}/{metric}: no samples")
+        if better not in ('lower', 'higher'):
+            raise ValueError(f"better must be 'lower' or 'higher' (got {better!r})")
+        self.benchmark = benchmark
+        self.metric = metric
+        self.unit = unit
+        self.sha = sha
+        self.plan = plan or ''
+        self.scenario = scenario or ''
+        self.samples = None if samples is None else [float(value) for value in samples]
+        self.histogram = histogram
+        self.better = better
+        self.recorded_at = recorded_at or datetime.now(timezone.utc).isoformat(
+            timespec='seconds')
+        self.meta = meta or {}
+
+    @property
+    def key(self):
+        """The series this result belongs to."""
+        return (self.benchmark, self.metric, self.plan, self.scenario)
+
+    def distribution(self):
+        """``Counter({value: count})`` of the result, in its unit."""
+        if self.samples is not None:
+            return Counter(self.samples)
+        from simgen.logstats import Histogram
+        return Counter({micros / 1000: count for micros, count
+                        in Histogram.from_dict(self.histogram).values()})
+
+    def as_dict(self):
+        data = {'version': RECORD_VERSION}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        version = data.pop('version', RECORD_VERSION)
+        if version != RECORD_VERSION:
+            raise ValueError(f"unsupported result version {version}")
+        return cls(**data)
+
+    def __repr__(self):
+        return f'Result({series_name(self.key)!r}, {self.sha})'
+
+
+class ResultStore:
+    """Append-only JSON-lines file of :class:`Result` records."""
+
+    def __init__(self, path=None):
+        self.path = path or default_store()
+
+    def append(self, results):
+        lines = ''.join(json.dumps(result.as_dict(), separators=(',', ':')) + '\n'
+                        for result in results)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        results = []
+        with open(self.path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    results.append(Result.from_dict(json.loads(line)))
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"{self.path}:{number}: {e}") from None
+        return results
+
+    def series(self, benchmark=None, metric=None):
+        """``{key: [Result, ...]}`` in the order they were recorded."""
+        series = {}
+        for result in self.load():
+            if benchmark and result.benchmark != benchmark:
+                continue
+            if metric and result.metric != metric:
+                continue
+            series.setdefault(result.key, []).append(result)
+        return series
+
+
+def from_report(report, sha, plan='', scenario=''):
+    """Results of a `simgen load`, `replay` or `fanout` JSON report: the
+    latency histogram overall and per request/route."""
+    kind = report.get('kind')
+    meta = {'started_at': report.get('started_at')}
+    if kind in ('load', 'replay'):
+        results = []
+        meta['duration_s'] = report.get('duration_s')
+        if kind == 'replay':
+            meta['speed'] = report.get('speed')
+        for name, summary in [('', report['overall']), *report['requests'].items()]:
+            if not summary['count']:
+                continue
+            results.append(Result(kind, f'latency:{name}' if name else 'latency', sha,
+                                  plan=plan, scenario=scenario,
+                                  histogram=summary['histogram'],
+                                  meta=dict(meta, error_rate=summary['error_rate'],
+                                            rps=summary['rps'])))
+        return results
+    if kind == 'fanout':
+        if not report.get('histogram', {}).get('count'):
+            return []
+        edits = report['edits']
+        return [Result('fanout', 'broadcast_latency', sha, plan=plan, scenario=scenario,
+                       histogram=report['histogram'],
+                       meta=dict(meta, drop_rate=edits['drop_rate'],
+                                 clients=report['connections']['connected']))]
+    raise ValueError(f"Unsupported report kind {kind!r} (expected load, replay or fanout)")
+
+
+def _quantile(values, counts, q):
+    # Nearest rank over a sorted distinct-value distribution
+    total = sum(counts)
+    rank = max(1, math.ceil(total * q / 100))
+    seen = 0
+    for value, count in zip(values, counts):
+        seen += count
+        if seen >= rank:
+            return value
+    return values[-1]
+
+
+def mann_whitney(baseline, candidate):
+    """One-sided Mann-Whitney U test that ``candidate`` tends to be larger
+    than ``baseline`` (``Counter`` distributions); returns ``(u, p)``.
+
+    Uses the normal approximation with tie and continuity corrections,
+    which is accurate from about ten samples per side.
+    """
+    n_a = sum(baseline.values())
+    n_b = sum(candidate.values())
+    rank = 0
+    rank_sum = 0.0
+    ties = 0
+    for value in sorted(set(baseline) | set(candidate)):
+        a, b = baseline.get(value, 0), candidate.get(value, 0)
+        t = a + b
+        rank_sum += b * (rank + (t + 1) / 2)
+        rank += t
+        ties += t ** 3 - t
+    u = rank_sum - n_b * (n_b + 1) / 2
+    n = n_a + n_b
+    variance = n_a * n_b / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return u, 1.0
+    z = (u - n_a * n_b / 2 - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def bootstrap_ratio(baseline, candidate, q=50, confidence=0.98, resamples=2000, seed=0):
+    """Percentile-bootstrap interval of ``quantile(candidate) /
+    quantile(baseline)``; returns ``(ratio, low, high)``.
+
+    Each resample redraws the counts of every distinct value from a
+    multinomial, which is exact for any sample size and as cheap for a
+    histogram of a million requests as for twenty timings.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+
+    def replicates(distribution):
+        values = np.array(sorted(distribution), dtype=float)
+        counts = np.array([distribution[v] for v in values], dtype=np.int64)
+        n = int(counts.sum())
+        draws = rng.multinomial(n, counts / n, size=resamples)
+        rank = max(1, math.ceil(n * q / 100))
+        # Index of the first value whose cumulative count reaches the rank
+        index = (np.cumsum(draws, axis=1) >= rank).argmax(axis=1)
+        return values[index], _quantile(values.tolist(), counts.tolist(), q)
+
+    base, base_point = replicates(baseline)
+    cand, cand_point = replicates(candidate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(base > 0, cand / base, np.inf)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(ratios, [tail, 100 - tail])
+    ratio = cand_point / base_point if base_point else math.inf
+    return ratio, float(low), float(high)
+
+
+def compare(baseline, candidate, statistic='median', alpha=0.01, min_effect=0.05,
+            resamples=2000):
+    """Compare two runs of a series (each a list of :class:`Result`, pooled).
+
+    Returns a dict with both sides' sample counts and statistic, the ratio
+    candidate/baseline and its bootstrap interval (one-sided at ``alpha``),
+    the Mann-Whitney p-value and a verdict: ``regression`` or
+    ``improvement`` when the test is significant, the interval excludes 1
+    and the change is at least ``min_effect``; ``unchanged`` otherwise.
+    """
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unknown statistic {statistic!r} "
+                         f"(expected one of: {', '.join(STATISTICS)})")
+    better = candidate[-1].better
+    base = sum((result.distribution() for result in baseline), Counter())
+    cand = sum((result.distribution() for result in candidate), Counter())
+    q = STATISTICS[statistic]
+    ratio, low, high = bootstrap_ratio(base, cand, q, 1 - 2 * alpha, resamples)
+    # "Worse" is larger for lower-is-better metrics, smaller otherwise
+    _, p_worse = mann_whitney(base, cand) if better == 'lower' else mann_whitney(cand, base)
+    _, p_better = mann_whitney(cand, base) if better == 'lower' else mann_whitney(base, cand)
+    worse = (ratio >= 1 + min_effect and low > 1) if better == 'lower' else (
+        ratio <= 1 - min_effect and high < 1)
+    improved = (ratio <= 1 - min_effect and high < 1) if better == 'lower' else (
+        ratio >= 1 + min_effect and low > 1)
+    if worse and p_worse < alpha:
+        verdict = 'regression'
+    elif improved and p_better < alpha:
+        verdict = 'improvement'
+    else:
+        verdict = 'unchanged'
+    values = sorted(base)
+    base_stat = _quantile(values, [base[v] for v in values], q)
+    values = sorted(cand)
+    cand_stat = _quantile(values, [cand[v] for v in values], q)
+    return {
+        'baseline': {'sha': baseline[-1].sha, 'n': sum(base.values()), statistic: base_stat},
+        'candidate': {'sha': candidate[-1].sha, 'n': sum(cand.values()), statistic: cand_stat},
+        'unit': candidate[-1].unit,
+        'better': better,
+        'statistic': statistic,
+        'ratio': round(ratio, 4),
+        'ci': [round(low, 4), round(high, 4)],
+        'p_value': p_worse,
+        'verdict': verdict,
+    }
+
+
+def _matches(sha, revision):
+    return revision is None or sha == revision or sha.startswith(revision)
+
+
+def compare_series(store, baseline=None, candidate=None, benchmark=None, metric=None,
+                   **options):
+    """Compare the candidate run of every series with its baseline run.
+
+    ``candidate`` defaults to the series' latest SHA and ``baseline`` to the
+    latest SHA before it; either may be a SHA prefix. Runs recorded more
+    than once for the same SHA are pooled. Returns ``{key: comparison}``
+    for the series that have both runs.
+    """
+    comparisons = {}
+    for key, results in store.series(benchmark, metric).items():
+        shas = list(dict.fromkeys(result.sha for result in results))
+        cand_sha = next((sha for sha in reversed(shas) if _matches(sha, candidate)), None)
+        if cand_sha is None:
+            continue
+        earlier = shas[:shas.index(cand_sha)] if baseline is None else shas
+        base_sha = next((sha for sha in reversed(earlier)
+                         if sha != cand_sha and _matches(sha, baseline)), None)
+        if base_sha is None:
+            continue
+        comparisons[key] = compare([r for r in results if r.sha == base_sha],
+                                   [r for r in results if r.sha == cand_sha], **options)
+    return comparisons
+
+
+class TrendSpec:
+    """A trend chart of every series, for :class:`simgen.export.ExportSession`:
+    the median of each run with whiskers to p10/p90, one panel per series,
+    runs in the order they were recorded."""
+
+    __slots__ = ('name', 'series')
+
+    def __init__(self, series, name='benchmark_trends'):
+        self.name = name
+        self.series = series
+
+    def _points(self):
+        points = {}
+        for key, results in self.series.items():
+            runs = {}
+            for result in results:
+                runs.setdefault(result.sha, Counter()).update(result.distribution())
+            rows = []
+            for sha, distribution in runs.items():
+                values = sorted(distribution)
+                counts = [distribution[v] for v in values]
+                rows.append([sha] + [_quantile(values, counts, q) for q in (10, 50, 90)])
+            points[series_name(key)] = (results[-1].unit, rows)
+        return points
+
+    def inputs(self):
+        return {'chart': 'trend', 'version': RECORD_VERSION, 'points': self._points()}
+
+    def build_figure(self):
+        from plotly.subplots import make_subplots
+
+        points = self._points()
+        figure = make_subplots(rows=max(1, len(points)), cols=1,
+                               subplot_titles=list(points) or ['no results'],
+                               vertical_spacing=0.5 / max(1, len(points)))
+        for row, (name, (unit, rows)) in enumerate(points.items(), 1):
+            shas = [r[0] for r in rows]
+            medians = [r[2] for r in rows]
+            figure.add_scatter(
+                x=shas, y=medians, mode='lines+markers', name=name, row=row, col=1,
+                error_y={'type': 'data', 'symmetric': False,
+                         'array': [r[3] - r[2] for r in rows],
+                         'arrayminus': [r[2] - r[1] for r in rows]},
+                hovertemplate='%{x}<br>median %{y:.3f} ' + unit + '<extra></extra>')
+            figure.update_yaxes(title_text=unit, rangemode='tozero', row=row, col=1)
+            figure.update_xaxes(type='category', row=row, col=1)
+        figure.update_layout(title='Benchmark trends (median, p10-p90)', showlegend=False,
+                             height=max(400, 280 * len(points)), template='plotly_white')
+        return figure
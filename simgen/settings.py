@@ -0,0 +1,281 @@
+# Per-deployment settings substituted into the templates
+#
+# A single deployment uses DEFAULT_SETTINGS (the values the Blueprint has
+# always shipped with); batch generation builds one Settings per tenant.
+
+import re
+
+REGIONS = ('oregon', 'ohio', 'virginia', 'frankfurt', 'singapore')
+PLANS = ('free', 'starter', 'standard', 'pro', 'pro plus', 'pro max', 'pro ultra')
+DB_PLANS = ('basic-256mb', 'basic-1gb', 'basic-4gb', 'pro-4gb', 'pro-8gb', 'pro-16gb',
+            'pro-32gb', 'pro-64gb')
+
+# Render Postgres connection limits; they grow with instance memory
+DB_CONNECTION_LIMITS = {
+    'basic-256mb': 100, 'basic-1gb': 100, 'basic-4gb': 100, 'pro-4gb': 100,
+    'pro-8gb': 200, 'pro-16gb': 400, 'pro-32gb': 500, 'pro-64gb': 500,
+}
+RESERVED_DB_CONNECTIONS = 5  # superuser, migrations, psql sessions
+APP_POOL_SIZE = 10           # postgres.js default pool per Node process
+REALTIME_POOL_SIZE = 5
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+_DOMAIN_RE = re.compile(r'^(?=.{1,253}$)([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$')
+_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9._-]{0,62}$')
+
+
+def _flag(name, value):
+    if isinstance(value, str):
+        if value.strip().lower() not in _TRUE + _FALSE:
+            raise ValueError(f"Invalid {name} value {value!r} (expected true or false)")
+        return value.strip().lower() in _TRUE
+    return bool(value)
+
+
+class Settings:
+    """Values substituted into the ``{{placeholders}}`` of the templates.
+
+    ``num_instances`` is the instance count of the web service, or its
+    minimum when ``max_instances`` is larger (autoscaling). A
+    ``disk_size_gb`` of 0 leaves the persistent disk out, which Render
+    requires for services running more than one instance; by default a
+    single instance gets a 5 GB disk and a scaled-out service none. ``pgbouncer``
+    adds a PgBouncer private service between the services and Postgres.
+    ``redis`` adds a Key Value (Redis) instance that the realtime server's
+    Socket.IO adapter broadcasts through, which running more than one
+    realtime instance (``realtime_instances``) requires. ``llm_gateway``
+    adds the caching AI provider gateway as a private service, with a disk
+    of ``gateway_disk_size_gb`` for its second cache tier (0 keeps the cache
+    in memory only). ``db_pool_size`` is the database pool of each web
+    instance (``DATABASE_POOL_SIZE``).
+    """
+
+    FIELDS = ('name', 'domain', 'region', 'plan', 'num_instances', 'disk_size_gb',
+              'max_instances', 'target_cpu_percent', 'target_memory_percent',
+              'realtime_plan', 'db_plan', 'pgbouncer', 'realtime_instances', 'redis',
+              'llm_gateway', 'gateway_disk_size_gb', 'db_pool_size')
+    # Blueprint fragments and pool sizes computed from the fields above
+    DERIVED = ('web_scaling', 'web_disk', 'pooler_env', 'pooler_service',
+               'realtime_scaling', 'redis_env', 'redis_service', 'gateway_env', 'gateway_service',
+               'pgbouncer_pool_size', 'pgbouncer_reserve_pool_size',
+               'pgbouncer_max_db_connections', 'pgbouncer_max_client_conn')
+    PLACEHOLDERS = FIELDS + DERIVED
+
+    __slots__ = FIELDS + ('_values',)
+
+    def __init__(self, domain='your-simstudio-app.onrender.com', region='oregon',
+                 plan='standard', num_instances=1, disk_size_gb=None, name=None,
+                 max_instances=None, target_cpu_percent=70, target_memory_percent=70,
+                 realtime_plan='starter', db_plan='basic-1gb', pgbouncer=False,
+                 realtime_instances=1, redis=False, llm_gateway=False,
+                 gateway_disk_size_gb=0, db_pool_size=APP_POOL_SIZE):
+        domain = str(domain).strip().lower()
+        if not _DOMAIN_RE.match(domain):
+            raise ValueError(f"Invalid domain: {domain!r}")
+        if region not in REGIONS:
+            raise ValueError(f"Invalid region {region!r} (expected one of: {', '.join(REGIONS)})")
+        if plan not in PLANS:
+            raise ValueError(f"Invalid plan {plan!r} (expected one of: {', '.join(PLANS)})")
+        if realtime_plan not in PLANS:
+            raise ValueError(f"Invalid realtime_plan {realtime_plan!r} "
+                             f"(expected one of: {', '.join(PLANS)})")
+        if db_plan not in DB_PLANS:
+            raise ValueError(f"Invalid db_plan {db_plan!r} (expected one of: {', '.join(DB_PLANS)})")
+        num_instances = int(num_instances)
+        max_instances = num_instances if max_instances is None else int(max_instances)
+        if disk_size_gb is None:
+            disk_size_gb = 5 if max_instances == 1 else 0
+        disk_size_gb = int(disk_size_gb)
+        target_cpu_percent = int(target_cpu_percent)
+        target_memory_percent = int(target_memory_percent)
+        if num_instances < 1:
+            raise ValueError(f"num_instances must be >= 1 (got {num_instances})")
+        if max_instances < num_instances:
+            raise ValueError(f"max_instances must be >= num_instances "
+                             f"(got {max_instances} < {num_instances})")
+        pgbouncer = _flag('pgbouncer', pgbouncer)
+        redis = _flag('redis', redis)
+        realtime_instances = int(realtime_instances)
+        if realtime_instances < 1:
+            raise ValueError(f"realtime_instances must be >= 1 (got {realtime_instances})")
+        if realtime_instances > 1 and not redis:
+            raise ValueError("realtime_instances > 1 needs redis: Socket.IO broadcasts only "
+                             "reach other instances through the Redis adapter")
+        if disk_size_gb < 0:
+            raise ValueError(f"disk_size_gb must be >= 0 (got {disk_size_gb})")
+        if disk_size_gb and max_instances > 1:
+            raise ValueError(f"disk_size_gb needs a single instance: Render cannot attach a disk "
+                             f"to a service running more than one (up to {max_instances} "
+                             f"configured; use disk_size_gb 0)")
+        llm_gateway = _flag('llm_gateway', llm_gateway)
+        gateway_disk_size_gb = int(gateway_disk_size_gb)
+        if gateway_disk_size_gb < 0:
+            raise ValueError(f"gateway_disk_size_gb must be >= 0 (got {gateway_disk_size_gb})")
+        if gateway_disk_size_gb and not llm_gateway:
+            raise ValueError("gateway_disk_size_gb needs llm_gateway: the disk belongs to "
+                             "the gateway service")
+        db_pool_size = int(db_pool_size)
+        if db_pool_size < 1:
+            raise ValueError(f"db_pool_size must be >= 1 (got {db_pool_size})")
+        for key, value in (('target_cpu_percent', target_cpu_percent),
+                           ('target_memory_percent', target_memory_percent)):
+            if not 1 <= value <= 100:
+                raise ValueError(f"{key} must be between 1 and 100 (got {value})")
+        # Tenants are named after the first label of their domain by default
+        name = name or domain.split('.', 1)[0]
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Invalid tenant name: {name!r}")
+
+        self.name = name
+        self.domain = domain
+        self.region = region
+        self.plan = plan
+        self.num_instances = num_instances
+        self.disk_size_gb = disk_size_gb
+        self.max_instances = max_instances
+        self.target_cpu_percent = target_cpu_percent
+        self.target_memory_percent = target_memory_percent
+        self.realtime_plan = realtime_plan
+        self.db_plan = db_plan
+        self.pgbouncer = pgbouncer
+        self.realtime_instances = realtime_instances
+        self.redis = redis
+        self.llm_gateway = llm_gateway
+        self.gateway_disk_size_gb = gateway_disk_size_gb
+        self.db_pool_size = db_pool_size
+        self._values = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build settings from a mapping, ignoring empty values."""
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+        return cls(**{key: value for key, value in data.items() if value not in (None, '')})
+
+    def pool_sizes(self):
+        """PgBouncer limits for this deployment.
+
+        PgBouncer opens at most what the database plan allows, minus the
+        reserved and direct (migration) connections; clients get room for a
+        full pool from every web instance at maximum scale plus the realtime
+        instances, twice over for rolling deploys.
+        """
+        server = DB_CONNECTION_LIMITS[self.db_plan] - 2 * RESERVED_DB_CONNECTIONS
+        reserve = max(2, server // 10)
+        clients = (self.max_instances * (self.db_pool_size + 1)
+                   + self.realtime_instances * REALTIME_POOL_SIZE)
+        return {
+            'pool_size': server - reserve,
+            'reserve_pool_size': reserve,
+            'max_db_connections': server,
+            'max_client_conn': max(100, 2 * clients),
+        }
+
+    def values(self):
+        """Placeholder values as strings, ready for template substitution."""
+        if self._values is None:
+            values = {field: str(getattr(self, field)) for field in self.FIELDS}
+            if self.max_instances > self.num_instances:
+                values['web_scaling'] = (
+                    'scaling:\n'
+                    f'      minInstances: {self.num_instances}\n'
+                    f'      maxInstances: {self.max_instances}\n'
+                    f'      targetCPUPercent: {self.target_cpu_percent}\n'
+                    f'      targetMemoryPercent: {self.target_memory_percent}')
+            else:
+                values['web_scaling'] = f'numInstances: {self.num_instances}'
+            values['web_disk'] = '' if not self.disk_size_gb else (
+                '\n    disk:\n'
+                '      name: simstudio-disk\n'
+                '      mountPath: /app/data\n'
+                f'      sizeGB: {self.disk_size_gb}')
+            values['pooler_env'] = '' if not self.pgbouncer else (
+                '\n      - key: DATABASE_POOLER_HOSTPORT\n'
+                '        fromService:\n'
+                '          name: simstudio-pgbouncer\n'
+                '          type: pserv\n'
+                '          property: hostport')
+            values['pooler_service'] = '' if not self.pgbouncer else (
+                '\n\n  - type: pserv\n'
+                '    name: simstudio-pgbouncer\n'
+                '    env: docker\n'
+                f'    region: {self.region}\n'
+                '    plan: starter\n'
+                '    branch: main\n'
+                '    dockerfilePath: ./pgbouncer/Dockerfile\n'
+                '    dockerContext: ./pgbouncer\n'
+                '    envVars:\n'
+                '      - key: DATABASE_URL\n'
+                '        fromDatabase:\n'
+                '          name: simstudio-db\n'
+                '          property: connectionString')
+            values['realtime_scaling'] = '' if self.realtime_instances == 1 else (
+                f'\n    numInstances: {self.realtime_instances}')
+            values['redis_env'] = '' if not self.redis else (
+                '\n      - key: REDIS_URL\n'
+                '        fromService:\n'
+                '          name: simstudio-redis\n'
+                '          type: keyvalue\n'
+                '          property: connectionString')
+            values['redis_service'] = '' if not self.redis else (
+                '\n\n  - type: keyvalue\n'
+                '    name: simstudio-redis\n'
+                f'    region: {self.region}\n'
+                '    plan: starter\n'
+                '    maxmemoryPolicy: noeviction # the adapter stream must not be evicted\n'
+                '    ipAllowList: [] # only reachable from services in this workspace')
+            values['gateway_env'] = '' if not self.llm_gateway else (
+                '\n      - key: LLM_GATEWAY_HOSTPORT\n'
+                '        fromService:\n'
+                '          name: simstudio-llm-gateway\n'
+                '          type: pserv\n'
+                '          property: hostport')
+            gateway_disk = '' if not self.gateway_disk_size_gb else (
+                '\n      - key: GATEWAY_DISK_CACHE\n'
+                '        value: /app/data/llm-cache\n'
+                '      - key: GATEWAY_DISK_CACHE_MB\n'
+                f'        value: {self.gateway_disk_size_gb * 900}\n'
+                '    disk:\n'
+                '      name: simstudio-llm-cache\n'
+                '      mountPath: /app/data\n'
+                f'      sizeGB: {self.gateway_disk_size_gb}')
+            values['gateway_service'] = '' if not self.llm_gateway else (
+                '\n\n  - type: pserv\n'
+                '    name: simstudio-llm-gateway\n'
+                '    env: docker\n'
+                f'    region: {self.region}\n'
+                '    plan: starter\n'
+                '    branch: main\n'
+                '    dockerfilePath: ./gateway/Dockerfile\n'
+                '    dockerContext: ./gateway\n'
+                '    envVars:\n'
+                '      - key: PORT\n'
+                '        value: 8080\n'
+                '      - key: GATEWAY_CACHE_TTL_S\n'
+                '        value: 86400\n'
+                '      - key: GATEWAY_CACHE_MB\n'
+                '        value: 256\n'
+                '      - key: GATEWAY_ROUTES\n'
+                '        sync: false # optional: equivalent models to route and hedge across\n'
+                + ''.join(
+                    f'      - key: {key}\n'
+                    '        fromService:\n'
+                    '          name: simstudio\n'
+                    '          type: web\n'
+                    f'          envVarKey: {key}\n'
+                    for key in ('OPENAI_API_KEY', 'ANTHROPIC_API_KEY', 'GOOGLE_API_KEY',
+                                'DEEPSEEK_API_KEY')).rstrip('\n')
+                + gateway_disk)
+            for key, value in self.pool_sizes().items():
+                values[f'pgbouncer_{key}'] = str(value)
+            self._values = values
+        return self._values
+
+    def __repr__(self):
+        return f'Settings({self.name!r}, domain={self.domain!r})'
+
+
+DEFAULT_SETTINGS = Settings()
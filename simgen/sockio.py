@@ -0,0 +1,342 @@
+# Socket.IO over WebSocket: a minimal asyncio client and a local stub server
+#
+# Client speaks Engine.IO v4 over the websocket transport only (no
+# long-polling upgrade) and the Socket.IO v5 packet format for text events,
+# which is what a load generator needs: connect with an auth payload, emit,
+# and event callbacks. Each client is one stream pair plus a reader task,
+# so thousands fit in one event loop. StubServer implements the server side
+# with rooms and `socket.to(room).emit` relays, so clients (and their own
+# overhead) can be exercised without the realtime server.
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import ssl
+import struct
+from urllib.parse import urlencode, urlsplit
+
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_TEXT, _CLOSE, _PING, _PONG = 0x1, 0x8, 0x9, 0xA
+_COMPACT = (',', ':')
+
+
+class ProtocolError(ConnectionError):
+    """The server refused the connection or spoke something unexpected."""
+
+
+def _mask(payload, key):
+    # XOR with the repeated 4-byte key, as one big-integer operation
+    n = len(payload)
+    if not n:
+        return payload
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'little')
+            ^ int.from_bytes(repeated, 'little')).to_bytes(n, 'little')
+
+
+def encode_frame(opcode, payload, mask):
+    """One final WebSocket frame; clients must ``mask``, servers must not."""
+    n = len(payload)
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head = bytes((0x80 | opcode, bit | n))
+    elif n < 1 << 16:
+        head = bytes((0x80 | opcode, bit | 126)) + struct.pack('!H', n)
+    else:
+        head = bytes((0x80 | opcode, bit | 127)) + struct.pack('!Q', n)
+    if not mask:
+        return head + payload
+    key = os.urandom(4)
+    return head + key + _mask(payload, key)
+
+
+async def read_message(reader, writer, mask):
+    """Next complete data message (fragments joined). Pings are answered
+    on ``writer``; a close frame raises :class:`ConnectionError`."""
+    parts = []
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        opcode = b0 & 0x0F
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack('!Q', await reader.readexactly(8))[0]
+        key = await reader.readexactly(4) if b1 & 0x80 else None
+        payload = await reader.readexactly(n)
+        if key:
+            payload = _mask(payload, key)
+        if opcode == _PING:
+            writer.write(encode_frame(_PONG, payload, mask))
+            continue
+        if opcode == _PONG:
+            continue
+        if opcode == _CLOSE:
+            code = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1005
+            raise ConnectionError(f'websocket closed by peer ({code})')
+        parts.append(payload)
+        if b0 & 0x80:
+            return b''.join(parts)
+
+
+def _accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode('ascii') + WS_GUID).digest()).decode('ascii')
+
+
+async def _read_headers(reader):
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+def _split_namespace(packet):
+    # "/admin,..." -> ("/admin", "..."); the main namespace has no prefix
+    if packet.startswith('/'):
+        namespace, _, rest = packet.partition(',')
+        return namespace, rest
+    return '/', packet
+
+
+class Client:
+    """One Socket.IO connection to ``url`` (``http(s)://host[:port]``).
+
+    Handlers registered with :meth:`on` are called synchronously from the
+    reader task with the event arguments; ``'disconnect'`` handlers get the
+    reason. :meth:`emit` only buffers the packet, :meth:`drain` waits for
+    the socket to take it.
+    """
+
+    __slots__ = ('url', 'namespace', 'path', 'sid', 'handlers', 'connected', 'error',
+                 '_reader', '_writer', '_task', '_prefix')
+
+    def __init__(self, url, namespace='/', path='/socket.io/'):
+        self.url = url
+        self.namespace = namespace
+        self.path = path
+        self.sid = None
+        self.handlers = {}
+        self.connected = False
+        self.error = None
+        self._reader = self._writer = self._task = None
+        self._prefix = '' if namespace == '/' else namespace + ','
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+        return handler
+
+    async def connect(self, auth=None, query=None, headers=None):
+        """Open the websocket and join the namespace; raise
+        :class:`ProtocolError` if the server refuses (e.g. bad auth)."""
+        parts = urlsplit(self.url)
+        secure = parts.scheme in ('https', 'wss')
+        host = parts.hostname or 'localhost'
+        port = parts.port or (443 if secure else 80)
+        params = {'EIO': '4', 'transport': 'websocket', **(query or {})}
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        context = ssl.create_default_context() if secure else None
+        reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        try:
+            extra = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+            writer.write((f'GET {self.path}?{urlencode(params)} HTTP/1.1\r\n'
+                          f'Host: {host}:{port}\r\n'
+                          'Upgrade: websocket\r\n'
+                          'Connection: Upgrade\r\n'
+                          f'Sec-WebSocket-Key: {key}\r\n'
+                          'Sec-WebSocket-Version: 13\r\n'
+                          f'{extra}\r\n').encode('latin-1'))
+            status = await reader.readline()
+            response = await _read_headers(reader)
+            if status.split(None, 2)[1:2] != [b'101']:
+                raise ProtocolError(f'websocket upgrade refused: {status.decode("latin-1").strip()}')
+            if response.get('sec-websocket-accept') != _accept_key(key):
+                raise ProtocolError('websocket upgrade: bad Sec-WebSocket-Accept')
+
+            packet = (await read_message(reader, writer, True)).decode('utf-8')
+            if not packet.startswith('0'):
+                raise ProtocolError(f'expected an Engine.IO open packet, got {packet[:40]!r}')
+            writer.write(encode_frame(_TEXT, ('40' + self._prefix + (
+                json.dumps(auth, separators=_COMPACT) if auth else '')).encode('utf-8'), True))
+            while True:
+                packet = (await read_message(reader, writer, True)).decode('utf-8')
+                if packet == '2':
+                    writer.write(encode_frame(_TEXT, b'3', True))
+                    continue
+                if packet.startswith('40'):
+                    _, body = _split_namespace(packet[2:])
+                    self.sid = json.loads(body).get('sid') if body else None
+                    break
+                if packet.startswith('44'):
+                    _, body = _split_namespace(packet[2:])
+                    message = json.loads(body).get('message', body) if body else 'refused'
+                    raise ProtocolError(f'connection refused: {message}')
+        except BaseException:
+            writer.close()
+            raise
+        self._reader, self._writer = reader, writer
+        self.connected = True
+        self._task = asyncio.ensure_future(self._read_loop())
+        return self
+
+    def emit(self, event, *args):
+        if not self.connected:
+            raise ConnectionError('not connected')
+        body = json.dumps([event, *args], separators=_COMPACT)
+        self._writer.write(encode_frame(_TEXT, ('42' + self._prefix + body).encode('utf-8'), True))
+
+    async def drain(self):
+        await self._writer.drain()
+
+    def _dispatch(self, packet):
+        kind = packet[:1]
+        if kind == '2':  # Engine.IO ping (the server pings in v4)
+            self._writer.write(encode_frame(_TEXT, b'3', True))
+        elif kind == '4':
+            sio, rest = packet[1:2], packet[2:]
+            namespace, rest = _split_namespace(rest)
+            if namespace != self.namespace:
+                return
+            if sio == '2':
+                start = 0
+                while start < len(rest) and rest[start].isdigit():
+                    start += 1  # ack id
+                event, *args = json.loads(rest[start:])
+                for handler in self.handlers.get(event, ()):
+                    handler(*args)
+            elif sio == '1':
+                raise ConnectionError('disconnected by server')
+        elif kind == '1':
+            raise ConnectionError('closed by server')
+
+    async def _read_loop(self):
+        reason = 'client closed'
+        try:
+            while True:
+                self._dispatch((await read_message(self._reader, self._writer, True))
+                               .decode('utf-8'))
+        except asyncio.CancelledError:
+            pass
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError) as e:
+            reason = self.error = str(e) or type(e).__name__
+        finally:
+            self.connected = False
+            self._writer.close()
+            for handler in self.handlers.get('disconnect', ()):
+                handler(reason)
+
+    async def close(self):
+        if self._task is None:
+            return
+        if self.connected:
+            try:
+                self._writer.write(encode_frame(_TEXT, ('41' + self._prefix).encode(), True))
+                self._writer.write(encode_frame(_CLOSE, struct.pack('!H', 1000), True))
+            except (ConnectionError, RuntimeError):
+                pass
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def __repr__(self):
+        return f'Client({self.url!r}, sid={self.sid!r})'
+
+
+class StubServer:
+    """Minimal Socket.IO server (websocket transport) with rooms.
+
+    A client joins a room with ``join_event``; the room is the ``room_key``
+    value of the first argument (or the argument itself). Each
+    ``relay_event`` is relayed to the other members of the sender's rooms,
+    like ``socket.to(room).emit(event, ...)`` in the realtime server. The
+    frame is encoded once per relay, whatever the room size. ``delay``
+    (seconds) holds every relay to simulate a slow server::
+
+        async with StubServer() as stub:
+            client = await Client(stub.url).connect()
+    """
+
+    def __init__(self, join_event='join-workflow', relay_event='workflow-operation',
+                 room_key='workflowId', delay=0.0):
+        self.join_event = join_event
+        self.relay_event = relay_event
+        self.room_key = room_key
+        self.delay = delay
+        self.rooms = {}
+        self.server = None
+        self.host = None
+        self.port = None
+        self.connections = 0
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.server = await asyncio.start_server(self._session, host, port, backlog=4096)
+        self.host, self.port = self.server.sockets[0].getsockname()[:2]
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _session(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        joined = []
+        try:
+            await reader.readline()
+            headers = await _read_headers(reader)
+            writer.write(('HTTP/1.1 101 Switching Protocols\r\n'
+                          'Upgrade: websocket\r\n'
+                          'Connection: Upgrade\r\n'
+                          f'Sec-WebSocket-Accept: {_accept_key(headers["sec-websocket-key"])}'
+                          '\r\n\r\n').encode('latin-1'))
+            sid = base64.urlsafe_b64encode(os.urandom(15)).decode('ascii')
+            writer.write(encode_frame(_TEXT, ('0' + json.dumps(
+                {'sid': sid, 'upgrades': [], 'pingInterval': 25000, 'pingTimeout': 20000,
+                 'maxPayload': 1000000}, separators=_COMPACT)).encode('utf-8'), False))
+            while True:
+                packet = (await read_message(reader, writer, False)).decode('utf-8')
+                if packet.startswith('40'):
+                    writer.write(encode_frame(_TEXT, ('40' + json.dumps(
+                        {'sid': sid}, separators=_COMPACT)).encode('utf-8'), False))
+                elif packet.startswith('42'):
+                    event, *args = json.loads(packet[2:])
+                    if event == self.join_event:
+                        room = args[0].get(self.room_key) if isinstance(args[0], dict) else args[0]
+                        self.rooms.setdefault(room, set()).add(writer)
+                        joined.append(room)
+                    elif event == self.relay_event:
+                        await self._relay(writer, joined, packet)
+                elif packet.startswith('41') or packet == '1':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            for room in joined:
+                self.rooms.get(room, set()).discard(writer)
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _relay(self, sender, rooms, packet):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        frame = encode_frame(_TEXT, packet.encode('utf-8'), False)
+        for room in rooms:
+            for writer in self.rooms.get(room, ()):
+                if writer is not sender and not writer.is_closing():
+                    writer.write(frame)
@@ -0,0 +1,318 @@
+# Deployment topology parsed from the generated Blueprint and compose file
+#
+# render.yaml is the source of truth for which services, databases and disks
+# exist and how they are linked; docker-compose.yml adds the local
+# equivalents (ports, depends_on). Both are parsed once into a compact,
+# read-only model and cached by content hash, so the diagram, validators
+# and planners share one parse instead of each re-loading YAML.
+
+import hashlib
+import posixpath
+from collections import Counter, OrderedDict
+
+# Env vars that mean "this service calls that AI provider"
+PROVIDER_ENV_KEYS = {
+    'OPENAI_API_KEY': 'OpenAI',
+    'ANTHROPIC_API_KEY': 'Anthropic',
+    'GOOGLE_API_KEY': 'Google AI',
+    'DEEPSEEK_API_KEY': 'DeepSeek',
+}
+# Providers whose SDKs the image entrypoint points at the LLM gateway
+GATEWAY_PROVIDERS = ('OpenAI', 'Anthropic')
+
+# Blueprint service types that run a container we can probe/scale
+RUNTIME_KINDS = ('web', 'pserv', 'worker')
+
+_CACHE_SIZE = 256
+_cache = OrderedDict()
+
+
+class Disk:
+    """A persistent disk attached to a service."""
+
+    __slots__ = ('name', 'mount_path', 'size_gb')
+
+    def __init__(self, name, mount_path, size_gb):
+        self.name = name
+        self.mount_path = mount_path
+        self.size_gb = size_gb
+
+    def __repr__(self):
+        return f'Disk({self.name!r}, {self.mount_path!r}, {self.size_gb}GB)'
+
+
+class Service:
+    """One node of the deployment: a service, a database or a disk.
+
+    ``kind`` is the Blueprint service type (``web``, ``pserv``, ``worker``,
+    ``keyvalue``...), ``database``, ``disk``, or ``local`` for compose-only
+    services with no Blueprint counterpart.
+    """
+
+    __slots__ = ('name', 'kind', 'plan', 'region', 'instances', 'port', 'dockerfile',
+                 'health_check_path', 'env', 'disk', 'compose_name', 'local_port')
+
+    def __init__(self, name, kind, plan=None, region=None, instances=1, port=None,
+                 dockerfile=None, health_check_path=None, env=(), disk=None):
+        self.name = name
+        self.kind = kind
+        self.plan = plan
+        self.region = region
+        self.instances = instances
+        self.port = port
+        self.dockerfile = dockerfile
+        self.health_check_path = health_check_path
+        self.env = tuple(env)  # env var keys, in Blueprint order
+        self.disk = disk
+        self.compose_name = None
+        self.local_port = None
+
+    @property
+    def providers(self):
+        return tuple(PROVIDER_ENV_KEYS[key] for key in self.env if key in PROVIDER_ENV_KEYS)
+
+    def __repr__(self):
+        return f'Service({self.name!r}, {self.kind!r})'
+
+
+class Topology:
+    """Services plus the directed links between them.
+
+    ``links`` are ``(source, target, via)`` tuples, where ``via`` names what
+    created the link (an env var key, ``disk`` or ``depends_on``).
+    """
+
+    __slots__ = ('services', 'links', 'digest', '_by_name')
+
+    def __init__(self, services, links, digest=None):
+        self.services = tuple(services)
+        self.links = tuple(links)
+        self.digest = digest
+        self._by_name = {service.name: service for service in self.services}
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(self.services)
+
+    def __len__(self):
+        return len(self.services)
+
+    def of_kind(self, *kinds):
+        return [service for service in self.services if service.kind in kinds]
+
+    def runtime_services(self):
+        """Services that run a container (web, private services, workers)."""
+        return self.of_kind(*RUNTIME_KINDS)
+
+    def links_from(self, name):
+        return [link for link in self.links if link[0] == name]
+
+    def __repr__(self):
+        return f'Topology({len(self.services)} services, {len(self.links)} links)'
+
+
+def load_yaml(text):
+    """Parse YAML with the C loader when available; ValueError if invalid."""
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    try:
+        return yaml.load(text, Loader=loader) or {}
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML: {e}") from None
+
+
+def _int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _normalize_path(path):
+    return path[2:] if path and path.startswith('./') else path
+
+
+def _parse_blueprint(data, services, links):
+    for spec in data.get('services') or []:
+        env = []
+        port = None
+        for var in spec.get('envVars') or []:
+            key = var.get('key')
+            if 'fromDatabase' in var:
+                links.append((spec['name'], var['fromDatabase']['name'], key))
+            if 'fromService' in var:
+                source = var['fromService']
+                key = key or source.get('envVarKey')
+                links.append((spec['name'], source['name'], key))
+            if key:
+                env.append(key)
+            if key == 'PORT':
+                port = _int(var.get('value'))
+
+        if spec.get('type') == 'keyvalue':
+            port = 6379
+
+        disk = None
+        if spec.get('disk'):
+            d = spec['disk']
+            disk = Disk(d['name'], d.get('mountPath'), _int(d.get('sizeGB')))
+
+        # With autoscaling, the most instances the service can run
+        scaling = spec.get('scaling') or {}
+        instances = _int(scaling.get('maxInstances') or spec.get('numInstances'), 1)
+        services.append(Service(
+            spec['name'], spec.get('type', 'web'),
+            plan=spec.get('plan'), region=spec.get('region'),
+            instances=instances, port=port,
+            dockerfile=_normalize_path(spec.get('dockerfilePath')),
+            health_check_path=spec.get('healthCheckPath'), env=env, disk=disk))
+        if disk:
+            services.append(Service(disk.name, 'disk'))
+            links.append((spec['name'], disk.name, 'disk'))
+
+    for spec in data.get('databases') or []:
+        services.append(Service(spec['name'], 'database', plan=spec.get('plan'),
+                                region=spec.get('region'), port=5432))
+
+
+def _parse_compose(data, services, links):
+    by_dockerfile = {s.dockerfile: s for s in services if s.dockerfile}
+    databases = [s for s in services if s.kind == 'database']
+    keyvalues = [s for s in services if s.kind == 'keyvalue']
+    names = {}
+
+    compose_services = data.get('services') or {}
+    for compose_name, spec in compose_services.items():
+        build = spec.get('build') or {}
+        if isinstance(build, str):
+            build = {'context': build}
+        dockerfile = None
+        if build:
+            # Compose resolves the Dockerfile against the build context,
+            # render.yaml against the repository root
+            dockerfile = posixpath.normpath(posixpath.join(
+                build.get('context') or '.', build.get('dockerfile') or 'Dockerfile'))
+        image = spec.get('image') or ''
+        if dockerfile in by_dockerfile:
+            service = by_dockerfile[dockerfile]
+        elif image.split(':', 1)[0].endswith('postgres') and databases:
+            service = databases[0]
+        elif image.split(':', 1)[0].endswith(('redis', 'valkey')) and keyvalues:
+            service = keyvalues[0]
+        elif spec.get('profiles'):
+            continue  # opt-in local service with no Blueprint counterpart
+        else:
+            service = Service(compose_name, 'local')
+            services.append(service)
+        service.compose_name = compose_name
+        for mapping in spec.get('ports') or []:
+            host, _, container = str(mapping).rpartition(':')
+            service.local_port = _int(host or container)
+            break
+        names[compose_name] = service.name
+
+    for compose_name, spec in compose_services.items():
+        if compose_name not in names:
+            continue
+        depends = spec.get('depends_on') or []
+        for dep in depends if isinstance(depends, list) else list(depends):
+            if dep in names:
+                links.append((names[compose_name], names[dep], 'depends_on'))
+
+
+def content_digest(blueprint, compose=None):
+    digest = hashlib.sha256(blueprint.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((compose or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load(blueprint, compose=None):
+    """Parse Blueprint (and optional compose) text into a :class:`Topology`.
+
+    Results are cached by content hash, so every consumer of the same files
+    shares one parse.
+    """
+    digest = content_digest(blueprint, compose)
+    topology = _cache.get(digest)
+    if topology is not None:
+        _cache.move_to_end(digest)
+        return topology
+
+    services, links = [], []
+    _parse_blueprint(load_yaml(blueprint), services, links)
+    if compose:
+        _parse_compose(load_yaml(compose), services, links)
+
+    # Keep the first occurrence of each link (Blueprint links win over compose)
+    seen = set()
+    unique = []
+    for source, target, via in links:
+        if (source, target) not in seen:
+            seen.add((source, target))
+            unique.append((source, target, via))
+
+    topology = Topology(services, unique, digest)
+    _cache[digest] = topology
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return topology
+
+
+def load_files(blueprint_path='render.yaml', compose_path='docker-compose.yml'):
+    """Load a topology from files; a missing compose file is skipped."""
+    with open(blueprint_path, encoding='utf-8') as f:
+        blueprint = f.read()
+    compose = None
+    if compose_path:
+        try:
+            with open(compose_path, encoding='utf-8') as f:
+                compose = f.read()
+        except FileNotFoundError:
+            pass
+    return load(blueprint, compose)
+
+
+def default_topology(settings=None):
+    """Topology of the Blueprint and compose file the templates render."""
+    from simgen.pipeline import artifact_graph, render_graph, select
+    from simgen.settings import DEFAULT_SETTINGS
+
+    nodes = select(artifact_graph(), ['render.yaml', 'docker-compose.yml'])
+    outputs = render_graph(nodes, jobs=1, settings=settings or DEFAULT_SETTINGS)
+    return load(outputs['render.yaml'], outputs['docker-compose.yml'])
+
+
+def validate(topology):
+    """Return a list of problems with the deployment (empty when valid)."""
+    problems = []
+    counts = Counter(service.name for service in topology)
+    for name in sorted(name for name, count in counts.items() if count > 1):
+        problems.append(f"Duplicate service name: {name}")
+
+    for source, target, via in topology.links:
+        if target not in topology:
+            problems.append(f"{source}: {via} references unknown service {target!r}")
+
+    ports = {}
+    for service in topology.runtime_services():
+        if service.kind == 'web' and not service.health_check_path:
+            problems.append(f"{service.name}: web service has no healthCheckPath")
+        if service.disk and service.instances > 1:
+            problems.append(f"{service.name}: services with a disk cannot run more than one "
+                            f"instance (up to {service.instances} configured)")
+        if (service.dockerfile == 'Dockerfile.realtime' and service.instances > 1
+                and 'REDIS_URL' not in service.env):
+            problems.append(f"{service.name}: {service.instances} instances without REDIS_URL; "
+                            "Socket.IO broadcasts would not reach clients on other instances")
+        if service.local_port is not None:
+            if service.local_port in ports:
+                problems.append(f"{service.name}: local port {service.local_port} is also "
+                                f"used by {ports[service.local_port]}")
+            ports[service.local_port] = service.name
+    return problems
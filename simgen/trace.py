@@ -0,0 +1,429 @@
+# Traffic capture and replay
+#
+# Turns request logs into a compact binary trace and replays it against a
+# local stack. Captured lines are the JSON entries of lib/logger.js (any
+# entry with a route, see simgen.logstats) and logfmt-style platform request
+# logs (method=GET path=/x status=200 responseTimeMS=12 clientIP=...). Each
+# request keeps its arrival time (log time minus duration), method, path,
+# session (user, session id or client IP), status, duration and request
+# size. The trace is columnar: one array per field, arrivals delta-encoded,
+# strings interned, the whole compressed with zlib, so a day of traffic is a
+# few bytes per request.
+#
+# Replay is open loop: every request is sent at its arrival time divided by
+# the speed-up, whatever the server is doing, so bursts arrive as bursts
+# and concurrency builds up as it did in production. A session's requests go
+# in order over its own keep-alive connection, like the browser that sent
+# them. The replayed latencies are then compared route by route with the
+# captured ones (percentiles and the Kolmogorov-Smirnov distance).
+
+import asyncio
+import bisect
+import json
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+
+from simgen.logstats import (LATENCY_KEYS, ROUTE_KEYS, STATUS_KEYS, Histogram, ks_statistic,
+                             normalize_route)
+
+MAGIC = b'SGTRACE1'
+TRACE_VERSION = 1
+REPORT_VERSION = 1
+COLUMNS = (('arrival', 'Q'), ('method', 'I'), ('path', 'I'), ('session', 'I'),
+           ('status', 'H'), ('duration', 'I'), ('size', 'I'))
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+# Keys a client/session may be logged under, most specific first
+SESSION_KEYS = ('sessionId', 'session_id', 'userId', 'user_id', 'clientIP', 'client_ip', 'ip',
+                'remoteAddr')
+TIME_KEYS = ('timestamp', 'time', 'ts')
+SIZE_KEYS = ('requestBytes', 'request_bytes', 'contentLength', 'content_length')
+# Platform request logs report the response time under this key
+CAPTURE_LATENCY_KEYS = LATENCY_KEYS + ('responseTimeMS', 'response_time_ms')
+# Replayed requests count as failed on a 5xx or no answer; 4xx is expected
+# (the local stack has other users and ids than production)
+REPLAY_EXPECT = frozenset(range(100, 500))
+
+_LOGFMT_RE = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|\S*)')
+_LEADING_TIME_RE = re.compile(r'\s*(\d{4}-\d\d-\d\dT[\d:.]+(?:Z|[+-]\d\d:?\d\d)?)')
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)  # epoch ms or s
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _logfmt(line):
+    entry = {}
+    for key, value in _LOGFMT_RE.findall(line):
+        if value.startswith('"'):
+            value = value[1:-1].replace('\\"', '"')
+        else:
+            try:
+                value = float(value) if '.' in value else int(value)
+            except ValueError:
+                pass
+        entry[key] = value
+    if not any(key in entry for key in TIME_KEYS):
+        match = _LEADING_TIME_RE.match(line)
+        if match:
+            entry['timestamp'] = match.group(1)
+    return entry
+
+
+def _first(entry, keys):
+    for key in keys:
+        value = entry.get(key)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def _request(entry):
+    """``(arrival, method, path, session, status, duration_s, size)`` of a
+    request log entry, or None when it does not describe a request."""
+    path = _first(entry, ROUTE_KEYS)
+    timestamp = _parse_time(_first(entry, TIME_KEYS))
+    if not isinstance(path, str) or timestamp is None:
+        return None
+    if '://' in path:
+        path = '/' + path.split('://', 1)[1].partition('/')[2]
+    method = str(entry.get('method') or 'GET').upper()
+    status = _first(entry, STATUS_KEYS)
+    duration = _first(entry, CAPTURE_LATENCY_KEYS)
+    size = _first(entry, SIZE_KEYS)
+    try:
+        status = int(status or 0)
+        duration = max(0.0, float(duration or 0) / 1000)
+        size = max(0, int(size or 0))
+    except (TypeError, ValueError):
+        return None
+    session = _first(entry, SESSION_KEYS)
+    # Logs are written when a request ends: it arrived `duration` earlier
+    return (timestamp - duration, method, path.split('#', 1)[0],
+            '' if session is None else str(session), status, duration, size)
+
+
+class Trace:
+    """Requests sorted by arrival, stored column by column.
+
+    ``start`` is the epoch time of the first arrival; arrivals and durations
+    are integer microseconds, strings (methods, paths, sessions) are indexes
+    into ``strings``, whose entry 0 is the empty string (no session).
+    """
+
+    __slots__ = ('start', 'strings', 'columns', 'source', '_ids')
+
+    def __init__(self, start=0.0, strings=None, columns=None, source=None):
+        self.start = start
+        self.strings = strings or ['']
+        self.columns = columns or {name: array(code) for name, code in COLUMNS}
+        self.source = source
+        self._ids = {string: i for i, string in enumerate(self.strings)}
+
+    @classmethod
+    def from_requests(cls, requests, source=None):
+        """Build a trace from ``_request`` tuples (in any order)."""
+        requests = sorted(requests)
+        trace = cls(requests[0][0] if requests else 0.0, source=source)
+        intern = trace._intern
+        columns = trace.columns
+        for arrival, method, path, session, status, duration, size in requests:
+            columns['arrival'].append(int((arrival - trace.start) * 1e6))
+            columns['method'].append(intern(method))
+            columns['path'].append(intern(path))
+            columns['session'].append(intern(session))
+            columns['status'].append(min(status, 0xffff))
+            columns['duration'].append(min(int(duration * 1e6), 0xffffffff))
+            columns['size'].append(min(size, 0xffffffff))
+        return trace
+
+    def _intern(self, string):
+        index = self._ids.get(string)
+        if index is None:
+            index = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def __len__(self):
+        return len(self.columns['arrival'])
+
+    @property
+    def span(self):
+        """Seconds from the first to the last arrival."""
+        return self.columns['arrival'][-1] / 1e6 if len(self) else 0.0
+
+    def window(self, offset=0.0, span=None):
+        """The requests arriving ``offset`` to ``offset + span`` seconds in."""
+        arrivals = self.columns['arrival']
+        low = bisect.bisect_left(arrivals, int(offset * 1e6))
+        high = len(arrivals) if span is None else bisect.bisect_left(
+            arrivals, int((offset + span) * 1e6))
+        columns = {name: array(code, self.columns[name][low:high]) for name, code in COLUMNS}
+        base = columns['arrival'][0] if high > low else 0
+        columns['arrival'] = array('Q', (value - base for value in columns['arrival']))
+        return Trace(self.start + base / 1e6, list(self.strings), columns, self.source)
+
+    def request(self, i):
+        """``(arrival_s, method, path, session, status, duration_s, size)``."""
+        c = self.columns
+        return (c['arrival'][i] / 1e6, self.strings[c['method'][i]], self.strings[c['path'][i]],
+                self.strings[c['session'][i]], c['status'][i], c['duration'][i] / 1e6,
+                c['size'][i])
+
+    def histograms(self):
+        """Captured latencies: ``({route: Histogram}, overall Histogram)``.
+        Requests logged without a duration are left out."""
+        routes = {}
+        overall = Histogram()
+        strings = self.strings
+        for path, duration in zip(self.columns['path'], self.columns['duration']):
+            if not duration:
+                continue
+            route = normalize_route(strings[path])
+            histogram = routes.get(route)
+            if histogram is None:
+                histogram = routes[route] = Histogram()
+            histogram.record(duration)
+            overall.record(duration)
+        return routes, overall
+
+    def summary(self, top=10):
+        """Size, rates, burstiness, peak concurrency and the busiest routes."""
+        arrivals = self.columns['arrival']
+        durations = self.columns['duration']
+        count = len(self)
+        span = self.span
+        seconds = Counter(value // 1000000 for value in arrivals)
+        # Concurrency from the logged durations: +1 at arrival, -1 at the end
+        events = sorted([(a, 1) for a in arrivals] + [(a + d, -1) for a, d in
+                                                      zip(arrivals, durations)])
+        concurrency = peak = 0
+        for _, step in events:
+            concurrency += step
+            peak = max(peak, concurrency)
+        routes = Counter(normalize_route(self.strings[path]) for path in self.columns['path'])
+        mean_rate = count / span if span else None
+        peak_rate = max(seconds.values()) if seconds else 0
+        return {
+            'requests': count,
+            'start': datetime.fromtimestamp(self.start, timezone.utc).isoformat(
+                timespec='seconds') if count else None,
+            'span_s': round(span, 3),
+            'sessions': len(set(self.columns['session']) - {0}),
+            'mean_rps': round(mean_rate, 3) if mean_rate else None,
+            'peak_rps': peak_rate,
+            'burstiness': round(peak_rate / mean_rate, 2) if mean_rate else None,
+            'peak_concurrency': peak,
+            'long_requests': sum(1 for d in durations if d >= 10_000_000),
+            'methods': dict(Counter(self.strings[m] for m in self.columns['method'])),
+            'routes': dict(routes.most_common(top)),
+        }
+
+    def save(self, path):
+        """Write the trace; returns the bytes written."""
+        deltas = array('Q', self.columns['arrival'])
+        for i in range(len(deltas) - 1, 0, -1):
+            deltas[i] -= deltas[i - 1]
+        blobs = []
+        for name, code in COLUMNS:
+            column = deltas if name == 'arrival' else array(code, self.columns[name])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            blobs.append(column.tobytes())
+        header = json.dumps({
+            'version': TRACE_VERSION, 'start': self.start, 'count': len(self),
+            'source': self.source, 'strings': self.strings,
+            'columns': [[name, code, len(blob)] for (name, code), blob in zip(COLUMNS, blobs)],
+        }, separators=(',', ':')).encode('utf-8')
+        data = (MAGIC + struct.pack('<I', len(header)) + header
+                + zlib.compress(b''.join(blobs), 6))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path} is not a simgen trace")
+        (length,) = struct.unpack_from('<I', data, len(MAGIC))
+        offset = len(MAGIC) + 4
+        header = json.loads(data[offset:offset + length])
+        if header['version'] != TRACE_VERSION:
+            raise ValueError(f"{path}: unsupported trace version {header['version']}")
+        body = zlib.decompress(data[offset + length:])
+        columns = {}
+        position = 0
+        for name, code, size in header['columns']:
+            column = array(code)
+            column.frombytes(body[position:position + size])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns[name] = column
+            position += size
+        arrivals = columns['arrival']
+        for i in range(1, len(arrivals)):
+            arrivals[i] += arrivals[i - 1]
+        return cls(header['start'], header['strings'], columns, header.get('source'))
+
+
+def capture(paths):
+    """Build a :class:`Trace` from log files; returns ``(trace, lines,
+    skipped)`` where ``skipped`` counts lines that are not request logs."""
+    decode = json.JSONDecoder().raw_decode
+    requests = []
+    lines = skipped = 0
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                lines += 1
+                brace = line.find('{')
+                entry = None
+                if brace >= 0:
+                    try:
+                        entry = decode(line, brace)[0]
+                    except ValueError:
+                        pass
+                if not isinstance(entry, dict):
+                    entry = _logfmt(line)
+                request = _request(entry)
+                if request is None:
+                    skipped += 1
+                else:
+                    requests.append(request)
+    source = ', '.join(str(path) for path in paths)
+    return Trace.from_requests(requests, source), lines, skipped
+
+
+def _body(method, size):
+    if method in ('GET', 'HEAD', 'OPTIONS', 'DELETE'):
+        return None
+    # Same size as the original body; the content is not in the logs
+    return b'{"replay":"' + b'x' * max(0, size - 14) + b'"}'
+
+
+async def replay(trace, base_url, speed=1.0, connections=100, rewrites=(), headers=None,
+                 timeout=300.0, progress=None):
+    """Replay ``trace`` against ``base_url`` ``speed`` times faster; returns
+    the report, captured and replayed latencies compared per route.
+
+    At most ``connections`` requests are in flight at once, sessions
+    included. A session also keeps its connection open, idle, between its
+    requests, until its last one."""
+    from simgen.loadtest import HttpPool, Request, Stats, send_request
+
+    if not 1 <= speed <= 1000:
+        raise ValueError(f"speed must be between 1 and 1000 (got {speed:g})")
+    limit = asyncio.Semaphore(connections)
+    shared = HttpPool(base_url, connections, limit)
+    sessions = {}
+    columns = trace.columns
+    last = {session: i for i, session in enumerate(columns['session']) if session}
+    stats = Stats()
+    in_flight = set()
+    peak = 0
+    headers = dict(headers or {})
+    headers.setdefault('Content-Type', 'application/json')
+
+    async def send(i, scheduled):
+        _, method, path, session_id, _, _, size = trace.request(i)
+        for old, new in rewrites:
+            path = path.replace(old, new)
+        request = Request(normalize_route(path), path, method, headers, _body(method, size),
+                          timeout=timeout, expect=REPLAY_EXPECT)
+        session = columns['session'][i]
+        if not session:
+            return await send_request(shared, request, stats, scheduled)
+        pool = sessions.get(session)
+        if pool is None:
+            pool = sessions[session] = HttpPool(base_url, 1, limit)
+        await send_request(pool, request, stats, scheduled)
+        if last[session] == i:
+            pool.close()
+            del sessions[session]
+
+    if progress:
+        progress(f"replaying {len(trace):,} requests ({trace.span:,.0f}s of traffic) at "
+                 f"{speed:g}× on {base_url}")
+    stats.start = time.perf_counter()
+    try:
+        for i, arrival in enumerate(columns['arrival']):
+            scheduled = stats.start + arrival / 1e6 / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(send(i, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            peak = max(peak, len(in_flight))
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        shared.close()
+        for pool in sessions.values():
+            pool.close()
+    elapsed = time.perf_counter() - stats.start
+
+    captured, captured_overall = trace.histograms()
+    summary = trace.summary()
+    report = {
+        'version': REPORT_VERSION,
+        'kind': 'replay',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'base_url': base_url,
+        'speed': speed,
+        'trace': summary,
+        'duration_s': round(elapsed, 3),
+        'concurrency': {'captured_peak': summary['peak_concurrency'], 'replay_peak': peak},
+        'overall': stats.summary(None, stats.overall, elapsed),
+        'requests': {route: stats.summary(route, histogram, elapsed)
+                     for route, histogram in stats.histograms.items()},
+        'diff': compare(captured, stats.histograms),
+        'diff_overall': _compare(captured_overall, stats.overall),
+    }
+    return report
+
+
+def _compare(before, after):
+    percentiles = (50, 95, 99)
+    a = before.percentiles(percentiles) if before else dict.fromkeys(percentiles)
+    b = after.percentiles(percentiles) if after else dict.fromkeys(percentiles)
+    row = {'captured': before.count if before else 0, 'replayed': after.count if after else 0}
+    for q in percentiles:
+        row[f'p{q}_ms'] = [None if a[q] is None else round(a[q] / 1000, 3),
+                           None if b[q] is None else round(b[q] / 1000, 3)]
+    ratio = b[95] / a[95] if a[95] and b[95] is not None else None
+    row['p95_ratio'] = None if ratio is None else round(ratio, 3)
+    ks = ks_statistic(before, after) if before and after else None
+    row['ks'] = None if ks is None else round(ks, 4)
+    row['verdict'] = ('n/a' if ratio is None else 'slower' if ratio > 1.2
+                      else 'faster' if ratio < 0.8 else 'same')
+    return row
+
+
+def compare(captured, replayed):
+    """``{route: row}`` comparing two ``{route: Histogram}`` maps: counts,
+    p50/p95/p99 as ``[captured, replayed]`` ms, the p95 ratio, the KS
+    distance and a verdict (slower/faster beyond ±20% at p95)."""
+    return {route: _compare(captured.get(route), replayed.get(route))
+            for route in sorted(set(captured) | set(replayed))}
+
+
+def run(coro):
+    return asyncio.run(coro)